@@ -1,22 +1,43 @@
 """Automated AI-powered review of classified articles."""
 import logging
-from typing import Dict, Optional
-from database import get_pending_reviews
+from typing import Dict, List, Optional
+from database import get_pending_reviews, get_pending_review
 from threat_scorer import assign_threat_level
-from llm_processor import get_client
+from llm_processor import get_client, record_usage, get_token_usage, log_token_usage
+from prompts import THREAT_GUIDELINES, cached_system_prompt
+from llm_cache import request_key, get_cached_response, cache_response
+import config
+from stories import get_story_leads, copy_threat_assessment, has_threat_assessment, story_locks
 
 logger = logging.getLogger(__name__)
 
 
-def get_review_prompt(article: dict) -> str:
-    """Generate prompt for AI review of an article."""
-    return f"""You are reviewing a competitive intelligence article for a Web3 advertising company that operates two products:
+# Fixed instructions, schema and guidelines, sent as the system prompt
+REVIEW_INSTRUCTIONS = f"""You are reviewing a competitive intelligence article for a Web3 advertising company that operates two products:
 1. AMP (Advertising Marketplace Platform)
 2. Zero-Day (Ad reporting/analytics product)
 
-Review this article and provide threat assessment:
+Review the article in the user message and provide threat assessment in JSON format:
+
+{{
+  "threat_level": "HIGH|MEDIUM|LOW|OPPORTUNITY",
+  "product_impact": "AMP|Zero-Day|Both|General",
+  "action_recommendation": "Watch|Discuss|Urgent Response",
+  "reasoning": "Brief explanation of your assessment"
+}}
 
-ARTICLE DETAILS:
+Guidelines:
+{THREAT_GUIDELINES}"""
+
+
+def get_review_system() -> List[Dict]:
+    """System prompt for reviews: the fixed prefix shared by all articles."""
+    return cached_system_prompt(REVIEW_INSTRUCTIONS)
+
+
+def get_review_prompt(article: dict) -> str:
+    """Generate the per-article part of the review prompt (see get_review_system)."""
+    return f"""ARTICLE DETAILS:
 Headline: {article.get('headline', 'N/A')}
 Source: {article.get('source', 'N/A')}
 URL: {article.get('url', 'N/A')}
@@ -31,23 +52,7 @@ Summary: {article.get('summary', 'N/A')}
 ARTICLE TEXT:
 {article.get('full_text', article.get('summary', 'N/A'))[:2000]}
 
-Based on this information, provide your assessment in JSON format:
-
-{{
-  "threat_level": "HIGH|MEDIUM|LOW|OPPORTUNITY",
-  "product_impact": "AMP|Zero-Day|Both|General",
-  "action_recommendation": "Watch|Discuss|Urgent Response",
-  "reasoning": "Brief explanation of your assessment"
-}}
-
-Guidelines:
-- HIGH: Direct competitive threat or major market shift
-- MEDIUM: Relevant competitive activity worth monitoring
-- LOW: Minor competitive news, tangentially relevant
-- OPPORTUNITY: Potential partnership or market opportunity
-- Watch: Monitor for updates
-- Discuss: Bring to team discussion
-- Urgent Response: Requires immediate action"""
+Respond with the JSON assessment only."""
 
 
 def parse_review_response(response_text: str) -> Optional[Dict]:
@@ -80,37 +85,69 @@ def parse_review_response(response_text: str) -> Optional[Dict]:
 def auto_review_article(article: dict) -> bool:
     """Automatically review an article using Claude AI.
 
+    A story member takes its lead's threat assessment; the lead is reviewed
+    first if it is still pending.
+
     Args:
         article: Article dictionary with classification data
 
     Returns:
         True if successfully reviewed and stored, False otherwise
     """
+    lead_id = get_story_leads([article['id']]).get(article['id'])
+    with story_locks([lead_id or article['id']]):
+        if has_threat_assessment(article['id']):
+            # A story lead reviewed while waiting for the lock, on behalf of one of its members
+            return True
+        if lead_id is None:
+            return _review_article(article)
+        if copy_threat_assessment(lead_id, article['id']):
+            return True
+        lead = get_pending_review(lead_id)
+        if lead and _review_article(lead):
+            return copy_threat_assessment(lead_id, article['id'])
+        # The lead cannot be reviewed (e.g. it was never classified); review the member itself
+        return _review_article(article)
+
+
+def _review_article(article: dict) -> bool:
+    """Review one article with Claude and store its threat assessment."""
     try:
         prompt = get_review_prompt(article)
-        client = get_client()
-
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=500,
-            messages=[{
+        request = {
+            "model": "claude-3-haiku-20240307",
+            "max_tokens": 500,
+            "system": get_review_system(),
+            "messages": [{
                 "role": "user",
                 "content": prompt
             }]
-        )
+        }
+
+        cache_key = request_key(request) if config.LLM_CACHE_ENABLED else None
+        review = get_cached_response(cache_key) if cache_key else None
+        if review:
+            logger.info(f"Review of article {article['id']} served from LLM cache")
+        else:
+            client = get_client()
+            message = client.messages.create(**request)
+            record_usage(message)
+
+            response_text = message.content[0].text if message.content else ""
 
-        response_text = message.content[0].text if message.content else ""
+            if not response_text:
+                logger.warning(f"Empty response from Claude for article {article['id']}")
+                return False
 
-        if not response_text:
-            logger.warning(f"Empty response from Claude for article {article['id']}")
-            return False
+            # Parse the review
+            review = parse_review_response(response_text)
 
-        # Parse the review
-        review = parse_review_response(response_text)
+            if not review:
+                logger.warning(f"Failed to parse review for article {article['id']}")
+                return False
 
-        if not review:
-            logger.warning(f"Failed to parse review for article {article['id']}")
-            return False
+            if cache_key:
+                cache_response(cache_key, 'review', request['model'], review)
 
         # Store the threat assessment
         success = assign_threat_level(
@@ -146,6 +183,7 @@ def auto_review_pending_articles() -> Dict[str, int]:
         return {'reviewed': 0, 'failed': 0, 'total': 0}
 
     logger.info(f"Auto-reviewing {len(pending)} pending articles...")
+    usage_before = get_token_usage()
 
     reviewed_count = 0
     failed_count = 0
@@ -157,6 +195,7 @@ def auto_review_pending_articles() -> Dict[str, int]:
             failed_count += 1
 
     logger.info(f"Auto-review complete: {reviewed_count} reviewed, {failed_count} failed")
+    log_token_usage(since=usage_before, label="Auto-review")
 
     return {
         'reviewed': reviewed_count,
@@ -0,0 +1,274 @@
+"""Bulk historical backfill from archived feeds, OPML lists and JSONL exports.
+
+Usage:
+    python backfill.py archive/adexchanger-2024.xml --source adexchanger
+    python backfill.py feeds.opml exports/articles.jsonl --classify
+"""
+import argparse
+import json
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import feedparser
+import config
+from content_cache import evict_scrape_cache
+from database import (get_connection, init_database, insert_articles_bulk,
+                      get_backfill_checkpoint)
+from near_duplicates import rebuild_index
+from rss_aggregator import parse_feed_entry, parse_pub_date, enrich_articles
+from url_normalizer import url_hash
+
+logger = logging.getLogger(__name__)
+
+FEED_SUFFIXES = {'.xml', '.rss', '.atom'}
+
+
+def slugify(value: str) -> str:
+    """Turn a feed title into a source name."""
+    return re.sub(r'[^a-z0-9]+', '', value.lower()) or 'unknown'
+
+
+def iter_feed_file(location: str, source: str) -> Iterator[Dict]:
+    """Yield article dicts from a saved feed file (or feed URL)."""
+    feed = feedparser.parse(location)
+    if feed.bozo and not feed.entries:
+        raise ValueError(f"Could not parse feed {location}: {feed.bozo_exception}")
+    for entry in feed.entries:
+        article = parse_feed_entry(entry, source, scrape=False)
+        if article:
+            yield article
+
+
+def iter_jsonl_file(path: Path, default_source: Optional[str]) -> Iterator[Dict]:
+    """Yield article dicts from a JSONL export (one article per line).
+
+    Accepts the keys store_articles uses (headline, url, source, pub_date,
+    full_text) as well as title/link/summary.
+    """
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"{path}:{line_number}: invalid JSON ({e})")
+                continue
+            headline = (record.get('headline') or record.get('title') or '').strip()
+            url = (record.get('url') or record.get('link') or '').strip()
+            if not headline or not url:
+                continue
+            yield {
+                'headline': headline,
+                'url': url,
+                'source': record.get('source') or default_source or 'unknown',
+                'pub_date': record.get('pub_date') or record.get('published'),
+                'full_text': record.get('full_text') or record.get('summary')
+            }
+
+
+def read_opml(path: Path) -> List[Tuple[str, str]]:
+    """Get (source name, feed location) pairs from an OPML subscription list."""
+    feeds = []
+    for outline in ET.parse(path).iter('outline'):
+        xml_url = outline.get('xmlUrl')
+        if not xml_url:
+            continue
+        if '://' not in xml_url:
+            # Relative entries point at feed dumps stored next to the OPML file
+            xml_url = str((path.parent / xml_url).resolve())
+        name = slugify(outline.get('title') or outline.get('text') or Path(xml_url).stem)
+        feeds.append((name, xml_url))
+    return feeds
+
+
+def expand_inputs(paths: List[str], source: Optional[str]) -> Iterator[Tuple[str, Iterator[Dict]]]:
+    """Yield (input_key, records) for every feed dump, OPML feed and JSONL export."""
+    for raw_path in paths:
+        path = Path(raw_path).resolve()
+        suffix = path.suffix.lower()
+        if suffix == '.opml':
+            for name, location in read_opml(path):
+                yield f"{path}#{location}", iter_feed_file(location, source or name)
+        elif suffix == '.jsonl':
+            yield str(path), iter_jsonl_file(path, source)
+        elif suffix in FEED_SUFFIXES:
+            yield str(path), iter_feed_file(str(path), source or slugify(path.stem))
+        else:
+            logger.warning(f"Skipping {raw_path}: unsupported file type")
+
+
+def normalize_headline(headline: str) -> str:
+    """Lowercase and collapse whitespace for exact headline matching."""
+    return ' '.join(headline.lower().split())
+
+
+class BackfillDeduplicator:
+    """Duplicate filter for bulk imports.
+
+    Loads existing URL hashes and headlines once, then checks each record in
+    memory. Matching is on canonical URL and normalized headline; running every record
+    through is_duplicate's fuzzy scan would make the import quadratic.
+    """
+
+    def __init__(self):
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT url_hash, headline FROM articles")
+        self.url_hashes = set()
+        self.headlines = set()
+        for row in cursor:
+            self.url_hashes.add(row['url_hash'])
+            self.headlines.add(normalize_headline(row['headline']))
+        self.url_hashes.discard(None)
+        conn.close()
+        logger.info(f"Loaded {len(self.headlines)} existing headlines for deduplication")
+
+    def is_duplicate(self, article: Dict) -> bool:
+        return (url_hash(article['url']) in self.url_hashes
+                or normalize_headline(article['headline']) in self.headlines)
+
+    def add(self, article: Dict):
+        self.url_hashes.add(url_hash(article['url']))
+        self.headlines.add(normalize_headline(article['headline']))
+
+
+def to_processed_at(pub_date: Optional[str]) -> Optional[str]:
+    """Use the publication date as processed_at so weekly stats stay per-period."""
+    parsed = parse_pub_date(pub_date)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S') if parsed else None
+
+
+def import_input(input_key: str, records: Iterator[Dict], dedup: BackfillDeduplicator,
+                 batch_size: int, resume: bool = True, scrape: bool = False) -> Dict[str, int]:
+    """Import one input, committing a batch and its checkpoint together."""
+    stats = {'read': 0, 'inserted': 0, 'duplicates': 0}
+    checkpoint = get_backfill_checkpoint(input_key) if resume else None
+    if checkpoint and checkpoint['completed']:
+        logger.info(f"Skipping {input_key}: already imported")
+        return stats
+    start_position = checkpoint['position'] if checkpoint else 0
+    if start_position:
+        logger.info(f"Resuming {input_key} after record {start_position}")
+
+    batch = []
+    position = 0
+    last_saved = start_position
+    started = time.monotonic()
+
+    def flush(completed: bool):
+        nonlocal batch, last_saved
+        if scrape:
+            enrich_articles(batch)
+        stats['inserted'] += insert_articles_bulk(batch, checkpoint=(input_key, position, completed))
+        last_saved = position
+        batch = []
+        rate = stats['read'] / max(time.monotonic() - started, 1e-6)
+        logger.info(f"{Path(input_key.split('#')[-1]).name}: {stats['read']} read, {stats['inserted']} inserted, "
+                    f"{stats['duplicates']} duplicates ({rate:.0f} records/s)")
+
+    for position, article in enumerate(records, 1):
+        if position <= start_position:
+            continue
+        stats['read'] += 1
+        if dedup.is_duplicate(article):
+            stats['duplicates'] += 1
+        else:
+            dedup.add(article)
+            article['processed_at'] = to_processed_at(article.get('pub_date'))
+            batch.append(article)
+        if len(batch) >= batch_size or position - last_saved >= batch_size * 10:
+            flush(completed=False)
+
+    position = max(position, start_position)
+    flush(completed=True)
+    return stats
+
+
+def classify_backlog(limit: int, batch_size: int = 50) -> int:
+    """Classify unclassified articles in chunks until none are left or limit is reached."""
+    from classifier import classify_and_store_articles, get_unclassified_articles
+
+    attempted = set()
+    while len(attempted) < limit:
+        article_ids = [aid for aid in get_unclassified_articles(limit=batch_size + len(attempted))
+                       if aid not in attempted][:min(batch_size, limit - len(attempted))]
+        if not article_ids:
+            break
+        attempted.update(article_ids)
+        classify_and_store_articles(article_ids)
+        logger.info(f"Classification backlog: {len(attempted)} articles processed")
+    return len(attempted)
+
+
+def run_backfill(paths: List[str], source: Optional[str] = None, batch_size: int = None,
+                 resume: bool = True, scrape: bool = False, classify: bool = False,
+                 classify_limit: Optional[int] = None) -> Dict[str, int]:
+    """Import archived articles from feed dumps, OPML lists and JSONL exports.
+
+    Args:
+        paths: Input files (.xml/.rss/.atom, .opml, .jsonl)
+        source: Source name for all records (defaults to feed title / file name)
+        batch_size: Articles per transaction (defaults to config.BACKFILL_BATCH_SIZE)
+        resume: Continue from saved checkpoints and skip completed inputs
+        scrape: Scrape full text for records whose text is too short
+        classify: Classify the imported articles afterwards
+        classify_limit: Maximum articles to classify (defaults to all inserted)
+
+    Returns:
+        Totals for read, inserted and duplicates (and classified if requested)
+    """
+    if batch_size is None:
+        batch_size = config.BACKFILL_BATCH_SIZE
+    init_database()
+    dedup = BackfillDeduplicator()
+    totals = {'read': 0, 'inserted': 0, 'duplicates': 0}
+    started = time.monotonic()
+
+    for input_key, records in expand_inputs(paths, source):
+        try:
+            stats = import_input(input_key, records, dedup, batch_size, resume, scrape)
+        except Exception as e:
+            logger.error(f"Error importing {input_key}: {e}")
+            continue
+        for key in totals:
+            totals[key] += stats[key]
+
+    if config.NEAR_DUP_ENABLED and totals['inserted']:
+        # Bulk inserts skip the per-article near-duplicate index
+        rebuild_index()
+    if scrape and config.SCRAPE_CACHE_ENABLED:
+        evict_scrape_cache()
+
+    elapsed = time.monotonic() - started
+    logger.info(f"Backfill complete in {elapsed:.1f}s: {totals['read']} read, "
+                f"{totals['inserted']} inserted, {totals['duplicates']} duplicates")
+
+    if classify and totals['inserted']:
+        totals['classified'] = classify_backlog(classify_limit or totals['inserted'])
+    return totals
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Backfill historical articles")
+    parser.add_argument('inputs', nargs='+', help="Feed dumps (.xml/.rss/.atom), OPML lists or JSONL exports")
+    parser.add_argument('--source', help="Source name for all imported records")
+    parser.add_argument('--batch-size', type=int, help="Articles per transaction")
+    parser.add_argument('--restart', action='store_true', help="Ignore saved checkpoints")
+    parser.add_argument('--scrape', action='store_true', help="Scrape full text for short records")
+    parser.add_argument('--classify', action='store_true', help="Classify imported articles afterwards")
+    parser.add_argument('--classify-limit', type=int, help="Maximum articles to classify")
+    args = parser.parse_args()
+
+    run_backfill(args.inputs, source=args.source, batch_size=args.batch_size,
+                 resume=not args.restart, scrape=args.scrape,
+                 classify=args.classify, classify_limit=args.classify_limit)
@@ -0,0 +1,123 @@
+"""Benchmark batched against single-article LLM classification on stored articles.
+
+Classifies the most recent stored articles twice through
+llm_processor.batch_classify_articles, once with one article per request
+and once with --batch-size articles per request, and reports requests,
+prompt and output tokens per article, throughput, and how often the two
+modes agree on relevance. The LLM result cache is disabled so that every
+request reaches the API; nothing is written to the database.
+
+This makes real Claude API calls (about twice --limit classifications).
+
+Usage:
+    python benchmark_classification.py [--limit 50] [--batch-size 10] [--output classification-results.json]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+import config
+import llm_processor
+from database import get_connection
+
+
+def load_articles(limit: int) -> List[Dict]:
+    """Most recent stored articles with text, newest first."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, headline, full_text
+        FROM articles
+        WHERE full_text IS NOT NULL AND full_text != ''
+        ORDER BY id DESC
+        LIMIT ?
+    """, (limit,))
+    articles = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return articles
+
+
+def run_mode(articles: List[Dict], batch_size: int, max_workers: int) -> Dict:
+    """Classify articles with the given batch size and measure the run."""
+    usage_before = llm_processor.get_token_usage()
+    start = time.perf_counter()
+    results = llm_processor.batch_classify_articles(articles, max_workers=max_workers, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    usage_after = llm_processor.get_token_usage()
+    usage = {key: usage_after[key] - usage_before[key] for key in usage_after}
+    prompt_tokens = usage['input_tokens'] + usage['cache_read_input_tokens'] + usage['cache_creation_input_tokens']
+    count = max(1, len(articles))
+    return {
+        'batch_size': batch_size,
+        'classified': len(results),
+        'requests': usage['requests'],
+        'seconds': elapsed,
+        'articles_per_second': len(articles) / elapsed if elapsed else 0.0,
+        'prompt_tokens_per_article': prompt_tokens / count,
+        'output_tokens_per_article': usage['output_tokens'] / count,
+        'results': results,
+    }
+
+
+def agreement(single: Dict[int, Dict], batched: Dict[int, Dict]) -> Dict:
+    """How closely batched relevance scores match single-article ones."""
+    common = [article_id for article_id in single if article_id in batched]
+    if not common:
+        return {'compared': 0, 'same_score': 0.0, 'same_decision': 0.0, 'mean_abs_difference': 0.0}
+    threshold = config.RELEVANCE_THRESHOLD
+    same_score = sum(1 for i in common if single[i]['relevance'] == batched[i]['relevance'])
+    same_decision = sum(1 for i in common
+                        if (single[i]['relevance'] >= threshold) == (batched[i]['relevance'] >= threshold))
+    difference = sum(abs(single[i]['relevance'] - batched[i]['relevance']) for i in common)
+    return {
+        'compared': len(common),
+        'same_score': same_score / len(common),
+        'same_decision': same_decision / len(common),
+        'mean_abs_difference': difference / len(common),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched LLM classification (makes real API calls)")
+    parser.add_argument('--limit', type=int, default=50, help="Most recent stored articles to classify")
+    parser.add_argument('--batch-size', type=int, default=max(config.LLM_BATCH_SIZE, 10),
+                        help="Articles per request in batched mode")
+    parser.add_argument('--workers', type=int, default=config.LLM_CONCURRENCY, help="Requests in flight at once")
+    parser.add_argument('--output', help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    articles = load_articles(args.limit)
+    if not articles:
+        print("No stored articles with text to classify")
+        return
+    # Every request must reach the API for the comparison to mean anything
+    config.LLM_CACHE_ENABLED = False
+
+    print(f"{len(articles)} articles, batched mode up to {args.batch_size} per request "
+          f"and ~{config.LLM_BATCH_TOKEN_BUDGET} prompt tokens, {args.workers} requests at a time")
+    runs = [run_mode(articles, 1, args.workers), run_mode(articles, args.batch_size, args.workers)]
+    for run in runs:
+        label = 'single' if run['batch_size'] == 1 else f"batch {run['batch_size']}"
+        print(f"  {label:9} {run['classified']:4}/{len(articles)} classified  {run['requests']:4} requests  "
+              f"{run['prompt_tokens_per_article']:7.0f} prompt + {run['output_tokens_per_article']:5.0f} output "
+              f"tokens/article  {run['articles_per_second']:6.2f} articles/s")
+
+    single, batched = runs
+    match = agreement(single['results'], batched['results'])
+    print(f"  relevance: same score on {match['same_score']:.0%}, same side of threshold "
+          f"{config.RELEVANCE_THRESHOLD} on {match['same_decision']:.0%} of {match['compared']} articles "
+          f"(mean difference {match['mean_abs_difference']:.2f})")
+
+    if args.output:
+        summary = {
+            'articles': len(articles),
+            'runs': [{key: value for key, value in run.items() if key != 'results'} for run in runs],
+            'agreement': match,
+        }
+        Path(args.output).write_text(json.dumps(summary, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""Benchmark headline deduplication on synthetic ad-tech headline corpora.
+
+By default, scores a batch of new headlines against a set of stored ones
+with calculate_similarity in a Python loop (as is_duplicate did) and with
+deduplication.match_headlines_batch.
+
+With --suite, builds a synthetic archive database at each size and runs
+every registered dedup method (METHODS) against it through the real entry
+points, reporting index load time and memory, latency per check,
+throughput, and precision/recall against the exhaustive 85-threshold
+baseline and against the generator's labels. To judge a replacement, add
+it to METHODS.
+
+Usage:
+    python benchmark_dedup.py [--queries 1000] [--candidates 100000] [--sample 20]
+    python benchmark_dedup.py --suite [--sizes 1000,10000,100000,1000000] [--methods index,batch,scan] [--queries 500]
+"""
+import argparse
+import json
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import config
+import deduplication
+from database import get_connection, init_database, insert_articles_bulk
+from deduplication import calculate_similarity, match_headlines_batch
+
+SUBJECTS = [
+    'The Trade Desk', 'Google', 'Amazon Ads', 'Magnite', 'PubMatic', 'Criteo', 'Index Exchange',
+    'Microsoft Advertising', 'Netflix', 'Roku', 'Disney', 'Meta', 'OpenX', 'Xandr', 'Yahoo DSP',
+    'LiveRamp', 'Integral Ad Science', 'DoubleVerify', 'Taboola', 'Outbrain', 'Comcast', 'Walmart Connect'
+]
+VERBS = [
+    'launches', 'acquires', 'partners with', 'expands', 'cuts', 'tests', 'sues', 'delays', 'reports',
+    'unveils', 'rolls out', 'drops', 'invests in', 'doubles down on', 'pauses'
+]
+TOPICS = [
+    'clean room', 'CTV inventory', 'retail media', 'identity graph', 'header bidding', 'cookie deprecation',
+    'curation', 'supply path optimization', 'attention metrics', 'AI buying agents', 'contextual targeting',
+    'programmatic guaranteed', 'measurement', 'first-party data', 'brand safety', 'earnings', 'privacy sandbox'
+]
+SYLLABLES = ['ad', 'bit', 'co', 'dex', 'flo', 'gen', 'io', 'ka', 'lux', 'mo', 'nex', 'or', 'pix', 'qua',
+             'ro', 'sy', 'tek', 'vo', 'wa', 'zen', 'ly', 'mar', 'ti', 'sen', 'um', 'val', 'pe', 'dri']
+
+
+def make_headline(rng: random.Random) -> str:
+    """Random headline in the style of our RSS sources.
+    
+    Mixes fixed ad-tech names with generated words so that unrelated
+    headlines score well below the threshold, as real ones do.
+    """
+    words = [rng.choice(SUBJECTS), rng.choice(VERBS)]
+    for _ in range(rng.randint(3, 7)):
+        if rng.random() < 0.25:
+            words.append(rng.choice(TOPICS))
+        else:
+            words.append(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))))
+    return ' '.join(words)
+
+
+def rewrite_headline(headline: str, rng: random.Random) -> str:
+    """Lightly edited copy of a headline, as another outlet might title it."""
+    words = headline.split()
+    edit = rng.choice(['case', 'drop', 'swap', 'suffix'])
+    if edit == 'case':
+        return headline.upper() if rng.random() < 0.5 else headline.title()
+    if edit == 'drop' and len(words) > 4:
+        del words[rng.randrange(1, len(words))]
+    elif edit == 'swap' and len(words) > 3:
+        i = rng.randrange(len(words) - 1)
+        words[i], words[i + 1] = words[i + 1], words[i]
+    else:
+        words.append(rng.choice(['- report', '(update)', 'report says']))
+    return ' '.join(words)
+
+
+def generate_headlines(queries: int, candidates: int, duplicate_rate: float,
+                       seed: int) -> Tuple[List[str], List[str]]:
+    """Stored headlines plus a batch of new ones, some of which rewrite stored ones."""
+    rng = random.Random(seed)
+    stored = [make_headline(rng) for _ in range(candidates)]
+    new = [rewrite_headline(rng.choice(stored), rng) if rng.random() < duplicate_rate else make_headline(rng)
+           for _ in range(queries)]
+    return new, stored
+
+
+def near_miss_headline(headline: str, rng: random.Random) -> str:
+    """Different story from the same company: keeps the subject and verb, rewrites the rest."""
+    words = headline.split()
+    keep = max(2, len(words) // 2)
+    rest = make_headline(rng).split()[2:]
+    return ' '.join(words[:keep] + rest)
+
+
+def generate_corpus(size: int, queries: int, duplicate_rate: float, near_miss_rate: float,
+                    seed: int) -> Tuple[List[str], List[Tuple[str, str]], List[bool]]:
+    """Stored headlines, new (headline, url) checks and whether each check is a planted duplicate.
+
+    Planted duplicates are light rewrites of a stored headline; near misses
+    share the start of a stored headline but are labelled as new stories.
+    New URLs never match stored ones, so every decision rests on the headline.
+    """
+    rng = random.Random(seed)
+    stored = [make_headline(rng) for _ in range(size)]
+    checks, labels = [], []
+    for i in range(queries):
+        roll = rng.random()
+        if roll < duplicate_rate:
+            headline, label = rewrite_headline(rng.choice(stored), rng), True
+        elif roll < duplicate_rate + near_miss_rate:
+            headline, label = near_miss_headline(rng.choice(stored), rng), False
+        else:
+            headline, label = make_headline(rng), False
+        checks.append((headline, f"https://bench.example/new/{seed}/{i}"))
+        labels.append(label)
+    return stored, checks, labels
+
+
+def loop_match(headline: str, candidates: List[str], threshold: int) -> Optional[Tuple[int, int]]:
+    """First candidate at or above the threshold, as is_duplicate's scan found it."""
+    for position, candidate in enumerate(candidates):
+        similarity = calculate_similarity(headline, candidate)
+        if similarity >= threshold:
+            return position, similarity
+    return None
+
+
+@contextmanager
+def settings(**overrides) -> Iterator[None]:
+    """Temporarily override config values."""
+    saved = {name: getattr(config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+
+def check_each(checks: List[Tuple[str, str]], threshold: int) -> Tuple[List[bool], List[float]]:
+    """Call is_duplicate once per check, timing each call."""
+    decisions, latencies = [], []
+    for headline, url in checks:
+        start = time.perf_counter()
+        duplicate, _ = deduplication.is_duplicate(headline, url, threshold)
+        latencies.append(time.perf_counter() - start)
+        decisions.append(duplicate)
+    return decisions, latencies
+
+
+def check_batch(checks: List[Tuple[str, str]], threshold: int) -> Tuple[List[bool], List[float]]:
+    """Check all headlines with one check_duplicates_batch call, as a feed is checked."""
+    articles = [{'headline': headline, 'url': url} for headline, url in checks]
+    start = time.perf_counter()
+    results = deduplication.check_duplicates_batch(articles, threshold)
+    elapsed = time.perf_counter() - start
+    return [duplicate for duplicate, _ in results], [elapsed]
+
+
+# name -> (check function, config overrides, whether checks are capped by --slow-queries)
+METHODS: Dict[str, Tuple[Callable, Dict, bool]] = {
+    'index': (check_each, {'DEDUP_INDEX_ENABLED': True}, False),
+    'batch': (check_batch, {'DEDUP_INDEX_ENABLED': True}, False),
+    'scan': (check_each, {'DEDUP_INDEX_ENABLED': False}, True),
+}
+
+
+def precision_recall(predicted: List[bool], expected: List[bool]) -> Tuple[float, float]:
+    """Precision and recall of duplicate decisions (1.0 when there is nothing to find or flag)."""
+    true_positives = sum(1 for p, e in zip(predicted, expected) if p and e)
+    flagged, relevant = sum(predicted), sum(expected)
+    return (true_positives / flagged if flagged else 1.0,
+            true_positives / relevant if relevant else 1.0)
+
+
+def build_archive(path: Path, stored: List[str], batch_size: int = 50000):
+    """Create (or reuse, if it already holds exactly these rows) an archive database."""
+    config.DATABASE_PATH = str(path)
+    init_database()
+    conn = get_connection()
+    count = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    conn.close()
+    if count == len(stored):
+        return
+    if count:
+        path.unlink()
+        init_database()
+    start = time.perf_counter()
+    for offset in range(0, len(stored), batch_size):
+        insert_articles_bulk([
+            {'headline': headline, 'url': f"https://bench.example/stored/{offset + i}", 'source': 'bench'}
+            for i, headline in enumerate(stored[offset:offset + batch_size])
+        ])
+    print(f"  built archive of {len(stored)} articles in {time.perf_counter() - start:.1f} s")
+
+
+def measure_index(snapshot: Path) -> Dict:
+    """Full load time and memory of the headline index, and startup time from its snapshot."""
+    index = deduplication._headline_index
+    with settings(DEDUP_SNAPSHOT_ENABLED=False):
+        index.invalidate()
+        start = time.perf_counter()
+        index.refresh()
+        full_load = time.perf_counter() - start
+
+        # Memory is measured on a separate load; tracemalloc skews timing
+        index.invalidate()
+        tracemalloc.start()
+        index.refresh()
+        memory, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    snapshot.unlink(missing_ok=True)
+    index.invalidate()
+    index.refresh()
+    index.invalidate()
+    start = time.perf_counter()
+    index.refresh()
+    return {
+        'full_load_s': full_load,
+        'memory_mb': memory / 2 ** 20,
+        'peak_mb': peak / 2 ** 20,
+        'snapshot_start_s': time.perf_counter() - start,
+        'snapshot_mb': snapshot.stat().st_size / 2 ** 20 if snapshot.exists() else 0.0
+    }
+
+
+def run_method(name: str, checks: List[Tuple[str, str]], baseline: List[bool], labels: List[bool],
+               threshold: int, slow_queries: int) -> Dict:
+    """Time a dedup method and score its decisions."""
+    check, overrides, slow = METHODS[name]
+    if slow:
+        checks, baseline, labels = checks[:slow_queries], baseline[:slow_queries], labels[:slow_queries]
+    with settings(**overrides):
+        if config.DEDUP_INDEX_ENABLED:
+            deduplication.get_headline_index()
+        decisions, latencies = check(checks, threshold)
+
+        # Allocations are measured on a separate pass over a few checks
+        tracemalloc.start()
+        check(checks[:20], threshold)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    elapsed = sum(latencies)
+    per_check = sorted(latencies) if len(latencies) == len(checks) else None
+    precision, recall = precision_recall(decisions, baseline)
+    label_precision, label_recall = precision_recall(decisions, labels)
+    return {
+        'method': name,
+        'checks': len(checks),
+        'mean_ms': elapsed / len(checks) * 1000,
+        'p95_ms': per_check[int(0.95 * (len(per_check) - 1))] * 1000 if per_check else None,
+        'checks_per_second': len(checks) / elapsed if elapsed else float('inf'),
+        'peak_kb': peak / 1024,
+        'precision': precision,
+        'recall': recall,
+        'label_precision': label_precision,
+        'label_recall': label_recall
+    }
+
+
+def run_suite(args) -> List[Dict]:
+    """Benchmark every selected method at every archive size."""
+    unknown = [name for name in args.methods if name not in METHODS]
+    if unknown:
+        raise SystemExit(f"Unknown methods: {', '.join(unknown)} (available: {', '.join(METHODS)})")
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix='dedup-bench-'))
+    workdir.mkdir(parents=True, exist_ok=True)
+    results = []
+    try:
+        for size in args.sizes:
+            print(f"\n{size} stored headlines, {args.queries} checks "
+                  f"({args.duplicate_rate:.0%} rewrites, {args.near_miss_rate:.0%} near misses, threshold {args.threshold})")
+            stored, checks, labels = generate_corpus(size, args.queries, args.duplicate_rate,
+                                                     args.near_miss_rate, args.seed)
+            database = workdir / f"archive-{size}-{args.seed}.db"
+            with settings(DEDUP_SNAPSHOT_PATH=''):
+                build_archive(database, stored)
+                snapshot = Path(deduplication.snapshot_path())
+
+                start = time.perf_counter()
+                baseline = [match is not None for match in
+                            match_headlines_batch([headline for headline, _ in checks], stored, args.threshold)]
+                print(f"  baseline (exhaustive, threshold {args.threshold}): {sum(baseline)} duplicates, "
+                      f"{sum(labels)} planted, in {time.perf_counter() - start:.1f} s")
+
+                index = measure_index(snapshot)
+                print(f"  index: full load {index['full_load_s']:.2f} s, {index['memory_mb']:.1f} MB "
+                      f"(peak {index['peak_mb']:.1f} MB); snapshot start {index['snapshot_start_s'] * 1000:.1f} ms "
+                      f"({index['snapshot_mb']:.1f} MB file)")
+
+                print(f"  {'method':<8} {'checks':>6} {'mean ms':>9} {'p95 ms':>9} {'checks/s':>10} {'peak KB':>9} "
+                      f"{'P':>6} {'R':>6}   {'P lbl':>6} {'R lbl':>6}")
+                for name in args.methods:
+                    result = run_method(name, checks, baseline, labels, args.threshold, args.slow_queries)
+                    p95 = f"{result['p95_ms']:9.2f}" if result['p95_ms'] is not None else f"{'-':>9}"
+                    print(f"  {name:<8} {result['checks']:>6} {result['mean_ms']:9.2f} {p95} "
+                          f"{result['checks_per_second']:10.1f} {result['peak_kb']:9.0f} "
+                          f"{result['precision']:6.3f} {result['recall']:6.3f}   "
+                          f"{result['label_precision']:6.3f} {result['label_recall']:6.3f}")
+                    results.append(dict(result, size=size, **{f"index_{key}": value for key, value in index.items()}))
+            deduplication._headline_index.invalidate()
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+    print(f"\nPeak process memory: {max_rss:.0f} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headline deduplication")
+    parser.add_argument('--queries', type=int, default=None,
+                        help="New headlines per batch, or checks per archive with --suite (default: 1000, 500 with --suite)")
+    parser.add_argument('--candidates', type=int, default=100000, help="Stored headlines")
+    parser.add_argument('--sample', type=int, default=20,
+                        help="New headlines timed with the per-pair loop (extrapolated to the batch)")
+    parser.add_argument('--duplicate-rate', type=float, default=0.2, help="Share of new headlines that rewrite stored ones")
+    parser.add_argument('--threshold', type=int, default=85, help="Similarity threshold")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--suite', action='store_true', help="Benchmark dedup methods on archives of each --sizes")
+    parser.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')],
+                        default=[1000, 10000, 100000, 1000000], help="Archive sizes for --suite")
+    parser.add_argument('--methods', type=lambda value: value.split(','), default=list(METHODS),
+                        help=f"Methods for --suite ({', '.join(METHODS)})")
+    parser.add_argument('--near-miss-rate', type=float, default=0.1,
+                        help="Share of new headlines that start like a stored one but are new stories (--suite)")
+    parser.add_argument('--slow-queries', type=int, default=20,
+                        help="Checks run with slow methods such as scan (--suite)")
+    parser.add_argument('--workdir', help="Keep archive databases here and reuse them across runs (--suite)")
+    parser.add_argument('--output', help="Write --suite results to this JSON file")
+    args = parser.parse_args()
+    if args.queries is None:
+        args.queries = 500 if args.suite else 1000
+
+    if args.suite:
+        results = run_suite(args)
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=2))
+            print(f"Results written to {args.output}")
+        return
+
+    new, stored = generate_headlines(args.queries, args.candidates, args.duplicate_rate, args.seed)
+    sample = new[:min(args.sample, len(new))]
+    print(f"{len(new)} new headlines x {len(stored)} stored (threshold {args.threshold}, "
+          f"max {config.DEDUP_BATCH_MAX_CELLS} cells per block)")
+
+    start = time.perf_counter()
+    loop_results = [loop_match(headline, stored, args.threshold) for headline in sample]
+    loop_per_headline = (time.perf_counter() - start) / len(sample)
+    print(f"  loop   {loop_per_headline * 1000:9.1f} ms/headline   "
+          f"~{loop_per_headline * len(new):8.1f} s for the batch (from {len(sample)} headlines)")
+
+    start = time.perf_counter()
+    batch_results = match_headlines_batch(new, stored, args.threshold)
+    batch_elapsed = time.perf_counter() - start
+    print(f"  batch  {batch_elapsed / len(new) * 1000:9.2f} ms/headline    {batch_elapsed:8.1f} s for the batch")
+    print(f"  speedup: ~{loop_per_headline * len(new) / batch_elapsed:.0f}x")
+
+    duplicates = sum(1 for result in batch_results if result)
+    print(f"  {duplicates}/{len(new)} new headlines flagged as duplicates")
+    mismatches = [i for i, result in enumerate(loop_results) if result != batch_results[i]]
+    print(f"  decisions differ from the loop on {len(mismatches)}/{len(sample)} sampled headlines")
+    for i in mismatches:
+        print(f"    {new[i]!r}: loop {loop_results[i]}, batch {batch_results[i]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Benchmark article text extraction against saved HTML fixtures.
+
+Compares the original BeautifulSoup/html.parser extraction with
+scraper.extract_text_from_html on pages saved from our RSS sources.
+
+Usage:
+    python benchmark_extraction.py --save           # download fixtures from current feeds
+    python benchmark_extraction.py [--rounds N]     # run the benchmark
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import feedparser
+from bs4 import BeautifulSoup
+import config
+import scraper
+
+DEFAULT_FIXTURES_DIR = config.BASE_DIR / "data" / "html_fixtures"
+
+
+def legacy_extract_text(html: bytes, url: Optional[str] = None) -> Optional[str]:
+    """Extraction as originally implemented in extract_article_content."""
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    content = None
+    for selector in ['article', '.article-content', '.post-content', '.entry-content', 'main', '.content']:
+        content = soup.select_one(selector)
+        if content:
+            break
+    if not content:
+        content = soup.find('body')
+
+    if content:
+        text = content.get_text(separator=' ', strip=True)
+        return ' '.join(text.split())[:10000]
+    return None
+
+
+def save_fixtures(fixtures_dir: Path, per_source: int = 5):
+    """Download the latest article pages from each configured feed."""
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    index = {}
+    for source_name, feed_url in config.RSS_SOURCES.items():
+        feed = feedparser.parse(feed_url)
+        saved = 0
+        for entry in feed.entries:
+            if saved >= per_source:
+                break
+            url = entry.get('link')
+            html = scraper.download_article_page(url) if url else None
+            if not html:
+                continue
+            filename = f"{source_name}_{saved}.html"
+            (fixtures_dir / filename).write_bytes(html)
+            index[filename] = url
+            saved += 1
+        print(f"Saved {saved} pages from {source_name}")
+    (fixtures_dir / "index.json").write_text(json.dumps(index, indent=2))
+
+
+def load_fixtures(fixtures_dir: Path) -> List[Tuple[str, bytes]]:
+    """Load (url, html) pairs from a fixtures directory."""
+    index_file = fixtures_dir / "index.json"
+    index = json.loads(index_file.read_text()) if index_file.exists() else {}
+    return [
+        (index.get(path.name, f"https://{path.stem.split('_')[0]}.example/{path.name}"), path.read_bytes())
+        for path in sorted(fixtures_dir.glob("*.html"))
+    ]
+
+
+def run_benchmark(name: str, extract: Callable, pages: List[Tuple[str, bytes]], rounds: int) -> Dict:
+    """Time an extraction function and measure its allocations."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for url, html in pages:
+            extract(html, url)
+    elapsed = time.perf_counter() - start
+
+    # Allocations are measured on a separate pass; tracemalloc skews timing
+    peaks = []
+    tracemalloc.start()
+    for url, html in pages:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        extract(html, url)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {
+        'name': name,
+        'pages_per_second': rounds * len(pages) / elapsed,
+        'avg_peak_kb': sum(peaks) / len(peaks) / 1024,
+        'max_peak_kb': max(peaks) / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark article text extraction")
+    parser.add_argument('--fixtures', type=Path, default=DEFAULT_FIXTURES_DIR,
+                        help="Directory of saved HTML pages")
+    parser.add_argument('--save', action='store_true', help="Download fresh fixtures and exit")
+    parser.add_argument('--per-source', type=int, default=5, help="Pages to save per source")
+    parser.add_argument('--rounds', type=int, default=5, help="Timed passes over the fixtures")
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures(args.fixtures, args.per_source)
+        return
+
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        print(f"No fixtures found in {args.fixtures}. Run with --save first.")
+        return
+
+    print(f"Benchmarking {len(pages)} pages x {args.rounds} rounds (parser: {scraper.HTML_PARSER})")
+    results = [
+        run_benchmark('legacy', legacy_extract_text, pages, args.rounds),
+        run_benchmark('current', scraper.extract_text_from_html, pages, args.rounds),
+    ]
+    for result in results:
+        print(f"  {result['name']:<8} {result['pages_per_second']:8.1f} pages/s   "
+              f"avg peak {result['avg_peak_kb']:8.1f} KB   max peak {result['max_peak_kb']:8.1f} KB")
+    print(f"  speedup: {results[1]['pages_per_second'] / results[0]['pages_per_second']:.2f}x")
+
+    mismatches = [url for url, html in pages
+                  if legacy_extract_text(html, url) != scraper.extract_text_from_html(html, url)]
+    print(f"  output differs from legacy on {len(mismatches)}/{len(pages)} pages")
+    for url in mismatches:
+        print(f"    {url}")
+
+
+if __name__ == "__main__":
+    main()
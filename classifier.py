@@ -1,8 +1,10 @@
 """Relevance filtering and classification orchestration."""
 import logging
 from typing import List, Dict
-from database import get_connection, insert_classification
-from llm_processor import classify_article, batch_classify_articles
+from database import get_connection, insert_classification, insert_classification_with_assessment
+from llm_processor import batch_classify_articles
+from relevance_prefilter import apply_prefilter
+from stories import get_story_leads, get_story_classifications, copy_classification, story_locks
 import config
 
 logger = logging.getLogger(__name__)
@@ -35,12 +37,62 @@ def filter_by_relevance(articles: List[Dict], threshold: int = None) -> List[Dic
 def classify_and_store_articles(article_ids: List[int]) -> Dict[int, Dict]:
     """Classify articles and store results in database.
     
+    Story members are not sent to the LLM; they take the classification of
+    their story's lead, which is classified first if it has not been yet.
+    
     Args:
         article_ids: List of article IDs to classify
         
     Returns:
         Dictionary mapping article_id to classification results
     """
+    leads = get_story_leads(article_ids)
+    # Serializes work on a story, so a lead and its members in parallel workers share one LLM call
+    with story_locks(leads.get(article_id, article_id) for article_id in article_ids):
+        classifications = {}
+        waiting = []
+        for member_id, lead_id in leads.items():
+            classification = copy_classification(lead_id, member_id)
+            if classification:
+                classifications[member_id] = classification
+            else:
+                waiting.append(member_id)
+        
+        to_classify = [article_id for article_id in article_ids if article_id not in leads]
+        to_classify = list(dict.fromkeys(to_classify + [leads[member_id] for member_id in waiting]))
+        # A lead may have been classified for one of its members while we waited for the lock
+        done = get_story_classifications(to_classify)
+        classifications.update(done)
+        to_classify = [article_id for article_id in to_classify if article_id not in done]
+        if to_classify:
+            classifications.update(_classify_and_store(to_classify))
+        
+        for member_id in waiting:
+            classification = copy_classification(leads[member_id], member_id)
+            if classification:
+                classifications[member_id] = classification
+    
+    if leads:
+        logger.info(f"{len(leads)} story members took their lead's classification")
+    
+    # Filter by relevance threshold
+    relevant_classifications = {
+        aid: cls for aid, cls in classifications.items()
+        if cls['relevance'] >= config.RELEVANCE_THRESHOLD
+    }
+    
+    logger.info(f"{len(relevant_classifications)}/{len(classifications)} articles meet relevance threshold")
+    
+    return relevant_classifications
+
+
+def _classify_and_store(article_ids: List[int]) -> Dict[int, Dict]:
+    """Classify articles with the LLM and store the results (all of them, relevant or not).
+    
+    With LLM_COMBINED_REVIEW the same call also assesses the threat level,
+    and the classification and threat assessment are stored together, so
+    the articles never wait for a separate auto-review.
+    """
     # Fetch articles from database
     conn = get_connection()
     cursor = conn.cursor()
@@ -62,47 +114,67 @@ def classify_and_store_articles(article_ids: List[int]) -> Dict[int, Dict]:
         logger.warning("No articles found to classify")
         return {}
     
+    # Confident negatives of the local pre-filter skip the LLM (PREFILTER_MODE=enforce)
+    articles = apply_prefilter(articles)
+    if not articles:
+        return {}
+    
     # Classify articles
-    classifications = batch_classify_articles(articles)
+    combined = config.LLM_COMBINED_REVIEW
+    classifications = batch_classify_articles(articles, combined=combined)
     
     # Store classifications in database
     stored_count = 0
     for article_id, classification in classifications.items():
         try:
-            insert_classification(
-                article_id=article_id,
-                relevance_score=classification['relevance'],
-                category=classification['category'],
-                product_impact=classification['product_impact'],
-                summary=classification['summary'],
-                llm_response=classification.get('llm_response', '')
-            )
+            if combined:
+                insert_classification_with_assessment(
+                    article_id=article_id,
+                    relevance_score=classification['relevance'],
+                    category=classification['category'],
+                    product_impact=classification['product_impact'],
+                    summary=classification['summary'],
+                    llm_response=classification.get('llm_response', ''),
+                    threat_level=classification['threat_level'],
+                    action_recommendation=classification['action_recommendation'],
+                    reviewed_by="ai-auto-reviewer"
+                )
+            else:
+                insert_classification(
+                    article_id=article_id,
+                    relevance_score=classification['relevance'],
+                    category=classification['category'],
+                    product_impact=classification['product_impact'],
+                    summary=classification['summary'],
+                    llm_response=classification.get('llm_response', '')
+                )
             stored_count += 1
         except Exception as e:
             logger.error(f"Error storing classification for article {article_id}: {e}")
     
     logger.info(f"Stored {stored_count} classifications")
     
-    # Filter by relevance threshold
-    relevant_classifications = {
-        aid: cls for aid, cls in classifications.items()
-        if cls['relevance'] >= config.RELEVANCE_THRESHOLD
-    }
-    
-    logger.info(f"{len(relevant_classifications)}/{len(classifications)} articles meet relevance threshold")
-    
-    return relevant_classifications
+    return classifications
 
 
 def get_unclassified_articles(limit: int = 50) -> List[int]:
-    """Get article IDs that haven't been classified yet."""
+    """Get article IDs that haven't been classified yet.
+    
+    Articles the pre-filter kept from the LLM, and members of stories whose
+    lead it kept from the LLM, are not returned.
+    """
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT a.id
         FROM articles a
         LEFT JOIN classifications c ON a.id = c.article_id
+        LEFT JOIN stories s ON s.id = a.story_id
         WHERE c.id IS NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM prefilter_decisions p
+              WHERE p.skipped = 1 AND p.article_id IN (a.id, s.lead_article_id)
+          )
         ORDER BY a.processed_at DESC
         LIMIT ?
     """, (limit,))
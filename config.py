@@ -21,6 +21,18 @@ SLACK_CHANNEL_ALERTS = os.getenv("SLACK_CHANNEL_ALERTS", "competitor-intel-alert
 RELEVANCE_THRESHOLD = int(os.getenv("RELEVANCE_THRESHOLD", "3"))
 MAX_DAILY_ITEMS = int(os.getenv("MAX_DAILY_ITEMS", "5"))
 TIMEZONE = os.getenv("TIMEZONE", "America/New_York")
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))  # classification requests in flight at once
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "1"))  # articles per classification request (1 = one per request)
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "12000"))  # estimated input tokens per batched request
+LLM_BATCH_TEXT_CHARS = int(os.getenv("LLM_BATCH_TEXT_CHARS", "3000"))  # article text kept per article in a batch
+LLM_COMBINED_REVIEW = os.getenv("LLM_COMBINED_REVIEW", "false").lower() == "true"  # classify + assess threat in one call
+LLM_PROMPT_CACHING = os.getenv("LLM_PROMPT_CACHING", "false").lower() == "true"  # cache_control on fixed instructions (ignored below 2048 tokens)
+PREFILTER_MODE = os.getenv("PREFILTER_MODE", "off").lower()  # off | shadow | enforce
+PREFILTER_MIN_RECALL = float(os.getenv("PREFILTER_MIN_RECALL", "0.98"))  # relevant articles kept on held-out data
+PREFILTER_MIN_SAMPLES = int(os.getenv("PREFILTER_MIN_SAMPLES", "200"))  # classified articles needed to train
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"  # reuse results of identical requests
+LLM_CACHE_TTL_HOURS = int(os.getenv("LLM_CACHE_TTL_HOURS", "720"))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "50"))
 
 # Database Configuration
 DATABASE_PATH = os.getenv("DATABASE_PATH", str(BASE_DIR / "data" / "ci_bot.db"))
@@ -29,7 +41,7 @@ DATABASE_PATH = os.getenv("DATABASE_PATH", str(BASE_DIR / "data" / "ci_bot.db"))
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FILE = os.getenv("LOG_FILE", str(BASE_DIR / "logs" / "ci_bot.log"))
 
-# RSS Feed Sources
+# RSS Feed Sources (seed list for the sources table; manage with source_registry.py)
 RSS_SOURCES = {
     "adexchanger": "https://www.adexchanger.com/feed/",
     "digiday": "https://digiday.com/feed/",
@@ -37,6 +49,60 @@ RSS_SOURCES = {
     "adweek": "https://www.adweek.com/category/artificial-intelligence/feed/",
 }
 
+# Feed Fetching
+FEED_FETCH_WORKERS = int(os.getenv("FEED_FETCH_WORKERS", "8"))
+FEED_FETCH_TIMEOUT = int(os.getenv("FEED_FETCH_TIMEOUT", "20"))  # seconds per feed
+FEED_CONDITIONAL_GET = os.getenv("FEED_CONDITIONAL_GET", "true").lower() == "true"
+
+# Source Health (circuit breaker for failing feeds)
+SOURCE_FAILURE_THRESHOLD = int(os.getenv("SOURCE_FAILURE_THRESHOLD", "3"))
+SOURCE_BACKOFF_BASE_MINUTES = int(os.getenv("SOURCE_BACKOFF_BASE_MINUTES", "30"))
+SOURCE_BACKOFF_MAX_HOURS = int(os.getenv("SOURCE_BACKOFF_MAX_HOURS", "24"))
+
+# Article Scraping
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "8"))
+SCRAPE_MAX_PER_HOST = int(os.getenv("SCRAPE_MAX_PER_HOST", "2"))
+SCRAPE_HOST_INTERVAL = float(os.getenv("SCRAPE_HOST_INTERVAL", "0.5"))  # seconds between requests to one host
+SCRAPE_MAX_PAGE_BYTES = int(os.getenv("SCRAPE_MAX_PAGE_BYTES", str(2 * 1024 * 1024)))
+SCRAPE_CACHE_ENABLED = os.getenv("SCRAPE_CACHE_ENABLED", "true").lower() == "true"
+SCRAPE_CACHE_TTL_HOURS = int(os.getenv("SCRAPE_CACHE_TTL_HOURS", "168"))
+SCRAPE_CACHE_MAX_MB = int(os.getenv("SCRAPE_CACHE_MAX_MB", "200"))
+
+# Pipeline Configuration
+PIPELINE_STREAMING = os.getenv("PIPELINE_STREAMING", "false").lower() == "true"
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "20"))
+PIPELINE_CLASSIFY_WORKERS = int(os.getenv("PIPELINE_CLASSIFY_WORKERS", "2"))
+
+# Adaptive Polling (per-source interval jobs in addition to the daily run)
+ADAPTIVE_POLLING = os.getenv("ADAPTIVE_POLLING", "false").lower() == "true"
+POLL_MIN_MINUTES = int(os.getenv("POLL_MIN_MINUTES", "15"))
+POLL_MAX_MINUTES = int(os.getenv("POLL_MAX_MINUTES", "360"))
+POLL_TARGET_ITEMS = float(os.getenv("POLL_TARGET_ITEMS", "1"))  # expected new articles per poll
+POLL_HISTORY_DAYS = int(os.getenv("POLL_HISTORY_DAYS", "14"))
+POLL_JITTER_SECONDS = int(os.getenv("POLL_JITTER_SECONDS", "120"))
+POLL_MAX_CONCURRENT = int(os.getenv("POLL_MAX_CONCURRENT", "2"))
+
+# Deduplication
+DEDUP_INDEX_ENABLED = os.getenv("DEDUP_INDEX_ENABLED", "true").lower() == "true"
+DEDUP_INDEX_MAX_AGE_SECONDS = int(os.getenv("DEDUP_INDEX_MAX_AGE_SECONDS", "3600"))  # full reload interval
+DEDUP_SNAPSHOT_ENABLED = os.getenv("DEDUP_SNAPSHOT_ENABLED", "true").lower() == "true"  # mmap index on startup
+DEDUP_SNAPSHOT_PATH = os.getenv("DEDUP_SNAPSHOT_PATH", "")  # defaults to <DATABASE_PATH>.dedup-snapshot
+DEDUP_SNAPSHOT_MAX_AGE_HOURS = int(os.getenv("DEDUP_SNAPSHOT_MAX_AGE_HOURS", "24"))  # older snapshots are rebuilt
+DEDUP_SNAPSHOT_MAX_DELTA = int(os.getenv("DEDUP_SNAPSHOT_MAX_DELTA", "2000"))  # in-memory articles before re-snapshot
+DEDUP_BATCH_MAX_CELLS = int(os.getenv("DEDUP_BATCH_MAX_CELLS", "8000000"))  # score matrix entries per block
+DEDUP_WINDOW_DAYS = int(os.getenv("DEDUP_WINDOW_DAYS", "7"))  # headline matching lookback (0 = whole archive)
+DEDUP_WINDOW_COLUMN = os.getenv("DEDUP_WINDOW_COLUMN", "processed_at")  # processed_at or pub_date
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "true").lower() == "true"  # MinHash/LSH on full text
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))  # estimated Jaccard similarity
+NEAR_DUP_NUM_PERM = int(os.getenv("NEAR_DUP_NUM_PERM", "128"))  # MinHash signature length
+NEAR_DUP_BANDS = int(os.getenv("NEAR_DUP_BANDS", "32"))  # LSH bands (NUM_PERM / BANDS rows each)
+NEAR_DUP_SHINGLE_SIZE = int(os.getenv("NEAR_DUP_SHINGLE_SIZE", "5"))  # words per shingle
+NEAR_DUP_MIN_WORDS = int(os.getenv("NEAR_DUP_MIN_WORDS", "50"))  # shorter texts are not indexed
+STORY_CLUSTERING = os.getenv("STORY_CLUSTERING", "true").lower() == "true"  # group other sources' coverage into stories
+
+# Backfill
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "5000"))
+
 # Scheduled Times (24-hour format)
 SCHEDULE_RSS_PROCESSING = "06:00"  # 6:00 AM daily
 SCHEDULE_EDITOR_REMINDER = "07:30"  # 7:30 AM daily
@@ -0,0 +1,110 @@
+"""Persistent cache of scraped article text keyed by canonical URL."""
+import logging
+import threading
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import config
+from database import evict_cache_entries, get_connection
+from url_normalizer import url_hash
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0}
+
+
+def _record(hit: bool, page_bytes: int = 0):
+    with _stats_lock:
+        if hit:
+            _stats['hits'] += 1
+            _stats['bytes_saved'] += page_bytes
+        else:
+            _stats['misses'] += 1
+
+
+def get_cached_content(url: str, ttl_hours: int = None) -> Optional[str]:
+    """Return cached article text for a URL, or None if missing or expired."""
+    if ttl_hours is None:
+        ttl_hours = config.SCRAPE_CACHE_TTL_HOURS
+    cutoff = (datetime.now() - timedelta(hours=ttl_hours)).isoformat()
+    key = url_hash(url)
+    
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT content, page_bytes FROM scrape_cache
+            WHERE url_key = ? AND created_at >= ?
+        """, (key, cutoff))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute("UPDATE scrape_cache SET last_accessed = ? WHERE url_key = ?",
+                           (datetime.now().isoformat(), key))
+            conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.warning(f"Scrape cache lookup failed for {url}: {e}")
+        _record(False)
+        return None
+    
+    if not row:
+        _record(False)
+        return None
+    
+    _record(True, row['page_bytes'] or 0)
+    return zlib.decompress(row['content']).decode('utf-8')
+
+
+def cache_content(url: str, text: str, page_bytes: int = 0):
+    """Store extracted article text for a URL."""
+    raw = text.encode('utf-8')
+    compressed = zlib.compress(raw, 6)
+    now = datetime.now().isoformat()
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO scrape_cache
+            (url_key, url, content, text_bytes, page_bytes, stored_bytes, created_at, last_accessed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (url_hash(url), url, compressed, len(raw), page_bytes, len(compressed), now, now))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.warning(f"Failed to cache content for {url}: {e}")
+
+
+def evict_scrape_cache(ttl_hours: int = None, max_bytes: int = None) -> int:
+    """Drop expired entries, then least recently used ones until under the size cap.
+    
+    Scans the whole table, so callers run it once per pipeline run rather
+    than per scrape.
+    
+    Returns:
+        Number of entries removed
+    """
+    if ttl_hours is None:
+        ttl_hours = config.SCRAPE_CACHE_TTL_HOURS
+    if max_bytes is None:
+        max_bytes = config.SCRAPE_CACHE_MAX_MB * 1024 * 1024
+    cutoff = (datetime.now() - timedelta(hours=ttl_hours)).isoformat()
+    
+    try:
+        removed = evict_cache_entries('scrape_cache', cutoff, max_bytes)
+    except Exception as e:
+        # Eviction is housekeeping; never let it fail a fetch or scrape run
+        logger.warning(f"Scrape cache eviction failed: {e}")
+        return 0
+    if removed:
+        logger.info(f"Evicted {removed} entries from scrape cache")
+    return removed
+
+
+def get_cache_stats() -> Dict[str, float]:
+    """Get hit/miss counters for this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
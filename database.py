@@ -3,8 +3,9 @@ import sqlite3
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import config
+from url_normalizer import url_hash
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +33,28 @@ def init_database():
             source TEXT NOT NULL,
             pub_date TEXT,
             full_text TEXT,
-            processed_at TEXT DEFAULT CURRENT_TIMESTAMP
+            processed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            url_hash TEXT,
+            story_id INTEGER
+        )
+    """)
+    
+    # Columns added after the table was first released
+    cursor.execute("PRAGMA table_info(articles)")
+    article_columns = {row['name'] for row in cursor.fetchall()}
+    if 'url_hash' not in article_columns:
+        cursor.execute("ALTER TABLE articles ADD COLUMN url_hash TEXT")
+        _fill_url_hashes(cursor)
+    if 'story_id' not in article_columns:
+        cursor.execute("ALTER TABLE articles ADD COLUMN story_id INTEGER")
+    
+    # Story clusters: articles from several sources covering the same news
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lead_article_id INTEGER NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (lead_article_id) REFERENCES articles(id)
         )
     """)
     
@@ -79,52 +101,412 @@ def init_database():
         )
     """)
     
+    # Feed validators table (HTTP conditional GET state per feed)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feed_validators (
+            feed_url TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            body_hash TEXT,
+            checked_at TEXT,
+            changed_at TEXT
+        )
+    """)
+    
+    # Feed source registry with fetch health
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sources (
+            name TEXT PRIMARY KEY,
+            feed_url TEXT NOT NULL,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            last_success_at TEXT,
+            last_failure_at TEXT,
+            last_error TEXT,
+            consecutive_failures INTEGER NOT NULL DEFAULT 0,
+            total_fetches INTEGER NOT NULL DEFAULT 0,
+            avg_latency_ms REAL,
+            avg_items REAL,
+            avg_bytes REAL,
+            next_attempt_at TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Seed the registry with the configured feeds (existing rows are left alone)
+    cursor.executemany("""
+        INSERT OR IGNORE INTO sources (name, feed_url) VALUES (?, ?)
+    """, list(config.RSS_SOURCES.items()))
+    
+    # Backfill import progress, committed together with each batch of articles
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            input_key TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+    """)
+    
+    # Scraped article text cache (zlib-compressed, keyed by normalized URL hash)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_cache (
+            url_key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            content BLOB NOT NULL,
+            text_bytes INTEGER,
+            page_bytes INTEGER,
+            stored_bytes INTEGER,
+            created_at TEXT NOT NULL,
+            last_accessed TEXT NOT NULL
+        )
+    """)
+    
+    # Parsed LLM results keyed by a hash of the request (model, prompt, parameters)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            request_key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            model TEXT,
+            result TEXT NOT NULL,
+            stored_bytes INTEGER,
+            hits INTEGER DEFAULT 0,
+            created_at TEXT NOT NULL,
+            last_accessed TEXT NOT NULL
+        )
+    """)
+    
+    # Local relevance pre-filter: trained models and their per-article decisions
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS prefilter_models (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            samples INTEGER,
+            positives INTEGER,
+            skip_below REAL NOT NULL,
+            holdout_recall REAL,
+            holdout_skip_rate REAL,
+            weights BLOB NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS prefilter_decisions (
+            article_id INTEGER PRIMARY KEY,
+            model_id INTEGER,
+            probability REAL,
+            would_skip INTEGER,
+            skipped INTEGER,
+            mode TEXT,
+            reason TEXT,
+            decided_at TEXT,
+            FOREIGN KEY (article_id) REFERENCES articles(id),
+            FOREIGN KEY (model_id) REFERENCES prefilter_models(id)
+        )
+    """)
+    
+    # MinHash signatures of article full text and their LSH band buckets
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS article_signatures (
+            article_id INTEGER PRIMARY KEY,
+            signature BLOB NOT NULL,
+            FOREIGN KEY (article_id) REFERENCES articles(id)
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS lsh_buckets (
+            bucket INTEGER NOT NULL,
+            article_id INTEGER NOT NULL,
+            FOREIGN KEY (article_id) REFERENCES articles(id)
+        )
+    """)
+    
     # Create indexes
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_url ON articles(url)")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_url_hash ON articles(url_hash)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_source ON articles(source)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_pub_date ON articles(pub_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_processed_at ON articles(processed_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_story_id ON articles(story_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_classifications_article_id ON classifications(article_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_threat_assessments_article_id ON threat_assessments(article_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_threat_assessments_reviewed_at ON threat_assessments(reviewed_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scrape_cache_last_accessed ON scrape_cache(last_accessed)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache(last_accessed)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets_bucket ON lsh_buckets(bucket)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets_article_id ON lsh_buckets(article_id)")
     
     conn.commit()
     conn.close()
     logger.info("Database initialized successfully")
 
 
+def _fill_url_hashes(cursor):
+    """Set url_hash on existing articles, oldest first.
+    
+    Later articles whose canonical URL matches an earlier one keep a NULL
+    hash so the unique index can still be created.
+    """
+    cursor.execute("SELECT id, url FROM articles ORDER BY id")
+    seen = set()
+    updates = []
+    duplicates = 0
+    for row in cursor.fetchall():
+        value = url_hash(row['url'])
+        if value in seen:
+            duplicates += 1
+            continue
+        seen.add(value)
+        updates.append((value, row['id']))
+    cursor.executemany("UPDATE articles SET url_hash = ? WHERE id = ?", updates)
+    logger.info(f"Added url_hash to {len(updates)} articles "
+                f"({duplicates} share a canonical URL with an earlier article)")
+
+
 def article_exists(url: str) -> bool:
-    """Check if article with given URL already exists."""
+    """Check if an article with the same canonical URL already exists."""
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM articles WHERE url = ?", (url,))
+    cursor.execute("SELECT 1 FROM articles WHERE url_hash = ?", (url_hash(url),))
     exists = cursor.fetchone() is not None
     conn.close()
     return exists
 
 
 def insert_article(headline: str, url: str, source: str, pub_date: Optional[str] = None, 
-                   full_text: Optional[str] = None) -> int:
-    """Insert a new article and return its ID."""
+                   full_text: Optional[str] = None, story_id: Optional[int] = None) -> int:
+    """Insert a new article and return its ID (or the ID of the article with the same canonical URL)."""
     conn = get_connection()
     cursor = conn.cursor()
+    hashed_url = url_hash(url)
     try:
         cursor.execute("""
-            INSERT INTO articles (headline, url, source, pub_date, full_text)
-            VALUES (?, ?, ?, ?, ?)
-        """, (headline, url, source, pub_date, full_text))
+            INSERT INTO articles (headline, url, source, pub_date, full_text, url_hash, story_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (headline, url, source, pub_date, full_text, hashed_url, story_id))
         article_id = cursor.lastrowid
         conn.commit()
         logger.info(f"Inserted article: {headline[:50]}...")
         return article_id
     except sqlite3.IntegrityError:
         logger.warning(f"Article already exists: {url}")
-        cursor.execute("SELECT id FROM articles WHERE url = ?", (url,))
+        cursor.execute("SELECT id FROM articles WHERE url_hash = ? OR url = ?", (hashed_url, url))
         result = cursor.fetchone()
         return result['id'] if result else None
     finally:
         conn.close()
 
 
+def get_feed_validators() -> Dict[str, Dict[str, Any]]:
+    """Get stored HTTP validators for all feeds, keyed by feed URL."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT feed_url, source, etag, last_modified, body_hash, checked_at, changed_at
+        FROM feed_validators
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+    return {row['feed_url']: dict(row) for row in rows}
+
+
+def update_feed_validator(feed_url: str, source: str, etag: Optional[str],
+                          last_modified: Optional[str], body_hash: Optional[str],
+                          changed: bool = True):
+    """Record the validators returned by the latest fetch of a feed."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    now = datetime.now().isoformat()
+    if changed:
+        cursor.execute("""
+            INSERT OR REPLACE INTO feed_validators
+            (feed_url, source, etag, last_modified, body_hash, checked_at, changed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (feed_url, source, etag, last_modified, body_hash, now, now))
+    else:
+        cursor.execute("""
+            UPDATE feed_validators SET checked_at = ? WHERE feed_url = ?
+        """, (now, feed_url))
+    conn.commit()
+    conn.close()
+
+
+def get_sources(enabled_only: bool = True) -> List[Dict[str, Any]]:
+    """Get registered feed sources with their health stats."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    query = "SELECT * FROM sources"
+    if enabled_only:
+        query += " WHERE enabled = 1"
+    cursor.execute(query + " ORDER BY name")
+    rows = cursor.fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def upsert_source(name: str, feed_url: str, enabled: bool = True):
+    """Add a feed source or update its URL and enabled flag."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO sources (name, feed_url, enabled) VALUES (?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET feed_url = excluded.feed_url, enabled = excluded.enabled
+    """, (name, feed_url, int(enabled)))
+    conn.commit()
+    conn.close()
+    logger.info(f"Registered source {name}: {feed_url} ({'enabled' if enabled else 'disabled'})")
+
+
+def record_source_success(name: str, latency_ms: float, items: Optional[int], bytes_fetched: int,
+                          smoothing: float = 0.3):
+    """Record a successful fetch, closing the source's circuit breaker.
+    
+    Averages are exponentially weighted with the given smoothing factor.
+    items is None when the feed was not parsed (unchanged since the last
+    fetch), which leaves the item average as it was.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE sources SET
+            last_success_at = ?,
+            consecutive_failures = 0,
+            next_attempt_at = NULL,
+            total_fetches = total_fetches + 1,
+            avg_latency_ms = COALESCE(avg_latency_ms * (1 - ?) + ? * ?, ?),
+            avg_items = CASE WHEN ? IS NULL THEN avg_items ELSE COALESCE(avg_items * (1 - ?) + ? * ?, ?) END,
+            avg_bytes = COALESCE(avg_bytes * (1 - ?) + ? * ?, ?)
+        WHERE name = ?
+    """, (datetime.now().isoformat(),
+          smoothing, smoothing, latency_ms, latency_ms,
+          items, smoothing, smoothing, items, items,
+          smoothing, smoothing, bytes_fetched, bytes_fetched,
+          name))
+    conn.commit()
+    conn.close()
+
+
+def record_source_failure(name: str, error: str) -> int:
+    """Record a failed fetch of a source.
+    
+    Returns:
+        Number of consecutive failures including this one
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE sources SET
+            last_failure_at = ?,
+            last_error = ?,
+            consecutive_failures = consecutive_failures + 1,
+            total_fetches = total_fetches + 1
+        WHERE name = ?
+    """, (datetime.now().isoformat(), error[:500], name))
+    cursor.execute("SELECT consecutive_failures FROM sources WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    conn.commit()
+    conn.close()
+    return row['consecutive_failures'] if row else 0
+
+
+def set_source_next_attempt(name: str, next_attempt_at: Optional[str]):
+    """Set the earliest time a source may be fetched again (None to allow it now)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE sources SET next_attempt_at = ? WHERE name = ?", (next_attempt_at, name))
+    conn.commit()
+    conn.close()
+
+
+def insert_articles_bulk(articles: List[Dict[str, Any]],
+                         checkpoint: Optional[Tuple[str, int, bool]] = None) -> int:
+    """Insert many articles in a single transaction, ignoring existing (canonical) URLs.
+    
+    Args:
+        articles: Article dicts with headline, url, source and optional
+            pub_date, full_text and processed_at keys
+        checkpoint: Optional (input_key, position, completed) backfill
+            checkpoint to save in the same transaction
+        
+    Returns:
+        Number of articles inserted
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        before = conn.total_changes
+        cursor.executemany("""
+            INSERT OR IGNORE INTO articles (headline, url, source, pub_date, full_text, processed_at, url_hash)
+            VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+        """, [(a['headline'], a['url'], a['source'], a.get('pub_date'), a.get('full_text'),
+               a.get('processed_at'), url_hash(a['url'])) for a in articles])
+        inserted = conn.total_changes - before
+        if checkpoint:
+            input_key, position, completed = checkpoint
+            cursor.execute("""
+                INSERT OR REPLACE INTO backfill_checkpoints (input_key, position, completed, updated_at)
+                VALUES (?, ?, ?, ?)
+            """, (input_key, position, int(completed), datetime.now().isoformat()))
+        conn.commit()
+        return inserted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def get_backfill_checkpoint(input_key: str) -> Optional[Dict[str, Any]]:
+    """Get the saved progress for a backfill input."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM backfill_checkpoints WHERE input_key = ?", (input_key,))
+    row = cursor.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+# Cache tables sharing created_at, last_accessed and stored_bytes columns, with their key column
+CACHE_TABLES = {'llm_cache': 'request_key', 'scrape_cache': 'url_key'}
+
+
+def evict_cache_entries(table: str, cutoff: str, max_bytes: int) -> int:
+    """Drop cache entries created before cutoff, then least recently used ones until under max_bytes.
+    
+    Args:
+        table: Cache table (a key of CACHE_TABLES)
+        cutoff: Oldest created_at (ISO format) kept
+        max_bytes: Size cap on the sum of stored_bytes
+        
+    Returns:
+        Number of entries removed
+    """
+    key_column = CACHE_TABLES[table]
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DELETE FROM {table} WHERE created_at < ?", (cutoff,))
+        removed = cursor.rowcount
+        
+        cursor.execute(f"SELECT COALESCE(SUM(stored_bytes), 0) AS total FROM {table}")
+        excess = cursor.fetchone()['total'] - max_bytes
+        if excess > 0:
+            cursor.execute(f"SELECT {key_column} AS cache_key, stored_bytes FROM {table} ORDER BY last_accessed")
+            doomed = []
+            for row in cursor.fetchall():
+                if excess <= 0:
+                    break
+                doomed.append((row['cache_key'],))
+                excess -= row['stored_bytes']
+            cursor.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", doomed)
+            removed += len(doomed)
+        
+        conn.commit()
+        return removed
+    finally:
+        conn.close()
+
+
 def insert_classification(article_id: int, relevance_score: int, category: str,
                          product_impact: str, summary: str, llm_response: str) -> int:
     """Insert classification for an article."""
@@ -142,6 +524,40 @@ def insert_classification(article_id: int, relevance_score: int, category: str,
     return classification_id
 
 
+def insert_classification_with_assessment(article_id: int, relevance_score: int, category: str,
+                                          product_impact: str, summary: str, llm_response: str,
+                                          threat_level: str, action_recommendation: str,
+                                          reviewed_by: str) -> int:
+    """Insert an article's classification and threat assessment in one transaction.
+    
+    Returns:
+        The classification ID
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO classifications (article_id, relevance_score, category, 
+                                        product_impact, summary, llm_response)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (article_id, relevance_score, category, product_impact, summary, llm_response))
+        classification_id = cursor.lastrowid
+        cursor.execute("""
+            INSERT OR REPLACE INTO threat_assessments 
+            (article_id, threat_level, product_impact, action_recommendation, reviewed_by, reviewed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (article_id, threat_level, product_impact, action_recommendation, reviewed_by,
+              datetime.now().isoformat()))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    logger.info(f"Inserted classification and threat assessment for article {article_id}: {threat_level}")
+    return classification_id
+
+
 def insert_threat_assessment(article_id: int, threat_level: str, product_impact: str,
                             action_recommendation: str, reviewed_by: str) -> int:
     """Insert or update threat assessment for an article."""
@@ -178,22 +594,46 @@ def get_pending_reviews() -> List[Dict[str, Any]]:
     return [dict(row) for row in rows]
 
 
+def get_pending_review(article_id: int) -> Optional[Dict[str, Any]]:
+    """Get a single classified article awaiting threat assessment."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT a.id, a.headline, a.url, a.source, a.pub_date,
+               c.relevance_score, c.category, c.product_impact, c.summary
+        FROM articles a
+        INNER JOIN classifications c ON a.id = c.article_id
+        LEFT JOIN threat_assessments t ON a.id = t.article_id
+        WHERE a.id = ? AND t.id IS NULL
+        ORDER BY c.created_at DESC
+        LIMIT 1
+    """, (article_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
 def get_reviewed_articles_for_digest(limit: int = 5) -> List[Dict[str, Any]]:
-    """Get reviewed articles ready for daily digest."""
+    """Get reviewed articles ready for daily digest.
+    
+    A story covered by several sources appears once, as its lead article.
+    """
     conn = get_connection()
     cursor = conn.cursor()
     # Get articles reviewed today or yesterday that haven't been delivered yet
     cursor.execute("""
-        SELECT a.id, a.headline, a.url, a.source, a.pub_date,
+        SELECT a.id, a.headline, a.url, a.source, a.pub_date, a.story_id,
                c.summary, c.category, c.product_impact,
                t.threat_level, t.action_recommendation
         FROM articles a
         INNER JOIN classifications c ON a.id = c.article_id
         INNER JOIN threat_assessments t ON a.id = t.article_id
+        LEFT JOIN stories s ON s.id = a.story_id
         WHERE t.reviewed_at >= date('now', '-2 days')
+        AND (a.story_id IS NULL OR s.lead_article_id = a.id)
         AND a.id NOT IN (
             SELECT DISTINCT json_each.value
-            FROM deliveries d
+            FROM deliveries d, json_each(d.articles_included)
             WHERE d.delivery_type = 'daily_digest'
             AND d.delivery_date >= date('now', '-1 day')
             AND json_valid(d.articles_included)
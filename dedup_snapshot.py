@@ -0,0 +1,165 @@
+"""Compact on-disk snapshot of the headline dedup index, memory-mapped on startup.
+
+The file holds the indexed article ids, headlines, URLs and window column
+values as flat arrays, plus the lowercased headlines the matcher scores as
+one NUL-separated block. Opening it maps the file and reads a small
+header, so startup cost does not grow with the number of articles; pages
+are read lazily as lookups touch them. Articles inserted after the snapshot (id above its
+last_id) are loaded from the database as a delta.
+"""
+import json
+import logging
+import mmap
+import os
+import sys
+import time
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'CIHDX001'
+FORMAT_VERSION = 2
+# Window column values ('2024-05-01 12:00:00' / '2024-05-01T12:00:00') are stored as fixed-width bytes
+WINDOW_WIDTH = 20
+
+
+def _pad(length: int) -> int:
+    return (8 - length % 8) % 8
+
+
+class HeadlineSnapshot:
+    """Read-only, memory-mapped view of a saved headline index.
+
+    Entries are addressed by position (0..len-1) in id order.
+    """
+
+    def __init__(self, path: str, mapped: mmap.mmap, header: dict, data_start: int):
+        self.path = path
+        self._mmap = mapped
+        self.header = header
+        self.last_id = header['last_id']
+        self.created_at = header['created_at']
+        view = memoryview(mapped)
+
+        def section(name: str, fmt: Optional[str] = None):
+            offset, length = header['sections'][name]
+            part = view[data_start + offset:data_start + offset + length]
+            return part.cast(fmt) if fmt else part
+
+        self.ids = section('ids', 'q')
+        self.window_values = section('window_values')
+        self.headline_offsets = section('headline_offsets', 'q')
+        self.headline_blob = section('headline_blob')
+        self.url_offsets = section('url_offsets', 'q')
+        self.url_blob = section('url_blob')
+        self.lowered_blob = section('lowered_blob')
+        self._lowered = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def open(cls, path: str) -> Optional['HeadlineSnapshot']:
+        """Map a snapshot file, or return None if it is missing or unreadable."""
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            if mapped[:8] != MAGIC:
+                raise ValueError("not a headline index snapshot")
+            header_length = int.from_bytes(mapped[8:16], 'little')
+            header = json.loads(mapped[16:16 + header_length].decode('utf-8'))
+            if header.get('version') != FORMAT_VERSION or header.get('byteorder') != sys.byteorder:
+                raise ValueError("written by an incompatible version or platform")
+            return cls(path, mapped, header, 16 + header_length + _pad(header_length))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring dedup snapshot {path}: {e}")
+            mapped.close()
+            return None
+
+    def headline(self, position: int) -> str:
+        start, end = self.headline_offsets[position], self.headline_offsets[position + 1]
+        return bytes(self.headline_blob[start:end]).decode('utf-8')
+
+    def url(self, position: int) -> str:
+        start, end = self.url_offsets[position], self.url_offsets[position + 1]
+        return bytes(self.url_blob[start:end]).decode('utf-8')
+
+    def window_value(self, position: int) -> bytes:
+        """Window column value as stored (NUL-padded bytes, empty if the article had none)."""
+        return bytes(self.window_values[position * WINDOW_WIDTH:(position + 1) * WINDOW_WIDTH]).rstrip(b'\0')
+
+    def position(self, article_id: int) -> Optional[int]:
+        """Position of an article id, or None if it is not in the snapshot."""
+        low, high = 0, len(self.ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self.ids[middle] < article_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < len(self.ids) and self.ids[low] == article_id else None
+
+    def lowered_headlines(self) -> List[str]:
+        """Lowercased headline of every entry, by position (decoded once, then kept)."""
+        if self._lowered is None:
+            self._lowered = bytes(self.lowered_blob).decode('utf-8').split('\0') if len(self) else []
+        return self._lowered
+
+    @staticmethod
+    def write(path: str, entries: Iterable[Tuple[int, str, str, Optional[str]]], **metadata) -> int:
+        """Write a snapshot atomically (to a temporary file, then renamed over path).
+
+        Args:
+            path: Snapshot file
+            entries: (article_id, headline, url, window_value) tuples in id order
+            metadata: Extra header fields (last_id, database_path, ...)
+
+        Returns:
+            Number of entries written
+        """
+        ids = array('q')
+        window_values = bytearray()
+        headline_offsets, headline_blob = array('q', [0]), bytearray()
+        url_offsets, url_blob = array('q', [0]), bytearray()
+        lowered = []
+        for article_id, headline, url, window_value in entries:
+            ids.append(article_id)
+            window_values += (window_value or '').encode('utf-8')[:WINDOW_WIDTH].ljust(WINDOW_WIDTH, b'\0')
+            headline_blob += headline.encode('utf-8')
+            headline_offsets.append(len(headline_blob))
+            url_blob += url.encode('utf-8')
+            url_offsets.append(len(url_blob))
+            # NUL separates entries; feed headlines never contain it
+            lowered.append(headline.lower().replace('\0', ' '))
+
+        sections = [
+            ('ids', ids.tobytes()),
+            ('window_values', bytes(window_values)),
+            ('headline_offsets', headline_offsets.tobytes()),
+            ('headline_blob', bytes(headline_blob)),
+            ('url_offsets', url_offsets.tobytes()),
+            ('url_blob', bytes(url_blob)),
+            ('lowered_blob', '\0'.join(lowered).encode('utf-8')),
+        ]
+        layout = {}
+        offset = 0
+        for name, data in sections:
+            layout[name] = (offset, len(data))
+            offset += len(data) + _pad(len(data))
+        header = dict(metadata, version=FORMAT_VERSION, byteorder=sys.byteorder, created_at=time.time(),
+                      count=len(ids), sections=layout)
+        header_bytes = json.dumps(header).encode('utf-8')
+
+        temporary = f"{path}.tmp{os.getpid()}"
+        with open(temporary, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(header_bytes).to_bytes(8, 'little'))
+            f.write(header_bytes + b'\0' * _pad(len(header_bytes)))
+            for _, data in sections:
+                f.write(data + b'\0' * _pad(len(data)))
+        os.replace(temporary, path)
+        return len(ids)
@@ -1,22 +1,501 @@
 """Article deduplication using headline similarity matching."""
+import heapq
 import logging
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 from thefuzz import fuzz
+from rapidfuzz import fuzz as rapid_fuzz, process as rapid_process
+import config
 from database import get_connection
+from dedup_snapshot import HeadlineSnapshot
+from url_normalizer import url_hash
 
 logger = logging.getLogger(__name__)
 
+# numpy enables rapidfuzz's matrix scoring (cdist); without it batches are scored row by row
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Columns the dedup window can be applied to, with the format their values are stored in (UTC)
+WINDOW_COLUMNS = {
+    'processed_at': '%Y-%m-%d %H:%M:%S',
+    'pub_date': '%Y-%m-%dT%H:%M:%S'
+}
+
 
 def calculate_similarity(headline1: str, headline2: str) -> int:
     """Calculate similarity score between two headlines (0-100)."""
     return fuzz.ratio(headline1.lower(), headline2.lower())
 
 
+def window_column() -> str:
+    """Article column the dedup window applies to (config.DEDUP_WINDOW_COLUMN)."""
+    if config.DEDUP_WINDOW_COLUMN not in WINDOW_COLUMNS:
+        raise ValueError(f"DEDUP_WINDOW_COLUMN must be one of {', '.join(WINDOW_COLUMNS)}, "
+                         f"not {config.DEDUP_WINDOW_COLUMN!r}")
+    return config.DEDUP_WINDOW_COLUMN
+
+
+def window_cutoff() -> Optional[str]:
+    """Oldest window column value still compared by headline, or None for no window."""
+    if config.DEDUP_WINDOW_DAYS <= 0:
+        return None
+    cutoff = datetime.utcnow() - timedelta(days=config.DEDUP_WINDOW_DAYS)
+    return cutoff.strftime(WINDOW_COLUMNS[window_column()])
+
+
+def _window_clause(prefix: str = 'WHERE') -> Tuple[str, tuple]:
+    """SQL condition (and parameters) limiting articles to the dedup window."""
+    cutoff = window_cutoff()
+    if cutoff is None:
+        return '', ()
+    return f"{prefix} {window_column()} >= ?", (cutoff,)
+
+
+def snapshot_path() -> str:
+    """Dedup snapshot file (config.DEDUP_SNAPSHOT_PATH, or next to the database)."""
+    return config.DEDUP_SNAPSHOT_PATH or f"{config.DATABASE_PATH}.dedup-snapshot"
+
+
+def find_articles_by_url(urls: List[str]) -> Dict[str, Dict]:
+    """Stored articles with the same canonical URL, across the whole archive.
+    
+    Returns:
+        Dictionary mapping each matched URL (as given) to the stored article
+    """
+    hashes = {url: url_hash(url) for url in urls}
+    by_hash = {}
+    conn = get_connection()
+    cursor = conn.cursor()
+    unique = list(set(hashes.values()))
+    # Stay under SQLite's default limit on bound parameters
+    for start in range(0, len(unique), 500):
+        chunk = unique[start:start + 500]
+        cursor.execute(f"""
+            SELECT id, headline, url, url_hash FROM articles
+            WHERE url_hash IN ({','.join('?' * len(chunk))}) ORDER BY id
+        """, chunk)
+        for row in cursor.fetchall():
+            # Keep the oldest article per hash, as is_duplicate does
+            by_hash.setdefault(row['url_hash'], {'id': row['id'], 'headline': row['headline'], 'url': row['url']})
+    conn.close()
+    return {url: by_hash[value] for url, value in hashes.items() if value in by_hash}
+
+
+class HeadlineIndex:
+    """Process-resident index of recently stored headlines.
+    
+    Loaded from the articles table on first use, then kept current by
+    reading only rows with an id above the highest one seen, so rows
+    inserted by other processes are picked up on the next check. The index
+    is rebuilt from scratch once it is older than DEDUP_INDEX_MAX_AGE_SECONDS
+    (to pick up edits, deletes and a recreated table) or after invalidate().
+    
+    Only articles inside the dedup window (DEDUP_WINDOW_DAYS) are held;
+    older ones are dropped on refresh, so memory follows the window rather
+    than the archive. URL matches are looked up in the database instead.
+    
+    With DEDUP_SNAPSHOT_ENABLED, a cold start maps the last saved snapshot
+    (see dedup_snapshot) and only loads articles inserted after it. Articles
+    added since are kept in memory as a delta; a new snapshot is written
+    after every full rebuild and whenever the delta exceeds
+    DEDUP_SNAPSHOT_MAX_DELTA.
+    
+    Fuzzy matching scores the new headline against every indexed one in a
+    single rapidfuzz pass, so it finds exactly what the per-row database
+    scan would.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+    
+    def _reset(self):
+        self._candidates = None
+        self._scan = None
+        self.last_id = 0
+        self.loaded_at = None
+        self.database_path = config.DATABASE_PATH
+        self.headlines = {}
+        # (window column value, id) heap for dropping articles that leave the window
+        self.expiry = []
+        self.window_values = {}
+        self.snapshot = None
+        self.snapshot_removed = set()
+        self.cutoff = None
+    
+    def __len__(self):
+        snapshot_count = len(self.snapshot) - len(self.snapshot_removed) if self.snapshot else 0
+        return len(self.headlines) + snapshot_count
+    
+    def invalidate(self):
+        """Drop everything; the next check reloads from the database."""
+        with self._lock:
+            self._reset()
+    
+    def add(self, article_id: int, headline: str, url: str, window_value: Optional[str] = None):
+        """Add a stored article to the index.
+        
+        window_value is the article's window column value; articles without
+        one are never dropped before the next full reload.
+        """
+        with self._lock:
+            if article_id in self.headlines or (self.snapshot and article_id <= self.snapshot.last_id):
+                return
+            self._candidates = None
+            self.headlines[article_id] = (headline, url)
+            if self._scan is not None:
+                ids, lowered, positions = self._scan
+                if not ids or article_id > ids[-1]:
+                    ids.append(article_id)
+                    lowered.append(headline.lower())
+                    positions.append(None)
+                else:
+                    self._scan = None
+            if window_value is not None:
+                self.window_values[article_id] = window_value
+                heapq.heappush(self.expiry, (window_value, article_id))
+    
+    def remove(self, article_id: int):
+        """Drop an article from the index."""
+        with self._lock:
+            entry = self.headlines.pop(article_id, None)
+            if entry is None:
+                if self.snapshot and self.snapshot.position(article_id) is not None:
+                    # Stays in the scan list; find_similar skips it with _snapshot_live
+                    self.snapshot_removed.add(article_id)
+                    self._candidates = None
+                return
+            self._candidates = None
+            self.window_values.pop(article_id, None)
+            if self._scan is not None:
+                ids, lowered, positions = self._scan
+                index = bisect_left(ids, article_id)
+                if index < len(ids) and ids[index] == article_id:
+                    del ids[index], lowered[index], positions[index]
+    
+    def expire(self, cutoff: Optional[str]):
+        """Drop articles whose window column value is older than cutoff."""
+        with self._lock:
+            if cutoff != self.cutoff:
+                # Snapshot entries are filtered against the cutoff when read
+                self._candidates = None
+                self.cutoff = cutoff
+            while cutoff is not None and self.expiry and self.expiry[0][0] < cutoff:
+                _, article_id = heapq.heappop(self.expiry)
+                self.remove(article_id)
+    
+    def _snapshot_live(self, position: int) -> bool:
+        """Whether a snapshot entry is still inside the window and not removed."""
+        if self.snapshot.ids[position] in self.snapshot_removed:
+            return False
+        if self.cutoff is None:
+            return True
+        window_value = self.snapshot.window_value(position)
+        return not window_value or window_value.decode('utf-8') >= self.cutoff
+    
+    def _snapshot_metadata(self) -> Dict:
+        return {
+            'database_path': str(Path(config.DATABASE_PATH).resolve()),
+            'window_column': window_column(),
+            'window_days': config.DEDUP_WINDOW_DAYS
+        }
+    
+    def _open_snapshot(self, max_id: int) -> bool:
+        """Map the saved snapshot if it belongs to this database and is recent enough."""
+        snapshot = HeadlineSnapshot.open(snapshot_path())
+        if snapshot is None:
+            return False
+        stale = time.time() - snapshot.created_at > config.DEDUP_SNAPSHOT_MAX_AGE_HOURS * 3600
+        mismatched = any(snapshot.header.get(key) != value for key, value in self._snapshot_metadata().items())
+        if stale or mismatched or snapshot.last_id > max_id:
+            logger.info(f"Not using dedup snapshot {snapshot.path}: "
+                        f"{'too old' if stale else 'different settings' if mismatched else 'database has fewer rows'}")
+            return False
+        self.snapshot = snapshot
+        self.last_id = snapshot.last_id
+        logger.info(f"Mapped dedup snapshot of {len(snapshot)} headlines (up to id {snapshot.last_id})")
+        return True
+    
+    def save_snapshot(self):
+        """Write the current index to the snapshot file and switch to the mapped copy."""
+        with self._lock:
+            path = snapshot_path()
+            ids, headlines, urls = self.candidates()
+            window_values = []
+            for article_id in ids:
+                position = self.snapshot.position(article_id) if self.snapshot and article_id <= self.snapshot.last_id else None
+                if position is not None:
+                    window_values.append(self.snapshot.window_value(position).decode('utf-8') or None)
+                else:
+                    window_values.append(self.window_values.get(article_id))
+            try:
+                count = HeadlineSnapshot.write(path, zip(ids, headlines, urls, window_values),
+                                               last_id=self.last_id, **self._snapshot_metadata())
+            except OSError as e:
+                logger.warning(f"Could not write dedup snapshot {path}: {e}")
+                return
+            snapshot = HeadlineSnapshot.open(path)
+            if snapshot is None:
+                return
+            cutoff, loaded_at = self.cutoff, self.loaded_at
+            self._reset()
+            self.snapshot, self.last_id = snapshot, snapshot.last_id
+            self.cutoff, self.loaded_at = cutoff, loaded_at
+            logger.info(f"Saved dedup snapshot of {count} headlines to {path}")
+    
+    def refresh(self):
+        """Load articles inserted since the last refresh (or everything, if stale)."""
+        with self._lock:
+            cold_start = self.loaded_at is None or self.database_path != config.DATABASE_PATH
+            full_load = cold_start or time.monotonic() - self.loaded_at > config.DEDUP_INDEX_MAX_AGE_SECONDS
+            
+            conn = get_connection()
+            cursor = conn.cursor()
+            max_id = self.last_id
+            if full_load:
+                self._reset()
+                self.loaded_at = time.monotonic()
+                cursor.execute("SELECT MAX(id) AS max_id FROM articles")
+                max_id = cursor.fetchone()['max_id'] or 0
+                if cold_start and config.DEDUP_SNAPSHOT_ENABLED and self._open_snapshot(max_id):
+                    full_load = False
+            
+            column = window_column()
+            cutoff = window_cutoff()
+            # Full loads read only the window; later refreshes read every new row and
+            # filter it here, so last_id also moves past rows outside the window
+            window, params = _window_clause(prefix='AND') if full_load else ('', ())
+            cursor.execute(f"""
+                SELECT id, headline, url, {column} AS window_value FROM articles
+                WHERE id > ? {window} ORDER BY id
+            """, (self.last_id,) + params)
+            loaded = 0
+            for row in cursor:
+                max_id = max(max_id, row['id'])
+                if cutoff is not None and (row['window_value'] is None or row['window_value'] < cutoff):
+                    continue
+                self.add(row['id'], row['headline'], row['url'], row['window_value'])
+                loaded += 1
+            conn.close()
+            
+            self.last_id = max(self.last_id, max_id)
+            self.expire(cutoff)
+            if loaded > 100:
+                logger.info(f"Headline index loaded {loaded} articles ({len(self)} total)")
+            if config.DEDUP_SNAPSHOT_ENABLED and (full_load or len(self.headlines) > config.DEDUP_SNAPSHOT_MAX_DELTA):
+                self.save_snapshot()
+    
+    def candidates(self) -> Tuple[List[int], List[str], List[str]]:
+        """All indexed article ids in id order, with their headlines and URLs."""
+        with self._lock:
+            if self._candidates is None:
+                ids, headlines, urls = [], [], []
+                if self.snapshot:
+                    for position in range(len(self.snapshot)):
+                        if self._snapshot_live(position):
+                            ids.append(self.snapshot.ids[position])
+                            headlines.append(self.snapshot.headline(position))
+                            urls.append(self.snapshot.url(position))
+                # Delta ids are all above the snapshot's
+                for article_id in sorted(self.headlines):
+                    ids.append(article_id)
+                    headlines.append(self.headlines[article_id][0])
+                    urls.append(self.headlines[article_id][1])
+                self._candidates = (ids, headlines, urls)
+            return self._candidates
+    
+    def _scan_entries(self) -> Tuple[List[int], List[str], List[Optional[int]]]:
+        """Ids, lowercased headlines and snapshot positions (None for the delta) that find_similar scores.
+        
+        Snapshot entries stay listed after they expire or are removed, so a
+        new cutoff does not force a rebuild; matches are checked instead.
+        """
+        if self._scan is None:
+            ids, lowered, positions = [], [], []
+            if self.snapshot:
+                ids.extend(self.snapshot.ids)
+                lowered.extend(self.snapshot.lowered_headlines())
+                positions.extend(range(len(self.snapshot)))
+            # Delta ids are all above the snapshot's
+            for article_id in sorted(self.headlines):
+                ids.append(article_id)
+                lowered.append(self.headlines[article_id][0].lower())
+                positions.append(None)
+            self._scan = (ids, lowered, positions)
+        return self._scan
+    
+    def find_similar(self, headline: str, threshold: int = 85, first_only: bool = False) -> List[Dict]:
+        """Find indexed headlines at or above the similarity threshold, in id order.
+        
+        Scores are identical to calculate_similarity, and every indexed
+        headline is scored, so the result matches comparing against each
+        article in the window one by one.
+        """
+        with self._lock:
+            ids, lowered, positions = self._scan_entries()
+            similar = []
+            # Scores of threshold - 0.5 can still round up to the threshold
+            for _, score, index in rapid_process.extract_iter(headline.lower(), lowered, scorer=rapid_fuzz.ratio,
+                                                              score_cutoff=threshold - 0.5):
+                similarity = int(round(score))
+                if similarity < threshold:
+                    continue
+                position = positions[index]
+                if position is None:
+                    existing, url = self.headlines[ids[index]]
+                elif self._snapshot_live(position):
+                    existing, url = self.snapshot.headline(position), self.snapshot.url(position)
+                else:
+                    continue
+                similar.append({
+                    'id': ids[index],
+                    'headline': existing,
+                    'url': url,
+                    'similarity': similarity
+                })
+                if first_only:
+                    break
+            return similar
+
+
+_headline_index = HeadlineIndex()
+
+
+def get_headline_index() -> HeadlineIndex:
+    """Get the process-wide headline index, brought up to date with the database."""
+    _headline_index.refresh()
+    return _headline_index
+
+
+def record_inserted_article(article_id: int, headline: str, url: str, pub_date: Optional[str] = None):
+    """Add a just-inserted article to the headline index."""
+    if not config.DEDUP_INDEX_ENABLED or not article_id:
+        return
+    if window_column() == 'processed_at':
+        window_value = datetime.utcnow().strftime(WINDOW_COLUMNS['processed_at'])
+    else:
+        window_value = pub_date
+    cutoff = window_cutoff()
+    if cutoff is not None and (window_value is None or window_value < cutoff):
+        # Outside the window; the database query would not return it either
+        return
+    _headline_index.add(article_id, headline, url, window_value)
+
+
+def match_headlines_batch(headlines: List[str], candidates: List[str], threshold: int = 85,
+                          workers: int = -1) -> List[Optional[Tuple[int, int]]]:
+    """Score a batch of headlines against candidates in one vectorized pass.
+    
+    Scores are identical to calculate_similarity (ratio of the lowercased
+    headlines, rounded to an integer), so decisions match the per-pair loop.
+    
+    Args:
+        headlines: New headlines to check
+        candidates: Existing headlines, in the order matches should be preferred
+        threshold: Minimum similarity score
+        workers: Threads used by rapidfuzz (-1 for all cores)
+        
+    Returns:
+        For each headline, (candidate position, score) of the first candidate
+        at or above the threshold, or None
+    """
+    results = [None] * len(headlines)
+    if not headlines or not candidates:
+        return results
+    
+    queries = [headline.lower() for headline in headlines]
+    choices = [candidate.lower() for candidate in candidates]
+    # Scores of threshold - 0.5 can still round up to the threshold
+    cutoff = threshold - 0.5
+    
+    if np is not None:
+        # Bound the score matrix to DEDUP_BATCH_MAX_CELLS entries per call
+        rows_per_block = max(1, config.DEDUP_BATCH_MAX_CELLS // len(choices))
+        for start in range(0, len(queries), rows_per_block):
+            scores = rapid_process.cdist(queries[start:start + rows_per_block], choices,
+                                         scorer=rapid_fuzz.ratio, score_cutoff=cutoff,
+                                         dtype=np.float64, workers=workers)
+            # np.rint rounds half to even, like Python's round() in calculate_similarity
+            rounded = np.rint(scores)
+            hits = rounded >= threshold
+            for row in np.flatnonzero(hits.any(axis=1)):
+                position = int(np.argmax(hits[row]))
+                results[start + row] = (position, int(rounded[row, position]))
+    else:
+        for i, query in enumerate(queries):
+            for _, score, position in rapid_process.extract_iter(query, choices, scorer=rapid_fuzz.ratio,
+                                                                 score_cutoff=cutoff):
+                if round(score) >= threshold:
+                    results[i] = (position, int(round(score)))
+                    break
+    return results
+
+
+def load_stored_headlines() -> Tuple[List[int], List[str], List[str]]:
+    """Ids, headlines and URLs of articles inside the dedup window, in id order."""
+    if config.DEDUP_INDEX_ENABLED:
+        return get_headline_index().candidates()
+    
+    window, params = _window_clause()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id, headline, url FROM articles {window} ORDER BY id", params)
+    rows = cursor.fetchall()
+    conn.close()
+    return [row['id'] for row in rows], [row['headline'] for row in rows], [row['url'] for row in rows]
+
+
+def check_duplicates_batch(articles: List[Dict], similarity_threshold: int = 85) -> List[Tuple[bool, Optional[Dict]]]:
+    """Batch version of is_duplicate for a list of article dicts.
+    
+    URLs are matched by canonical form against the whole archive; the remaining
+    headlines are scored against every headline in the dedup window with
+    match_headlines_batch. Returns the same decisions and matched articles
+    as calling is_duplicate on each article.
+    
+    Returns:
+        List of (is_duplicate, existing_article_info), one per article
+    """
+    by_url = find_articles_by_url([article['url'] for article in articles])
+    
+    results = [(False, None)] * len(articles)
+    pending = []
+    for i, article in enumerate(articles):
+        existing = by_url.get(article['url'])
+        if existing:
+            results[i] = (True, existing)
+        else:
+            pending.append(i)
+    if not pending:
+        return results
+    
+    ids, headlines, urls = load_stored_headlines()
+    matches = match_headlines_batch([articles[i]['headline'] for i in pending], headlines, similarity_threshold)
+    for i, match in zip(pending, matches):
+        if match is None:
+            continue
+        position, similarity = match
+        logger.info(f"Found duplicate by similarity ({similarity}%): '{articles[i]['headline']}' vs '{headlines[position]}'")
+        results[i] = (True, {'id': ids[position], 'headline': headlines[position], 'url': urls[position]})
+    return results
+
+
 def find_similar_headlines(new_headline: str, threshold: int = 85) -> List[Dict]:
-    """Find existing headlines similar to the new one."""
+    """Find headlines inside the dedup window similar to the new one."""
+    if config.DEDUP_INDEX_ENABLED:
+        return get_headline_index().find_similar(new_headline, threshold)
+    
+    window, params = _window_clause()
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT id, headline, url FROM articles")
+    cursor.execute(f"SELECT id, headline, url FROM articles {window}", params)
     existing_articles = cursor.fetchall()
     conn.close()
     
@@ -37,21 +516,34 @@ def find_similar_headlines(new_headline: str, threshold: int = 85) -> List[Dict]
 def is_duplicate(headline: str, url: str, similarity_threshold: int = 85) -> Tuple[bool, Optional[Dict]]:
     """Check if article is a duplicate based on URL or headline similarity.
     
+    URLs are matched by canonical form against the whole archive; headlines
+    only against articles inside the dedup window (DEDUP_WINDOW_DAYS).
+    
     Returns:
         Tuple of (is_duplicate, existing_article_info)
     """
     conn = get_connection()
     cursor = conn.cursor()
     
-    # First check by URL (exact match)
-    cursor.execute("SELECT id, headline, url FROM articles WHERE url = ?", (url,))
+    # First check by URL (canonical form)
+    cursor.execute("SELECT id, headline, url FROM articles WHERE url_hash = ? ORDER BY id LIMIT 1", (url_hash(url),))
     existing = cursor.fetchone()
     if existing:
         conn.close()
         return True, dict(existing)
     
+    if config.DEDUP_INDEX_ENABLED:
+        conn.close()
+        matches = get_headline_index().find_similar(headline, similarity_threshold, first_only=True)
+        if matches:
+            match = matches[0]
+            logger.info(f"Found duplicate by similarity ({match['similarity']}%): '{headline}' vs '{match['headline']}'")
+            return True, {key: match[key] for key in ('id', 'headline', 'url')}
+        return False, None
+    
     # Then check by headline similarity
-    cursor.execute("SELECT id, headline, url FROM articles")
+    window, params = _window_clause()
+    cursor.execute(f"SELECT id, headline, url FROM articles {window}", params)
     all_articles = cursor.fetchall()
     conn.close()
     
@@ -62,4 +554,3 @@ def is_duplicate(headline: str, url: str, similarity_threshold: int = 85) -> Tup
             return True, dict(article)
     
     return False, None
-
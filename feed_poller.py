@@ -0,0 +1,121 @@
+"""Adaptive per-source feed polling based on each feed's publish rate."""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict
+from apscheduler.triggers.interval import IntervalTrigger
+import config
+from database import get_connection, get_sources
+from source_registry import get_active_sources
+from rss_aggregator import parse_pub_date
+from run_daily_pipeline import run_streaming_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Caps how many sources are polled at the same time across all poll jobs
+_poll_slots = threading.BoundedSemaphore(max(1, config.POLL_MAX_CONCURRENT))
+
+
+def estimate_publish_rate(source_name: str, history_days: int = None) -> float:
+    """Estimate how many articles per hour a source publishes.
+
+    Based on the pub_date of articles stored from the source over the last
+    history_days (defaults to config.POLL_HISTORY_DAYS).
+    """
+    if history_days is None:
+        history_days = config.POLL_HISTORY_DAYS
+    cutoff = datetime.now() - timedelta(days=history_days)
+    # processed_at is stored by SQLite in UTC; anything published in the window was processed after it
+    processed_cutoff = datetime.utcnow() - timedelta(days=history_days)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT pub_date FROM articles
+        WHERE source = ? AND processed_at >= ?
+    """, (source_name, processed_cutoff.strftime('%Y-%m-%d %H:%M:%S')))
+    rows = cursor.fetchall()
+    conn.close()
+
+    recent = [d for d in (parse_pub_date(row['pub_date']) for row in rows) if d and d >= cutoff]
+    return len(recent) / (history_days * 24)
+
+
+def compute_poll_interval(rate_per_hour: float) -> int:
+    """Minutes between polls so that roughly POLL_TARGET_ITEMS arrive per poll.
+
+    Clamped to [POLL_MIN_MINUTES, POLL_MAX_MINUTES]; sources with no history
+    are polled at the maximum interval.
+    """
+    if rate_per_hour <= 0:
+        return config.POLL_MAX_MINUTES
+    minutes = int(config.POLL_TARGET_ITEMS / rate_per_hour * 60)
+    return max(config.POLL_MIN_MINUTES, min(config.POLL_MAX_MINUTES, minutes))
+
+
+def poll_job_id(source_name: str) -> str:
+    """Scheduler job ID for a source's poll job."""
+    return f"poll_{source_name}"
+
+
+def poll_source(scheduler, source_name: str, feed_url: str):
+    """Scheduled job: fetch, store, classify and review one source.
+
+    Skipped if POLL_MAX_CONCURRENT polls are already running. Afterwards the
+    source's interval is re-estimated and the job rescheduled if it moved.
+    """
+    if source_name not in get_active_sources():
+        logger.info(f"Skipping poll of {source_name}: disabled or backing off")
+        return
+    if not _poll_slots.acquire(blocking=False):
+        logger.info(f"Skipping poll of {source_name}: {config.POLL_MAX_CONCURRENT} polls already running")
+        return
+    try:
+        logger.info(f"Polling {source_name}...")
+        stats = run_streaming_pipeline(sources={source_name: feed_url})
+        logger.info(f"Poll of {source_name}: {stats['stored']} new, {stats['high_priority']} high priority")
+    except Exception as e:
+        logger.error(f"Error polling {source_name}: {e}", exc_info=True)
+    finally:
+        _poll_slots.release()
+
+    interval = compute_poll_interval(estimate_publish_rate(source_name))
+    job = scheduler.get_job(poll_job_id(source_name))
+    current = int(job.trigger.interval.total_seconds() // 60) if job else None
+    if job and abs(interval - current) > current * 0.2:
+        logger.info(f"Rescheduling {source_name} poll: every {current} -> {interval} minutes")
+        scheduler.reschedule_job(job.id, trigger=IntervalTrigger(
+            minutes=interval, jitter=config.POLL_JITTER_SECONDS))
+
+
+def setup_polling(scheduler, sources: Dict[str, str] = None) -> Dict[str, int]:
+    """Add one interval job per source, spaced by its estimated publish rate.
+
+    Args:
+        scheduler: APScheduler scheduler to add jobs to
+        sources: Mapping of source name to feed URL (defaults to the enabled
+            sources in the registry)
+
+    Returns:
+        Dictionary mapping source name to poll interval in minutes
+    """
+    if sources is None:
+        sources = {source['name']: source['feed_url'] for source in get_sources(enabled_only=True)}
+
+    intervals = {}
+    for source_name, feed_url in sources.items():
+        rate = estimate_publish_rate(source_name)
+        interval = compute_poll_interval(rate)
+        intervals[source_name] = interval
+        scheduler.add_job(
+            poll_source,
+            trigger=IntervalTrigger(minutes=interval, jitter=config.POLL_JITTER_SECONDS),
+            args=[scheduler, source_name, feed_url],
+            id=poll_job_id(source_name),
+            name=f"Poll {source_name}",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        logger.info(f"  - Poll {source_name}: every {interval} minutes ({rate:.2f} articles/hour)")
+    return intervals
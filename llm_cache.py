@@ -0,0 +1,127 @@
+"""Persistent cache of parsed LLM results keyed by a hash of the request.
+
+The key covers the model, prompt and every other request parameter, so an
+identical request (a re-run after a crash, a re-ingested article, the same
+syndicated text under another URL) is answered from the database instead
+of the API. Only successfully parsed results are cached.
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import config
+from database import evict_cache_entries, get_connection
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _record(hit: bool):
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def request_key(request: Dict) -> str:
+    """Hash of an API request's parameters (model, messages, max_tokens, ...)."""
+    canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def get_cached_response(key: str, ttl_hours: int = None) -> Optional[Dict]:
+    """Return the cached result for a request key, or None if missing or expired."""
+    if ttl_hours is None:
+        ttl_hours = config.LLM_CACHE_TTL_HOURS
+    cutoff = (datetime.now() - timedelta(hours=ttl_hours)).isoformat()
+
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT result FROM llm_cache WHERE request_key = ? AND created_at >= ?", (key, cutoff))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute("UPDATE llm_cache SET last_accessed = ?, hits = hits + 1 WHERE request_key = ?",
+                           (datetime.now().isoformat(), key))
+            conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.warning(f"LLM cache lookup failed: {e}")
+        _record(False)
+        return None
+
+    if not row:
+        _record(False)
+        return None
+
+    _record(True)
+    return json.loads(row['result'])
+
+
+def cache_response(key: str, kind: str, model: str, result: Dict):
+    """Store a parsed result for a request key.
+
+    Args:
+        key: request_key of the request
+        kind: What the request was for ('classification', 'review', ...)
+        model: Model that produced the result
+        result: Parsed, JSON-serializable result
+    """
+    payload = json.dumps(result, ensure_ascii=False)
+    now = datetime.now().isoformat()
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO llm_cache
+            (request_key, kind, model, result, stored_bytes, hits, created_at, last_accessed)
+            VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+        """, (key, kind, model, payload, len(payload.encode('utf-8')), now, now))
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.warning(f"Failed to cache {kind} response: {e}")
+
+
+def evict_llm_cache(ttl_hours: int = None, max_bytes: int = None) -> int:
+    """Drop expired entries, then least recently used ones until under the size cap.
+
+    Scans the whole table, so the pipeline runs it once per run rather
+    than per classification batch.
+
+    Returns:
+        Number of entries removed
+    """
+    if ttl_hours is None:
+        ttl_hours = config.LLM_CACHE_TTL_HOURS
+    if max_bytes is None:
+        max_bytes = config.LLM_CACHE_MAX_MB * 1024 * 1024
+    cutoff = (datetime.now() - timedelta(hours=ttl_hours)).isoformat()
+
+    try:
+        removed = evict_cache_entries('llm_cache', cutoff, max_bytes)
+    except Exception as e:
+        # Eviction is housekeeping; never let it fail the pipeline run
+        logger.warning(f"LLM cache eviction failed: {e}")
+        return 0
+    if removed:
+        logger.info(f"Evicted {removed} entries from LLM cache")
+    return removed
+
+
+def get_cache_stats() -> Dict[str, float]:
+    """Get hit/miss counters for this process (every hit is an API call saved)."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def log_cache_stats():
+    """Log this process's hit/miss counters."""
+    stats = get_cache_stats()
+    logger.info(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} hit rate)")
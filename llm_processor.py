@@ -1,16 +1,35 @@
 """Claude API integration for article classification."""
 import json
 import logging
+import random
+import threading
 import time
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
 from anthropic import Anthropic
 import config
+from llm_cache import request_key, get_cached_response, cache_response
+from threat_scorer import validate_threat_level, validate_action_recommendation, validate_product_impact
 
 logger = logging.getLogger(__name__)
 
 # Initialize Claude client (lazy initialization)
 _client = None
 
+# Token counts reported by the API, summed over this process (input_tokens excludes cached tokens)
+USAGE_FIELDS = ('input_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens', 'output_tokens')
+_usage_lock = threading.Lock()
+_usage = dict.fromkeys(('requests',) + USAGE_FIELDS, 0)
+
+# Rough size of a token in characters, for packing articles into batched requests
+CHARS_PER_TOKEN = 4
+# Output tokens allowed per article in a batched request (claude-3-haiku allows 4096 in total)
+BATCH_OUTPUT_TOKENS_PER_ARTICLE = 250
+MAX_OUTPUT_TOKENS = 4096
+
+# Caps classification requests in flight across all callers (batch pools and streaming workers)
+_llm_slots = threading.BoundedSemaphore(max(1, config.LLM_CONCURRENCY))
+
 def get_client():
     """Get or create Claude client."""
     global _client
@@ -20,40 +39,82 @@ def get_client():
     return _client
 
 
+def record_usage(message):
+    """Add a response's token usage to the process totals."""
+    usage = getattr(message, 'usage', None)
+    with _usage_lock:
+        _usage['requests'] += 1
+        for field in USAGE_FIELDS:
+            _usage[field] += getattr(usage, field, 0) or 0
+
+
+def get_token_usage() -> Dict[str, int]:
+    """Requests and token counts so far in this process."""
+    with _usage_lock:
+        return dict(_usage)
+
+
+def log_token_usage(since: Optional[Dict[str, int]] = None, label: str = "LLM"):
+    """Log token usage, optionally only what was used after a get_token_usage() snapshot.
+    
+    Cache reads are billed at a fraction of the input price and cache writes
+    at a premium, so the split shows whether prompt caching is paying off.
+    """
+    usage = get_token_usage()
+    if since:
+        usage = {key: value - since.get(key, 0) for key, value in usage.items()}
+    if not usage['requests']:
+        return
+    prompt_tokens = usage['input_tokens'] + usage['cache_creation_input_tokens'] + usage['cache_read_input_tokens']
+    cached_share = usage['cache_read_input_tokens'] / prompt_tokens if prompt_tokens else 0.0
+    logger.info(f"{label} token usage: {usage['requests']} requests, {prompt_tokens} prompt tokens "
+                f"({usage['cache_read_input_tokens']} cache read, {usage['cache_creation_input_tokens']} cache write, "
+                f"{usage['input_tokens']} uncached; {cached_share:.0%} from cache), {usage['output_tokens']} output tokens")
+
+
+def _strip_code_block(response_text: str) -> str:
+    """Remove a markdown code block around a response, if present."""
+    response_text = response_text.strip()
+    if response_text.startswith("```"):
+        lines = response_text.split("\n")
+        # Remove first and last line (code block markers)
+        response_text = "\n".join(lines[1:-1])
+        # Remove language identifier if present
+        if response_text.startswith("json"):
+            response_text = response_text[4:].strip()
+    return response_text
+
+
+def _validate_classification(data) -> Optional[Dict]:
+    """Check a parsed classification's fields and clamp relevance to 1-5."""
+    # Validate required fields
+    required_fields = ['relevance', 'category', 'product_impact', 'summary']
+    if not isinstance(data, dict) or not all(field in data for field in required_fields):
+        logger.warning(f"Missing required fields in LLM response: {data}")
+        return None
+    
+    # Ensure relevance is an integer between 1-5
+    if isinstance(data['relevance'], str):
+        try:
+            data['relevance'] = int(data['relevance'])
+        except:
+            data['relevance'] = 3  # Default
+    
+    data['relevance'] = max(1, min(5, int(data['relevance'])))
+    
+    return data
+
+
 def parse_llm_response(response_text: str) -> Optional[Dict]:
     """Parse JSON response from LLM, handling various formats."""
     try:
         # Try to extract JSON from response (may have markdown code blocks)
-        response_text = response_text.strip()
-        
-        # Remove markdown code blocks if present
-        if response_text.startswith("```"):
-            lines = response_text.split("\n")
-            # Remove first and last line (code block markers)
-            response_text = "\n".join(lines[1:-1])
-            # Remove language identifier if present
-            if response_text.startswith("json"):
-                response_text = response_text[4:].strip()
+        response_text = _strip_code_block(response_text)
         
         # Parse JSON
         data = json.loads(response_text)
         
-        # Validate required fields
-        required_fields = ['relevance', 'category', 'product_impact', 'summary']
-        if not all(field in data for field in required_fields):
-            logger.warning(f"Missing required fields in LLM response: {data}")
-            return None
-        
-        # Ensure relevance is an integer between 1-5
-        if isinstance(data['relevance'], str):
-            try:
-                data['relevance'] = int(data['relevance'])
-            except:
-                data['relevance'] = 3  # Default
-        
-        data['relevance'] = max(1, min(5, int(data['relevance'])))
-        
-        return data
+        return _validate_classification(data)
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse LLM JSON response: {e}")
         logger.debug(f"Response text: {response_text[:500]}")
@@ -63,37 +124,91 @@ def parse_llm_response(response_text: str) -> Optional[Dict]:
         return None
 
 
-def classify_article(article_text: str, headline: str, max_retries: int = 3) -> Optional[Dict]:
-    """Classify an article using Claude API.
+def parse_batch_response(response_text: str) -> Optional[Dict]:
+    """Parse a batched classification response (a JSON array of classifications with ids).
     
-    Args:
-        article_text: Full text of the article
-        headline: Article headline for context
-        max_retries: Maximum number of retry attempts
-        
     Returns:
-        Dictionary with classification results or None if failed
+        {'classifications': {article id as str: classification}} with the
+        valid items, or None if the response is not a JSON array or has none
     """
-    from prompts import get_classification_prompt
+    try:
+        data = json.loads(_strip_code_block(response_text))
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse batched LLM JSON response: {e}")
+        logger.debug(f"Response text: {response_text[:500]}")
+        return None
+    if not isinstance(data, list):
+        logger.warning("Batched LLM response is not a JSON array")
+        return None
     
-    # Prepare article text (prepend headline for context)
-    full_text = f"Headline: {headline}\n\n{article_text}" if article_text else headline
+    classifications = {}
+    for item in data:
+        if not isinstance(item, dict) or 'id' not in item:
+            logger.warning(f"Batched LLM response item without an id: {item}")
+            continue
+        try:
+            classification = _validate_classification(dict(item))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Invalid item in batched LLM response: {e}")
+            continue
+        if classification:
+            classification['llm_response'] = json.dumps(item)
+            classifications[str(classification.pop('id'))] = classification
+    if not classifications:
+        logger.warning("No valid classifications in batched LLM response")
+        return None
+    # Keyed by string ids so the result survives the LLM cache's JSON round trip
+    return {'classifications': classifications}
+
+
+def parse_combined_response(response_text: str) -> Optional[Dict]:
+    """Parse a combined classification and threat assessment response."""
+    data = parse_llm_response(response_text)
+    if not data:
+        return None
+    missing = [field for field in ('threat_level', 'action_recommendation') if field not in data]
+    if missing:
+        logger.warning(f"Missing threat assessment fields in LLM response: {missing}")
+        return None
+    data['threat_level'] = str(data['threat_level']).upper()
+    if not (validate_threat_level(data['threat_level'])
+            and validate_action_recommendation(data['action_recommendation'])
+            and validate_product_impact(data['product_impact'])):
+        logger.warning(f"Invalid threat assessment in LLM response: {data['threat_level']}, "
+                       f"{data['action_recommendation']}, {data['product_impact']}")
+        return None
+    return data
+
+
+def _call_llm(request: Dict, parse: Callable[[str], Optional[Dict]], kind: str, headline: str,
+              max_retries: int = 3) -> Optional[Dict]:
+    """Send a request, or answer it from the LLM cache, and parse the response.
     
-    prompt = get_classification_prompt(full_text)
+    Args:
+        request: messages.create parameters
+        parse: Function turning the response text into a result dict (None if invalid)
+        kind: What the request is for, used in logs and as the cache entry kind
+        headline: Article headline, for logs
+        max_retries: Maximum number of attempts
+        
+    Returns:
+        Parsed result with the raw response under 'llm_response', or None if failed
+    """
+    cache_key = request_key(request) if config.LLM_CACHE_ENABLED else None
+    if cache_key:
+        cached = get_cached_response(cache_key)
+        if cached:
+            logger.info(f"{kind.capitalize()} served from LLM cache: {headline[:50]}")
+            return cached
     
     for attempt in range(max_retries):
         try:
-            logger.debug(f"Classifying article (attempt {attempt + 1}): {headline[:50]}...")
+            logger.debug(f"Requesting {kind} (attempt {attempt + 1}): {headline[:50]}...")
             
             client = get_client()
-            message = client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1000,
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
+            with _llm_slots:
+                message = client.messages.create(**request)
+            record_usage(message)
             
             response_text = message.content[0].text if message.content else ""
             
@@ -102,60 +217,244 @@ def classify_article(article_text: str, headline: str, max_retries: int = 3) ->
                 continue
             
             # Parse the response
-            classification = parse_llm_response(response_text)
+            result = parse(response_text)
             
-            if classification:
+            if result:
                 # Store raw response for debugging
-                classification['llm_response'] = response_text
-                logger.info(f"Successfully classified article: relevance={classification['relevance']}, category={classification['category']}")
-                return classification
+                result['llm_response'] = response_text
+                if cache_key:
+                    cache_response(cache_key, kind, request['model'], result)
+                return result
             else:
-                logger.warning(f"Failed to parse classification response (attempt {attempt + 1})")
+                logger.warning(f"Failed to parse {kind} response (attempt {attempt + 1})")
                 
         except Exception as e:
             logger.error(f"Error calling Claude API (attempt {attempt + 1}): {e}")
             if attempt < max_retries - 1:
-                # Exponential backoff
-                wait_time = 2 ** attempt
-                logger.info(f"Retrying in {wait_time} seconds...")
+                # Exponential backoff, jittered so concurrent workers do not retry in lockstep.
+                # Only this worker waits; its request slot is already released.
+                wait_time = 2 ** attempt + random.uniform(0, 1)
+                logger.info(f"Retrying in {wait_time:.1f} seconds...")
                 time.sleep(wait_time)
             else:
-                logger.error(f"Failed to classify article after {max_retries} attempts")
+                logger.error(f"Failed to get {kind} after {max_retries} attempts")
     
     return None
 
 
-def batch_classify_articles(articles: list) -> Dict[int, Dict]:
-    """Classify multiple articles with rate limiting.
+def classify_article(article_text: str, headline: str, max_retries: int = 3) -> Optional[Dict]:
+    """Classify an article using Claude API.
     
     Args:
-        articles: List of dicts with 'id', 'headline', 'full_text' keys
+        article_text: Full text of the article
+        headline: Article headline for context
+        max_retries: Maximum number of retry attempts
         
     Returns:
-        Dictionary mapping article_id to classification results
+        Dictionary with classification results or None if failed
     """
-    results = {}
+    from prompts import get_classification_prompt, get_classification_system
     
-    for i, article in enumerate(articles):
-        article_id = article.get('id')
-        headline = article.get('headline', '')
-        full_text = article.get('full_text', '') or article.get('summary', '')
+    # Prepare article text (prepend headline for context)
+    full_text = f"Headline: {headline}\n\n{article_text}" if article_text else headline
+    
+    request = {
+        "model": "claude-3-haiku-20240307",
+        "max_tokens": 1000,
+        "system": get_classification_system(),
+        "messages": [{
+            "role": "user",
+            "content": get_classification_prompt(full_text)
+        }]
+    }
+    
+    classification = _call_llm(request, parse_llm_response, 'classification', headline, max_retries)
+    if classification:
+        logger.info(f"Successfully classified article: relevance={classification['relevance']}, category={classification['category']}")
+    return classification
+
+
+def classify_and_review_article(article_text: str, headline: str, max_retries: int = 3) -> Optional[Dict]:
+    """Classify an article and assess its threat level in one Claude API call.
+    
+    Args:
+        article_text: Full text of the article
+        headline: Article headline for context
+        max_retries: Maximum number of retry attempts
         
-        if not headline:
-            logger.warning(f"Skipping article {article_id}: no headline")
-            continue
+    Returns:
+        Dictionary with classify_article's fields plus threat_level,
+        action_recommendation and reasoning, or None if failed
+    """
+    from prompts import get_classification_prompt, get_combined_system
+    
+    full_text = f"Headline: {headline}\n\n{article_text}" if article_text else headline
+    
+    request = {
+        "model": "claude-3-haiku-20240307",
+        "max_tokens": 1000,
+        "system": get_combined_system(),
+        "messages": [{
+            "role": "user",
+            "content": get_classification_prompt(full_text)
+        }]
+    }
+    
+    result = _call_llm(request, parse_combined_response, 'classification and review', headline, max_retries)
+    if result:
+        logger.info(f"Successfully classified and reviewed article: relevance={result['relevance']}, "
+                    f"category={result['category']}, threat={result['threat_level']}")
+    return result
+
+
+def estimate_tokens(article: Dict, max_chars: int = None) -> int:
+    """Approximate prompt tokens an article takes in a batched request."""
+    if max_chars is None:
+        max_chars = config.LLM_BATCH_TEXT_CHARS
+    text = article.get('full_text') or article.get('summary') or ''
+    return (len(article.get('headline') or '') + min(len(text), max_chars) + 40) // CHARS_PER_TOKEN
+
+
+def pack_batches(articles: List[Dict], batch_size: int = None, token_budget: int = None) -> List[List[Dict]]:
+    """Split articles into batches of at most batch_size articles and about token_budget prompt tokens.
+    
+    An article larger than the budget on its own gets a batch to itself.
+    """
+    if batch_size is None:
+        batch_size = config.LLM_BATCH_SIZE
+    if token_budget is None:
+        token_budget = config.LLM_BATCH_TOKEN_BUDGET
+    # Keep the requested output within the model's limit
+    batch_size = max(1, min(batch_size, MAX_OUTPUT_TOKENS // BATCH_OUTPUT_TOKENS_PER_ARTICLE))
+    
+    batches, current, current_tokens = [], [], 0
+    for article in articles:
+        tokens = estimate_tokens(article)
+        if current and (len(current) >= batch_size or current_tokens + tokens > token_budget):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(article)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def classify_articles_batch(articles: List[Dict], max_retries: int = 3) -> Dict[int, Dict]:
+    """Classify several articles in one Claude API request.
+    
+    Args:
+        articles: Dicts with 'id', 'headline' and 'full_text' (or 'summary') keys
+        max_retries: Maximum number of retry attempts
         
-        classification = classify_article(full_text, headline)
+    Returns:
+        Dictionary mapping article_id to classification results for the
+        articles present in the response (possibly not all of them)
+    """
+    from prompts import get_classification_batch_prompt, get_classification_batch_system
+    
+    request = {
+        "model": "claude-3-haiku-20240307",
+        "max_tokens": min(MAX_OUTPUT_TOKENS, BATCH_OUTPUT_TOKENS_PER_ARTICLE * len(articles)),
+        "system": get_classification_batch_system(),
+        "messages": [{
+            "role": "user",
+            "content": get_classification_batch_prompt(articles)
+        }]
+    }
+    
+    result = _call_llm(request, parse_batch_response, 'batched classification',
+                       f"{len(articles)} articles", max_retries)
+    if not result:
+        return {}
+    ids = {str(article['id']): article['id'] for article in articles}
+    classifications = {ids[key]: classification for key, classification in result['classifications'].items()
+                       if key in ids}
+    logger.info(f"Batched request classified {len(classifications)}/{len(articles)} articles")
+    return classifications
+
+
+def batch_classify_articles(articles: list, max_workers: int = None, combined: bool = False,
+                            batch_size: int = None) -> Dict[int, Dict]:
+    """Classify multiple articles concurrently.
+    
+    Wall time scales with the number of articles divided by the
+    concurrency limit rather than with the number of articles. With a
+    batch size above 1, several articles share each request (see
+    pack_batches); articles missing from a batched response are classified
+    one by one.
+    
+    Args:
+        articles: List of dicts with 'id', 'headline', 'full_text' keys
+        max_workers: Articles classified at once (defaults to
+            config.LLM_CONCURRENCY; requests in flight are also capped
+            process-wide by LLM_CONCURRENCY)
+        combined: Also assess threat levels, in the same call
+            (classify_and_review_article); always one article per request
+        batch_size: Articles per request (defaults to config.LLM_BATCH_SIZE)
         
-        if classification:
-            results[article_id] = classification
+    Returns:
+        Dictionary mapping article_id to classification results
+    """
+    if max_workers is None:
+        max_workers = config.LLM_CONCURRENCY
+    if batch_size is None:
+        batch_size = config.LLM_BATCH_SIZE
+    
+    to_classify = []
+    for article in articles:
+        if not article.get('headline'):
+            logger.warning(f"Skipping article {article.get('id')}: no headline")
+            continue
+        to_classify.append(article)
+    
+    classify_one = classify_and_review_article if combined else classify_article
+    
+    def classify(article: dict) -> Optional[Dict]:
+        full_text = article.get('full_text', '') or article.get('summary', '')
+        return classify_one(full_text, article['headline'])
+    
+    def classify_group(group: List[Dict]) -> Dict[int, Dict]:
+        found = classify_articles_batch(group) if len(group) > 1 else {}
+        missing = [article for article in group if article.get('id') not in found]
+        if len(group) > 1 and missing:
+            logger.info(f"{len(missing)}/{len(group)} articles missing from batched response; "
+                        f"classifying them one by one")
+        for article in missing:
+            try:
+                classification = classify(article)
+            except Exception as e:
+                logger.error(f"Error classifying article {article.get('id')}: {e}")
+                classification = None
+            if classification:
+                found[article.get('id')] = classification
+        return found
+    
+    batching = batch_size > 1 and not combined
+    groups = pack_batches(to_classify, batch_size) if batching else [[article] for article in to_classify]
+    
+    found = {}
+    start = time.monotonic()
+    usage_before = get_token_usage()
+    if groups:
+        workers = max(1, min(max_workers, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm') as executor:
+            futures = [executor.submit(classify_group, group) for group in groups]
+            for future in futures:
+                try:
+                    found.update(future.result())
+                except Exception as e:
+                    logger.error(f"Error classifying articles: {e}")
+    
+    # Keep results in input order
+    results = {}
+    for article in to_classify:
+        if article.get('id') in found:
+            results[article.get('id')] = found[article.get('id')]
         else:
-            logger.warning(f"Failed to classify article {article_id}: {headline[:50]}")
-        
-        # Rate limiting: small delay between requests
-        if i < len(articles) - 1:
-            time.sleep(0.5)
+            logger.warning(f"Failed to classify article {article.get('id')}: {article['headline'][:50]}")
     
-    logger.info(f"Classified {len(results)}/{len(articles)} articles")
+    logger.info(f"Classified {len(results)}/{len(articles)} articles in {time.monotonic() - start:.1f}s "
+                f"({len(groups)} {'batched ' if batching else ''}requests, {max(1, max_workers)} at a time)")
+    log_token_usage(since=usage_before, label="Classification")
     return results
-
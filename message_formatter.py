@@ -84,6 +84,12 @@ def format_daily_digest(articles: List[Dict], date: datetime = None) -> List[Dic
         article_text += f"{summary}\n"
         article_text += f"⚡ Action: {article.get('action_recommendation', 'Watch')} | {source_emoji} {article.get('source', 'Unknown')}"
         
+        # Same story from other outlets
+        other_sources = article.get('sources', [])[1:]
+        if other_sources:
+            links = ", ".join(f"<{s['url']}|{s['source']}>" for s in other_sources)
+            article_text += f"\n📰 Also covered by: {links}"
+        
         blocks.append({
             "type": "section",
             "text": {
@@ -92,8 +98,23 @@ def format_daily_digest(articles: List[Dict], date: datetime = None) -> List[Dic
             }
         })
         
-        # Add URL button if available
-        if article.get('url'):
+        # Add URL buttons: one per source for multi-source stories
+        if article.get('sources'):
+            blocks.append({
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "button",
+                        "text": {
+                            "type": "plain_text",
+                            "text": f"Read on {s['source']}"
+                        },
+                        "url": s['url']
+                    }
+                    for s in article['sources'][:5]
+                ]
+            })
+        elif article.get('url'):
             blocks.append({
                 "type": "actions",
                 "elements": [
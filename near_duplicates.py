@@ -0,0 +1,227 @@
+"""Near-duplicate detection on article full text using MinHash and LSH.
+
+Each article's text is split into word shingles and summarised by a MinHash
+signature. Signatures are cut into bands; articles sharing any band bucket
+are candidates, and only those are compared. This catches syndicated and
+re-titled copies that headline matching misses without an all-pairs scan.
+
+Usage:
+    python near_duplicates.py --rebuild    # index articles stored before this existed
+"""
+import argparse
+import hashlib
+import logging
+import random
+import re
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import config
+from database import get_connection, init_database
+
+logger = logging.getLogger(__name__)
+
+# numpy vectorizes signature computation; without it signatures are computed in Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Hash family h(x) = (a * x + b) mod MERSENNE_PRIME. Fixed seed so stored signatures stay comparable.
+MERSENNE_PRIME = (1 << 31) - 1
+_rng = random.Random(20240101)
+_PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+                 for _ in range(config.NEAR_DUP_NUM_PERM)]
+ROWS_PER_BAND = config.NEAR_DUP_NUM_PERM // config.NEAR_DUP_BANDS
+
+if np is not None:
+    _A = np.array([a for a, _ in _PERMUTATIONS], dtype=np.uint64)
+    _B = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)
+
+
+def shingle_hashes(text: str, size: int = None) -> List[int]:
+    """32-bit hashes of the distinct word shingles in a text."""
+    if size is None:
+        size = config.NEAR_DUP_SHINGLE_SIZE
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return []
+    return list({zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+                 for i in range(len(words) - size + 1)})
+
+
+def compute_signature(text: Optional[str]) -> Optional[array]:
+    """MinHash signature of a text, or None if it is too short to compare."""
+    if not text or len(text.split()) < config.NEAR_DUP_MIN_WORDS:
+        return None
+    hashes = shingle_hashes(text)
+    if not hashes:
+        return None
+    if np is not None:
+        values = np.array(hashes, dtype=np.uint64)
+        # a < 2^31 and x < 2^32, so a * x + b fits in 64 bits
+        mins = ((np.outer(values, _A) + _B) % MERSENNE_PRIME).min(axis=0)
+        return array('I', mins.astype(np.uint32).tobytes())
+    return array('I', [min((a * x + b) % MERSENNE_PRIME for x in hashes) for a, b in _PERMUTATIONS])
+
+
+def band_buckets(signature: array) -> List[int]:
+    """One bucket key per band; the band number is part of the key."""
+    buckets = []
+    for band in range(config.NEAR_DUP_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(rows.tobytes(), digest_size=8, person=band.to_bytes(2, 'little')).digest()
+        # SQLite integers are signed 64-bit
+        buckets.append(int.from_bytes(digest, 'little', signed=True))
+    return buckets
+
+
+def estimate_similarity(signature1: array, signature2: array) -> float:
+    """Estimated Jaccard similarity of two texts' shingle sets."""
+    return sum(1 for x, y in zip(signature1, signature2) if x == y) / len(signature1)
+
+
+def _load_signature(blob: bytes) -> Optional[array]:
+    signature = array('I')
+    signature.frombytes(blob)
+    # Signatures computed with a different NEAR_DUP_NUM_PERM are not comparable
+    return signature if len(signature) == config.NEAR_DUP_NUM_PERM else None
+
+
+def find_near_duplicate(text: Optional[str], threshold: float = None,
+                        signature: Optional[array] = None) -> Optional[Dict]:
+    """Find a stored article whose full text nearly matches this text.
+
+    Args:
+        text: Article full text
+        threshold: Minimum estimated Jaccard similarity (defaults to
+            config.NEAR_DUP_THRESHOLD)
+        signature: Precomputed signature of text
+
+    Returns:
+        Dict with id, headline, url and similarity of the closest match, or None
+    """
+    if threshold is None:
+        threshold = config.NEAR_DUP_THRESHOLD
+    if signature is None:
+        signature = compute_signature(text)
+    if signature is None:
+        return None
+
+    buckets = band_buckets(signature)
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT DISTINCT s.article_id, s.signature
+        FROM lsh_buckets b
+        JOIN article_signatures s ON s.article_id = b.article_id
+        WHERE b.bucket IN ({','.join('?' * len(buckets))})
+    """, buckets)
+    candidates = cursor.fetchall()
+
+    best_id, best_similarity = None, 0.0
+    for row in candidates:
+        stored = _load_signature(row['signature'])
+        if stored is None:
+            continue
+        similarity = estimate_similarity(signature, stored)
+        if similarity >= threshold and similarity > best_similarity:
+            best_id, best_similarity = row['article_id'], similarity
+
+    match = None
+    if best_id is not None:
+        cursor.execute("SELECT id, headline, url FROM articles WHERE id = ?", (best_id,))
+        row = cursor.fetchone()
+        if row:
+            match = dict(row)
+            match['similarity'] = best_similarity
+    conn.close()
+    return match
+
+
+def _index_rows(signatures: Iterable[Tuple[int, array]]) -> Tuple[List[tuple], List[tuple]]:
+    signature_rows, bucket_rows = [], []
+    for article_id, signature in signatures:
+        signature_rows.append((article_id, signature.tobytes()))
+        bucket_rows.extend((bucket, article_id) for bucket in band_buckets(signature))
+    return signature_rows, bucket_rows
+
+
+def index_article(article_id: int, text: Optional[str], signature: Optional[array] = None) -> bool:
+    """Store an article's signature and band buckets. Returns False if the text is too short."""
+    if signature is None:
+        signature = compute_signature(text)
+    if signature is None:
+        return False
+    signature_rows, bucket_rows = _index_rows([(article_id, signature)])
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM lsh_buckets WHERE article_id = ?", (article_id,))
+    cursor.executemany("INSERT OR REPLACE INTO article_signatures (article_id, signature) VALUES (?, ?)",
+                       signature_rows)
+    cursor.executemany("INSERT INTO lsh_buckets (bucket, article_id) VALUES (?, ?)", bucket_rows)
+    conn.commit()
+    conn.close()
+    return True
+
+
+def rebuild_index(batch_size: int = 1000, full: bool = False) -> int:
+    """Index stored articles that have no signature yet (or all articles if full).
+
+    Returns:
+        Number of articles indexed
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    if full:
+        cursor.execute("DELETE FROM lsh_buckets")
+        cursor.execute("DELETE FROM article_signatures")
+        conn.commit()
+
+    indexed = 0
+    last_id = 0
+    while True:
+        cursor.execute("""
+            SELECT a.id, a.full_text FROM articles a
+            LEFT JOIN article_signatures s ON s.article_id = a.id
+            WHERE a.id > ? AND s.article_id IS NULL AND a.full_text IS NOT NULL
+            ORDER BY a.id LIMIT ?
+        """, (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        signatures = []
+        for row in rows:
+            signature = compute_signature(row['full_text'])
+            if signature is not None:
+                signatures.append((row['id'], signature))
+        signature_rows, bucket_rows = _index_rows(signatures)
+        cursor.executemany("INSERT OR REPLACE INTO article_signatures (article_id, signature) VALUES (?, ?)",
+                           signature_rows)
+        cursor.executemany("INSERT INTO lsh_buckets (bucket, article_id) VALUES (?, ?)", bucket_rows)
+        conn.commit()
+        indexed += len(signatures)
+        logger.info(f"Near-duplicate index: {indexed} articles indexed (up to id {last_id})")
+    conn.close()
+    return indexed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Maintain the near-duplicate full-text index")
+    parser.add_argument('--rebuild', action='store_true', help="Index articles that have no signature yet")
+    parser.add_argument('--full', action='store_true', help="With --rebuild, drop and recompute all signatures")
+    args = parser.parse_args()
+
+    init_database()
+    if args.rebuild:
+        print(f"Indexed {rebuild_index(full=args.full)} articles")
+    else:
+        parser.print_help()
@@ -1,32 +1,141 @@
 """LLM prompt templates for article classification."""
-from typing import Dict
+from textwrap import indent
+from typing import Dict, List
+import config
 
 
-def get_classification_prompt(article_text: str) -> str:
-    """Generate classification prompt for Claude API.
-    
-    Uses the prompt template from PRD Appendix Section 13.
-    """
-    prompt = """You are a competitive intelligence analyst for Alkimi, an AdTech company with two key products:
+# Who the analyst works for, shared by every classification variant below
+ANALYST_PREAMBLE = """You are a competitive intelligence analyst for Alkimi, an AdTech company with two key products:
 1. AMP (Advertiser Management Platform) - unified multi-DSP campaign management with AI reporting
-2. Zero-Day Payments - blockchain-based instant publisher settlement
+2. Zero-Day Payments - blockchain-based instant publisher settlement"""
 
-Analyze the following article and determine:
-1. RELEVANCE (1-5): How relevant is this to AI/automation in advertising?
+# Relevance and category guidelines, shared by every classification variant
+CLASSIFICATION_CRITERIA = """1. RELEVANCE (1-5): How relevant is this to AI/automation in advertising?
 2. CATEGORY: Campaign Automation | Cross-DSP Tools | AI Reporting/Analytics | Payment Innovation | Web3 Advertising | Other
 3. PRODUCT_IMPACT: AMP | Zero-Day | Both | General
-4. SUMMARY: 2-sentence summary focusing on competitive implications for Alkimi
+4. SUMMARY: 2-sentence summary focusing on competitive implications for Alkimi"""
 
-Article:
-{article_text}
+# Fields of one classification in the JSON response
+CLASSIFICATION_FIELDS = '''"relevance": <1-5 integer>,
+"category": "<category name>",
+"product_impact": "<AMP|Zero-Day|Both|General>",
+"summary": "<2-sentence summary>"'''
+
+# Threat level and action guidelines, shared by the combined prompt and auto_reviewer's review prompt
+THREAT_GUIDELINES = """- HIGH: Direct competitive threat or major market shift
+- MEDIUM: Relevant competitive activity worth monitoring
+- LOW: Minor competitive news, tangentially relevant
+- OPPORTUNITY: Potential partnership or market opportunity
+- Watch: Monitor for updates
+- Discuss: Bring to team discussion
+- Urgent Response: Requires immediate action"""
+
+# Fixed instructions and schema, sent as the system prompt (see cached_system_prompt)
+CLASSIFICATION_INSTRUCTIONS = f"""{ANALYST_PREAMBLE}
+
+Analyze the article in the user message and determine:
+{CLASSIFICATION_CRITERIA}
 
 Respond in JSON format with the following structure:
 {{
-    "relevance": <1-5 integer>,
-    "category": "<category name>",
-    "product_impact": "<AMP|Zero-Day|Both|General>",
-    "summary": "<2-sentence summary>"
-}}""".format(article_text=article_text[:8000])  # Limit article text to avoid token limits
+{indent(CLASSIFICATION_FIELDS, ' ' * 4)}
+}}"""
+
+# Several articles classified in one request (LLM_BATCH_SIZE > 1)
+CLASSIFICATION_BATCH_INSTRUCTIONS = f"""{ANALYST_PREAMBLE}
+
+The user message contains several articles, each starting with a line "ARTICLE ID: <id>".
+Analyze each article separately and determine:
+{CLASSIFICATION_CRITERIA}
+
+Respond with a JSON array containing one object per article, in the order given:
+[
+    {{
+        "id": <article id>,
+{indent(CLASSIFICATION_FIELDS, ' ' * 8)}
+    }}
+]"""
+
+# Classification plus threat assessment, answered in one call (LLM_COMBINED_REVIEW)
+COMBINED_INSTRUCTIONS = f"""{ANALYST_PREAMBLE}
+
+Analyze the article in the user message and determine:
+{CLASSIFICATION_CRITERIA}
+5. THREAT_LEVEL: HIGH | MEDIUM | LOW | OPPORTUNITY
+6. ACTION_RECOMMENDATION: Watch | Discuss | Urgent Response
+
+Threat level and action guidelines:
+{THREAT_GUIDELINES}
+
+Respond in JSON format with the following structure:
+{{
+{indent(CLASSIFICATION_FIELDS, ' ' * 4)},
+    "threat_level": "<HIGH|MEDIUM|LOW|OPPORTUNITY>",
+    "action_recommendation": "<Watch|Discuss|Urgent Response>",
+    "reasoning": "<brief explanation of the threat assessment>"
+}}"""
+
+
+def cached_system_prompt(instructions: str, cache: bool = None) -> List[Dict]:
+    """System prompt blocks for fixed instructions, optionally marked as a prompt-cache breakpoint.
+    
+    The API ignores the breakpoint for prefixes below the model's minimum
+    cacheable length (2048 tokens for claude-3-haiku), which the current
+    instructions are well under.
+    
+    Args:
+        instructions: Instruction text shared by every request of a kind
+        cache: Add the cache breakpoint (defaults to config.LLM_PROMPT_CACHING)
+    """
+    if cache is None:
+        cache = config.LLM_PROMPT_CACHING
+    block = {"type": "text", "text": instructions}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral"}
+    return [block]
+
+
+def get_classification_system() -> List[Dict]:
+    """System prompt for classification: the fixed prefix shared by all articles.
+    
+    Uses the prompt template from PRD Appendix Section 13.
+    """
+    return cached_system_prompt(CLASSIFICATION_INSTRUCTIONS)
+
+
+def get_classification_batch_system() -> List[Dict]:
+    """System prompt for batched classification (fixed prefix)."""
+    return cached_system_prompt(CLASSIFICATION_BATCH_INSTRUCTIONS)
+
+
+def get_classification_batch_prompt(articles: List[Dict], max_chars: int = None) -> str:
+    """Generate the user message packing several articles for batched classification.
+    
+    Args:
+        articles: Dicts with 'id', 'headline' and 'full_text' (or 'summary') keys
+        max_chars: Article text characters kept per article (defaults to
+            config.LLM_BATCH_TEXT_CHARS)
+    """
+    if max_chars is None:
+        max_chars = config.LLM_BATCH_TEXT_CHARS
+    sections = []
+    for article in articles:
+        text = (article.get('full_text') or article.get('summary') or '')[:max_chars]
+        sections.append(f"ARTICLE ID: {article['id']}\nHeadline: {article['headline']}\n\n{text}".rstrip())
+    return "\n\n---\n\n".join(sections) + "\n\nRespond with the JSON array only."
+
+
+def get_combined_system() -> List[Dict]:
+    """System prompt for combined classification and threat assessment (fixed prefix)."""
+    return cached_system_prompt(COMBINED_INSTRUCTIONS)
+
+
+def get_classification_prompt(article_text: str) -> str:
+    """Generate the per-article part of the classification prompt (see get_classification_system)."""
+    prompt = """Article:
+{article_text}
+
+Respond with the JSON object only.""".format(article_text=article_text[:8000])  # Limit article text to avoid token limits
     
     return prompt
 
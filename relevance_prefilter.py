@@ -0,0 +1,374 @@
+"""Local relevance pre-filter that keeps obviously off-topic articles away from the LLM.
+
+A logistic regression over hashed word features (headline words and
+bigrams, article text words, source) is trained on the relevance scores
+Claude has already given stored articles. Its skip threshold is calibrated
+on cross-validated (out-of-fold) probabilities so that at least
+PREFILTER_MIN_RECALL of the relevant articles stay above it; only articles
+below it are confident negatives.
+
+PREFILTER_MODE controls what happens to them:
+    off      the pre-filter is not consulted
+    shadow   every article still goes to the LLM; decisions are recorded so
+             `evaluate` can show what the would-be-skipped articles scored
+    enforce  confident negatives are not sent to the LLM; the decision and
+             its reason are recorded in prefilter_decisions
+
+Usage:
+    python relevance_prefilter.py train       # fit a model on stored classifications
+    python relevance_prefilter.py evaluate    # shadow-mode results against LLM scores
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import config
+from database import get_connection, init_database
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r'[a-z0-9][a-z0-9\-]+')
+FEATURE_BUCKETS = 1 << 20
+TEXT_WORDS = 300  # leading words of the article text used as features
+CV_FOLDS = 5  # cross-validation folds used to calibrate the skip threshold
+MODES = ('off', 'shadow', 'enforce')
+
+_model_lock = threading.Lock()
+_model = None
+
+
+def feature_names(article: Dict) -> List[str]:
+    """Distinct feature names of an article (headline words and bigrams, text words, source)."""
+    headline = WORD_PATTERN.findall((article.get('headline') or '').lower())
+    text = WORD_PATTERN.findall((article.get('full_text') or article.get('summary') or '').lower())[:TEXT_WORDS]
+    names = [f"h:{word}" for word in headline]
+    names += [f"hb:{first} {second}" for first, second in zip(headline, headline[1:])]
+    names += [f"t:{word}" for word in text]
+    if article.get('source'):
+        names.append(f"s:{article['source']}")
+    return list(dict.fromkeys(names))
+
+
+def _bucket(name: str) -> int:
+    return zlib.crc32(name.encode('utf-8')) % FEATURE_BUCKETS
+
+
+def _vectorize(article: Dict) -> Tuple[List[int], float]:
+    """Feature buckets of an article and the value each carries (binary features, L2-normalized)."""
+    buckets = list({_bucket(name) for name in feature_names(article)})
+    return buckets, 1 / math.sqrt(len(buckets)) if buckets else 0.0
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1 / (1 + math.exp(-z))
+
+
+def _probability(weights: Dict[int, float], bias: float, buckets: List[int], value: float) -> float:
+    return _sigmoid(bias + value * sum(weights.get(bucket, 0.0) for bucket in buckets))
+
+
+def load_training_data() -> List[Tuple[Dict, bool]]:
+    """Articles with their latest LLM classification, labelled relevant or not.
+
+    Classifications copied from a story lead are left out; they repeat the
+    lead's label.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT a.id, a.headline, a.full_text, a.source, c.relevance_score
+        FROM articles a
+        INNER JOIN classifications c ON c.id = (
+            SELECT MAX(id) FROM classifications WHERE article_id = a.id
+        )
+        WHERE c.llm_response IS NULL OR c.llm_response NOT LIKE 'story:%'
+        ORDER BY a.id
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+    return [(dict(row), row['relevance_score'] >= config.RELEVANCE_THRESHOLD) for row in rows]
+
+
+def fit(samples: List[Tuple[Dict, bool]], epochs: int = 10, learning_rate: float = 0.5,
+        l2: float = 1e-6, seed: int = 13) -> Tuple[Dict[int, float], float]:
+    """Fit logistic regression weights by SGD, with classes weighted to equal total influence."""
+    rng = random.Random(seed)
+    vectors = [(_vectorize(article), label) for article, label in samples]
+    positives = sum(1 for _, label in vectors if label)
+    negatives = len(vectors) - positives
+    class_weight = {True: len(vectors) / (2 * positives), False: len(vectors) / (2 * negatives)}
+
+    weights, bias = {}, 0.0
+    for epoch in range(epochs):
+        rng.shuffle(vectors)
+        rate = learning_rate / (1 + epoch)
+        for (buckets, value), label in vectors:
+            error = (_probability(weights, bias, buckets, value) - label) * class_weight[label]
+            for bucket in buckets:
+                weight = weights.get(bucket, 0.0)
+                weights[bucket] = weight - rate * (error * value + l2 * weight)
+            bias -= rate * error
+    return weights, bias
+
+
+def out_of_fold_probabilities(samples: List[Tuple[Dict, bool]], folds: int = CV_FOLDS,
+                              seed: int = 7) -> List[float]:
+    """Probability of each sample from a model fitted on the other folds.
+
+    Folds are stratified by label, so every model sees relevant and
+    irrelevant articles as long as each kind has at least two samples.
+    """
+    order = list(range(len(samples)))
+    random.Random(seed).shuffle(order)
+    # Stable sort: shuffled within each label, then dealt round-robin
+    order.sort(key=lambda i: samples[i][1])
+    fold_of = [0] * len(samples)
+    for position, i in enumerate(order):
+        fold_of[i] = position % folds
+
+    probabilities = [0.0] * len(samples)
+    for fold in range(folds):
+        weights, bias = fit([sample for i, sample in enumerate(samples) if fold_of[i] != fold])
+        for i, (article, _) in enumerate(samples):
+            if fold_of[i] == fold:
+                probabilities[i] = _probability(weights, bias, *_vectorize(article))
+    return probabilities
+
+
+def calibrate_skip_threshold(probabilities: List[float], labels: List[bool], min_recall: float) -> float:
+    """Highest probability below which at most (1 - min_recall) of the relevant articles fall.
+
+    Capped at 0.5, so only articles the model considers more likely
+    irrelevant than relevant can be skipped.
+    """
+    relevant = sorted(p for p, label in zip(probabilities, labels) if label)
+    if not relevant:
+        return 0.0
+    allowed_misses = int((1 - min_recall) * len(relevant))
+    return min(0.5, relevant[allowed_misses])
+
+
+def train_model(min_samples: int = None, min_recall: float = None) -> Optional[Dict]:
+    """Train a model on stored classifications and save it as the current one.
+
+    The skip threshold is calibrated, and its recall and skip rate measured,
+    on out-of-fold probabilities from CV_FOLDS-fold cross-validation, so
+    every article is scored by a model that never saw it. The saved model is
+    then fitted on all articles with the same procedure; the cross-validated
+    figures are the estimate of how it performs on new ones.
+
+    Returns:
+        Training metrics, or None if there is not enough data
+    """
+    if min_samples is None:
+        min_samples = config.PREFILTER_MIN_SAMPLES
+    if min_recall is None:
+        min_recall = config.PREFILTER_MIN_RECALL
+
+    samples = load_training_data()
+    positives = sum(1 for _, label in samples if label)
+    if len(samples) < min_samples or min(positives, len(samples) - positives) < CV_FOLDS:
+        logger.warning(f"Not enough classified articles to train the pre-filter "
+                       f"({len(samples)} articles, {positives} relevant; need {min_samples} "
+                       f"with at least {CV_FOLDS} of each kind)")
+        return None
+
+    probabilities = out_of_fold_probabilities(samples)
+    labels = [label for _, label in samples]
+    skip_below = calibrate_skip_threshold(probabilities, labels, min_recall)
+
+    skipped = [label for p, label in zip(probabilities, labels) if p < skip_below]
+    # Stored in the holdout_* columns; every article is held out of one fold's model
+    metrics = {
+        'samples': len(samples),
+        'positives': positives,
+        'skip_below': skip_below,
+        'folds': CV_FOLDS,
+        'holdout_recall': (positives - sum(skipped)) / positives,
+        'holdout_skip_rate': len(skipped) / len(samples)
+    }
+
+    weights, bias = fit(samples)
+    payload = zlib.compress(json.dumps({
+        'bias': bias,
+        'weights': {str(bucket): round(weight, 6) for bucket, weight in weights.items() if abs(weight) > 1e-6}
+    }).encode('utf-8'))
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO prefilter_models (created_at, samples, positives, skip_below, holdout_recall,
+                                      holdout_skip_rate, weights)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (datetime.now().isoformat(), metrics['samples'], metrics['positives'], skip_below,
+          metrics['holdout_recall'], metrics['holdout_skip_rate'], payload))
+    metrics['model_id'] = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    logger.info(f"Trained pre-filter model {metrics['model_id']} on {len(samples)} articles: skips below "
+                f"p={skip_below:.3f}, cross-validated recall {metrics['holdout_recall']:.1%}, "
+                f"skip rate {metrics['holdout_skip_rate']:.1%}")
+    return metrics
+
+
+def load_model() -> Optional[Dict]:
+    """Latest trained model (cached until a newer one is saved), or None."""
+    global _model
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(id) AS id FROM prefilter_models")
+    latest = cursor.fetchone()['id']
+    with _model_lock:
+        if latest is not None and (_model is None or _model['id'] != latest):
+            cursor.execute("SELECT id, skip_below, weights FROM prefilter_models WHERE id = ?", (latest,))
+            row = cursor.fetchone()
+            data = json.loads(zlib.decompress(row['weights']).decode('utf-8'))
+            _model = {
+                'id': row['id'],
+                'skip_below': row['skip_below'],
+                'bias': data['bias'],
+                'weights': {int(bucket): weight for bucket, weight in data['weights'].items()}
+            }
+        model = _model if latest is not None else None
+    conn.close()
+    return model
+
+
+def score_article(model: Dict, article: Dict) -> Tuple[float, str]:
+    """Probability that an article is relevant, and the features pulling it down the most."""
+    names = feature_names(article)
+    buckets, value = _vectorize(article)
+    probability = _probability(model['weights'], model['bias'], buckets, value)
+    contributions = sorted((model['weights'].get(_bucket(name), 0.0), name) for name in names)
+    negatives = [name.split(':', 1)[1] for weight, name in contributions[:3] if weight < 0]
+    reason = f"p={probability:.3f} vs skip below {model['skip_below']:.3f}"
+    if negatives:
+        reason += f"; strongest negatives: {', '.join(negatives)}"
+    return probability, reason
+
+
+def apply_prefilter(articles: List[Dict], mode: str = None) -> List[Dict]:
+    """Record pre-filter decisions for articles and return those that should go to the LLM.
+
+    Args:
+        articles: Article dicts with id, headline, full_text and source
+        mode: off, shadow or enforce (defaults to config.PREFILTER_MODE)
+
+    Returns:
+        The articles to classify: all of them unless mode is enforce
+    """
+    if mode is None:
+        mode = config.PREFILTER_MODE
+    if mode not in MODES:
+        logger.warning(f"Unknown PREFILTER_MODE {mode!r}; the pre-filter is off")
+        return articles
+    if mode == 'off' or not articles:
+        return articles
+    model = load_model()
+    if model is None:
+        logger.warning("No pre-filter model trained yet (python relevance_prefilter.py train); classifying everything")
+        return articles
+
+    decisions, keep = [], []
+    now = datetime.now().isoformat()
+    for article in articles:
+        probability, reason = score_article(model, article)
+        would_skip = probability < model['skip_below']
+        skipped = would_skip and mode == 'enforce'
+        decisions.append((article['id'], model['id'], probability, int(would_skip), int(skipped), mode, reason, now))
+        if skipped:
+            logger.info(f"Pre-filter skipped article {article['id']} ({reason}): {article.get('headline', '')[:60]}")
+        else:
+            keep.append(article)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT OR REPLACE INTO prefilter_decisions
+        (article_id, model_id, probability, would_skip, skipped, mode, reason, decided_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, decisions)
+    conn.commit()
+    conn.close()
+
+    would_skip = sum(decision[3] for decision in decisions)
+    logger.info(f"Pre-filter ({mode}): {would_skip}/{len(articles)} articles below the skip threshold, "
+                f"{len(articles) - len(keep)} skipped")
+    return keep
+
+
+def evaluate_shadow() -> Dict:
+    """Compare shadow-mode decisions with the relevance the LLM then gave those articles.
+
+    Returns:
+        Counts of decisions, would-be skips, relevant articles among them,
+        and the LLM score distribution of the would-be skips
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT p.would_skip, c.relevance_score
+        FROM prefilter_decisions p
+        INNER JOIN classifications c ON c.id = (
+            SELECT MAX(id) FROM classifications WHERE article_id = p.article_id
+        )
+        WHERE p.mode = 'shadow'
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+
+    threshold = config.RELEVANCE_THRESHOLD
+    skipped_scores = [row['relevance_score'] for row in rows if row['would_skip']]
+    relevant = sum(1 for row in rows if row['relevance_score'] >= threshold)
+    missed = sum(1 for score in skipped_scores if score >= threshold)
+    return {
+        'decisions': len(rows),
+        'would_skip': len(skipped_scores),
+        'relevant': relevant,
+        'relevant_missed': missed,
+        'recall': (relevant - missed) / relevant if relevant else 1.0,
+        'skip_rate': len(skipped_scores) / len(rows) if rows else 0.0,
+        'skipped_score_counts': {score: skipped_scores.count(score) for score in range(1, 6)}
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Train and evaluate the local relevance pre-filter")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('train', help="Fit a model on stored classifications")
+    subparsers.add_parser('evaluate', help="Compare shadow-mode decisions with LLM relevance scores")
+    args = parser.parse_args()
+
+    init_database()
+    if args.command == 'train':
+        metrics = train_model()
+        if metrics:
+            print(f"Model {metrics['model_id']}: {metrics['samples']} articles ({metrics['positives']} relevant)")
+            print(f"  Skip below p={metrics['skip_below']:.3f}")
+            print(f"  Cross-validated recall of relevant articles ({metrics['folds']} folds): "
+                  f"{metrics['holdout_recall']:.1%}")
+            print(f"  Cross-validated skip rate: {metrics['holdout_skip_rate']:.1%}")
+    elif args.command == 'evaluate':
+        results = evaluate_shadow()
+        print(f"Shadow decisions with LLM scores: {results['decisions']}")
+        print(f"  Would skip: {results['would_skip']} ({results['skip_rate']:.1%} of LLM calls)")
+        print(f"  Relevant articles that would be skipped: {results['relevant_missed']}/{results['relevant']} "
+              f"(recall {results['recall']:.1%})")
+        print("  LLM relevance of would-be skips: " +
+              ', '.join(f"{score}: {count}" for score, count in results['skipped_score_counts'].items()))
+    else:
+        parser.print_help()
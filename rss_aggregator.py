@@ -1,66 +1,56 @@
 """RSS feed aggregation and article collection."""
 import feedparser
 import requests
+import hashlib
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Dict, Optional, Iterable, Iterator, Set, Tuple
 import config
-from database import insert_article, article_exists
-from deduplication import is_duplicate
+from database import insert_article, article_exists, get_feed_validators, update_feed_validator
+from deduplication import is_duplicate, check_duplicates_batch, record_inserted_article
+from near_duplicates import compute_signature, find_near_duplicate, index_article
+from scraper import extract_article_content, scrape_articles
+from source_registry import get_active_sources, record_fetch_success, record_fetch_failure
+from stories import can_join_story, join_story
+from url_normalizer import url_hash
 
 logger = logging.getLogger(__name__)
 
+# Largest read from a feed response at a time; reads return as soon as any data has arrived
+FEED_READ_BYTES = 65536
 
-def extract_article_content(url: str) -> Optional[str]:
-    """Extract full text from article URL using web scraping fallback."""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Try to find main content area (common patterns)
-        content_selectors = [
-            'article',
-            '.article-content',
-            '.post-content',
-            '.entry-content',
-            'main',
-            '.content'
-        ]
-        
-        content = None
-        for selector in content_selectors:
-            content = soup.select_one(selector)
-            if content:
-                break
-        
-        if not content:
-            # Fallback to body
-            content = soup.find('body')
-        
-        if content:
-            text = content.get_text(separator=' ', strip=True)
-            # Clean up excessive whitespace
-            text = ' '.join(text.split())
-            return text[:10000]  # Limit to 10k characters
-        
-        return None
-    except Exception as e:
-        logger.warning(f"Failed to extract content from {url}: {e}")
+# (feed_url, source, etag, last_modified, body_hash) from a feed's latest fetch, saved once its articles are stored
+FeedValidator = Tuple[str, str, Optional[str], Optional[str], Optional[str]]
+
+
+def parse_pub_date(value: str) -> Optional[datetime]:
+    """Parse a stored pub_date (ISO 8601 or RFC 822) into a naive datetime."""
+    if not value:
         return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    return parsed.replace(tzinfo=None)
+
+
+def needs_scraping(full_text: Optional[str]) -> bool:
+    """Whether the feed-supplied text is too short to classify on its own."""
+    return not full_text or len(full_text) < 100
 
 
-def parse_feed_entry(entry, source: str) -> Optional[Dict]:
-    """Parse a single RSS feed entry into article dict."""
+def parse_feed_entry(entry, source: str, scrape: bool = True) -> Optional[Dict]:
+    """Parse a single RSS feed entry into article dict.
+    
+    With scrape=False, short entries are returned as-is and left for the
+    scraping stage (see enrich_articles).
+    """
     try:
         headline = entry.get('title', '').strip()
         url = entry.get('link', '').strip()
@@ -96,7 +86,7 @@ def parse_feed_entry(entry, source: str) -> Optional[Dict]:
             full_text = entry.summary
         
         # If still no text, try scraping
-        if not full_text or len(full_text) < 100:
+        if scrape and needs_scraping(full_text):
             full_text = extract_article_content(url)
         
         return {
@@ -111,30 +101,216 @@ def parse_feed_entry(entry, source: str) -> Optional[Dict]:
         return None
 
 
-def fetch_rss_feeds(hours_back: int = 24) -> List[Dict]:
-    """Fetch and parse RSS feeds from all configured sources.
+def enrich_articles(articles: List[Dict]) -> List[Dict]:
+    """Fill in full text for articles whose feed entry was too short.
+    
+    Scraping runs in the bounded pool from scraper.scrape_articles; articles
+    are updated in place and also returned.
+    """
+    pending = [article for article in articles if needs_scraping(article.get('full_text'))]
+    if not pending:
+        return articles
+    
+    scraped = scrape_articles(article['url'] for article in pending)
+    for article in pending:
+        text = scraped.get(article['url'])
+        if text:
+            article['full_text'] = text
+    return articles
+
+
+def read_with_deadline(response: requests.Response, deadline: float) -> bytes:
+    """Read a streamed response body, giving up at a wall-clock deadline.
+    
+    requests' timeout bounds each socket wait, so a server sending a few
+    bytes at a time could otherwise hold the read open indefinitely. Each
+    read here returns as soon as any data has arrived and waits at most
+    until the deadline.
+    
+    Raises:
+        TimeoutError: If the body is not complete by the deadline
+    """
+    raw = response.raw
+    if not hasattr(raw, 'read1'):
+        # urllib3 < 2 reads whole chunks; fall back to checking between them
+        chunks = []
+        for chunk in response.iter_content(chunk_size=FEED_READ_BYTES):
+            chunks.append(chunk)
+            if time.monotonic() > deadline:
+                raise TimeoutError("feed download exceeded its deadline")
+        return b''.join(chunks)
+    
+    sock = getattr(getattr(raw, 'connection', None), 'sock', None)
+    chunks = []
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("feed download exceeded its deadline")
+        if sock is not None:
+            sock.settimeout(remaining)
+        chunk = raw.read1(FEED_READ_BYTES, decode_content=True)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def fetch_feed(source_name: str, feed_url: str, timeout: int = None,
+               validator: Optional[Dict] = None) -> Dict:
+    """Download and parse a single RSS feed.
+    
+    When a stored validator is given, the request is sent conditionally
+    (If-None-Match / If-Modified-Since) and parsing is skipped on a 304 or
+    when the body hash matches the previous fetch.
     
     Args:
-        hours_back: Only fetch articles from the last N hours
+        source_name: Name of the source in the registry
+        feed_url: URL of the feed
+        timeout: Wall-clock limit for the whole download in seconds
+            (defaults to config.FEED_FETCH_TIMEOUT)
+        validator: Stored validators for this feed from get_feed_validators
         
     Returns:
-        List of article dictionaries
+        Dictionary with 'source', 'url', 'feed', 'bytes', 'elapsed', 'error',
+        'not_modified', 'etag', 'last_modified' and 'body_hash' keys
+    """
+    if timeout is None:
+        timeout = config.FEED_FETCH_TIMEOUT
+    
+    result = {
+        'source': source_name,
+        'url': feed_url,
+        'feed': None,
+        'bytes': 0,
+        'elapsed': 0.0,
+        'error': None,
+        'not_modified': False,
+        'etag': None,
+        'last_modified': None,
+        'body_hash': None
+    }
+    start = time.monotonic()
+    try:
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        }
+        if validator:
+            if validator.get('etag'):
+                headers['If-None-Match'] = validator['etag']
+            if validator.get('last_modified'):
+                headers['If-Modified-Since'] = validator['last_modified']
+        
+        with requests.get(feed_url, headers=headers, timeout=timeout, stream=True) as response:
+            if response.status_code == 304:
+                result['not_modified'] = True
+                return result
+            response.raise_for_status()
+            content = read_with_deadline(response, start + timeout)
+        
+        result['bytes'] = len(content)
+        result['etag'] = response.headers.get('ETag')
+        result['last_modified'] = response.headers.get('Last-Modified')
+        result['body_hash'] = hashlib.sha256(content).hexdigest()
+        if validator and validator.get('body_hash') == result['body_hash']:
+            result['not_modified'] = True
+            return result
+        
+        result['feed'] = feedparser.parse(
+            content,
+            response_headers={k.lower(): v for k, v in response.headers.items()}
+        )
+    except Exception as e:
+        result['error'] = e
+    finally:
+        result['elapsed'] = time.monotonic() - start
+    return result
+
+
+def fetch_all_feeds(sources: Dict[str, str] = None, max_workers: int = None,
+                    timeout: int = None, validators: Dict[str, Dict] = None) -> Iterator[Dict]:
+    """Fetch feeds concurrently, yielding each result as soon as it completes.
+    
+    Args:
+        sources: Mapping of source name to feed URL (defaults to the active
+            sources in the registry)
+        max_workers: Size of the worker pool (defaults to config.FEED_FETCH_WORKERS)
+        timeout: Per-feed download time limit in seconds
+        validators: Stored validators keyed by feed URL, enables conditional requests
+        
+    Yields:
+        Result dictionaries from fetch_feed
+    """
+    if sources is None:
+        sources = get_active_sources()
+    if max_workers is None:
+        max_workers = config.FEED_FETCH_WORKERS
+    if not sources:
+        return
+    validators = validators or {}
+    
+    workers = max(1, min(max_workers, len(sources)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='feed') as executor:
+        futures = [
+            executor.submit(fetch_feed, source_name, feed_url, timeout,
+                            validators.get(feed_url))
+            for source_name, feed_url in sources.items()
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def iter_feed_batches(hours_back: int = 24, conditional: bool = None,
+                      sources: Dict[str, str] = None) -> Iterator[Tuple[str, List[Dict], Optional[FeedValidator]]]:
+    """Yield (source_name, articles, validator) for each feed as soon as it has been fetched.
+    
+    Runs the metadata pass only: entries are filtered by date window and
+    duplicates, but full text is not scraped (see enrich_articles). The
+    feed's new validator is not saved here: the caller passes it to
+    save_feed_validators once the articles are stored, so a run that dies
+    in between fetches the feed again instead of getting a 304.
+    
+    Args:
+        hours_back: Only keep articles from the last N hours
+        conditional: Skip feeds unchanged since the last fetch
+            (defaults to config.FEED_CONDITIONAL_GET)
+        sources: Mapping of source name to feed URL (defaults to the source registry)
     """
-    all_articles = []
     cutoff_time = datetime.now() - timedelta(hours=hours_back)
+    timings = {}
+    unchanged = 0
+    run_start = time.monotonic()
+    if conditional is None:
+        conditional = config.FEED_CONDITIONAL_GET
+    validators = get_feed_validators() if conditional else None
     
-    for source_name, feed_url in config.RSS_SOURCES.items():
+    for result in fetch_all_feeds(sources=sources, validators=validators):
+        source_name = result['source']
+        timings[source_name] = result['elapsed']
         try:
-            logger.info(f"Fetching feed from {source_name}: {feed_url}")
-            feed = feedparser.parse(feed_url)
+            if result['error']:
+                logger.error(f"Error fetching feed from {source_name} after {result['elapsed']:.2f}s: {result['error']}")
+                record_fetch_failure(source_name, result['error'])
+                continue
+            
+            if result['not_modified']:
+                record_fetch_success(source_name, result['elapsed'], None, result['bytes'])
+                unchanged += 1
+                logger.info(f"Feed from {source_name} unchanged since last fetch ({result['elapsed']:.2f}s)")
+                if conditional:
+                    update_feed_validator(result['url'], source_name, None, None, None, changed=False)
+                continue
+            
+            feed = result['feed']
+            logger.info(f"Fetched feed from {source_name} in {result['elapsed']:.2f}s ({result['bytes']} bytes)")
             
             if feed.bozo and feed.bozo_exception:
                 logger.warning(f"Feed parse error for {source_name}: {feed.bozo_exception}")
+                record_fetch_failure(source_name, feed.bozo_exception)
                 continue
             
-            entries_processed = 0
+            record_fetch_success(source_name, result['elapsed'], len(feed.entries), result['bytes'])
+            in_window = []
             for entry in feed.entries:
-                article = parse_feed_entry(entry, source_name)
+                article = parse_feed_entry(entry, source_name, scrape=False)
                 if not article:
                     continue
                 
@@ -148,28 +324,130 @@ def fetch_rss_feeds(hours_back: int = 24) -> List[Dict]:
                         # If date parsing fails, include the article anyway
                         pass
                 
-                # Check for duplicates
-                is_dup, existing = is_duplicate(article['headline'], article['url'])
-                if is_dup:
+                in_window.append(article)
+            
+            # Check for duplicates, scoring the whole feed in one batch
+            articles = []
+            for article, (is_dup, existing) in zip(in_window, check_duplicates_batch(in_window)):
+                if is_dup and not (url_hash(article['url']) != url_hash(existing['url'])
+                                   and can_join_story(existing['id'], source_name)):
                     logger.debug(f"Skipping duplicate: {article['headline'][:50]}...")
                     continue
-                
-                all_articles.append(article)
-                entries_processed += 1
+                # Other sources' coverage of a stored story is kept; store_articles files it under the story
+                articles.append(article)
             
-            logger.info(f"Processed {entries_processed} new articles from {source_name}")
+            logger.info(f"Processed {len(articles)} new articles from {source_name}")
+            validator = None
+            if conditional:
+                validator = (result['url'], source_name, result['etag'], result['last_modified'], result['body_hash'])
+            yield source_name, articles, validator
             
         except Exception as e:
-            logger.error(f"Error fetching feed from {source_name}: {e}")
+            logger.error(f"Error processing feed from {source_name}: {e}")
             continue
     
+    if timings:
+        slowest = max(timings, key=timings.get)
+        logger.info(f"Fetched {len(timings)} feeds in {time.monotonic() - run_start:.2f}s "
+                    f"({unchanged} unchanged, slowest: {slowest} {timings[slowest]:.2f}s)")
+
+
+def save_feed_validators(validators: Iterable[Optional[FeedValidator]], failed_sources: Set[str] = None):
+    """Remember the validators of fetched feeds, so the next run can skip them if unchanged.
+    
+    Call only once the feeds' articles have been stored.
+    
+    Args:
+        validators: Validators from iter_feed_batches
+        failed_sources: Sources with articles store_articles could not
+            store; their validators are not saved, so the next run fetches
+            those feeds in full and retries the articles
+    """
+    for validator in validators:
+        if not validator:
+            continue
+        feed_url, source_name, etag, last_modified, body_hash = validator
+        if failed_sources and source_name in failed_sources:
+            logger.warning(f"Not saving feed validator for {source_name}: some of its articles were not stored")
+            continue
+        try:
+            update_feed_validator(feed_url, source_name, etag, last_modified, body_hash)
+        except Exception as e:
+            logger.warning(f"Failed to save feed validator for {source_name}: {e}")
+
+
+def fetch_rss_feeds(hours_back: int = 24, conditional: bool = None, sources: Dict[str, str] = None,
+                    on_validator: Callable[[FeedValidator], None] = None) -> List[Dict]:
+    """Fetch and parse RSS feeds from all active sources in the registry.
+    
+    Feeds are downloaded in parallel and entries are filtered by date window
+    and duplicates as each feed arrives. Full text is scraped afterwards,
+    only for the articles that survived filtering.
+    
+    Args:
+        hours_back: Only fetch articles from the last N hours
+        conditional: Skip feeds unchanged since the last fetch
+            (defaults to config.FEED_CONDITIONAL_GET)
+        sources: Mapping of source name to feed URL (defaults to the source registry)
+        on_validator: Called with each fetched feed's new validator; pass
+            them to save_feed_validators once the articles are stored.
+            Without it validators are not saved, and every run downloads
+            every feed in full
+        
+    Returns:
+        List of article dictionaries
+    """
+    all_articles = []
+    for source_name, articles, validator in iter_feed_batches(hours_back, conditional, sources):
+        all_articles.extend(articles)
+        if validator and on_validator:
+            on_validator(validator)
+    
+    # Enrichment pass: scrape full text only for articles that survived filtering
+    enrich_articles(all_articles)
+    
     logger.info(f"Total new articles collected: {len(all_articles)}")
     return all_articles
 
 
-def store_articles(articles: List[Dict]) -> List[int]:
+def iter_rss_batches(hours_back: int = 24, conditional: bool = None,
+                     sources: Dict[str, str] = None) -> Iterator[Tuple[List[Dict], Optional[FeedValidator]]]:
+    """Stream new articles feed by feed, scraping each feed's survivors before yielding.
+    
+    Unlike fetch_rss_feeds, nothing is held back until the whole crawl is
+    done, so downstream stages can start on the first feed that arrives.
+    
+    Yields:
+        (articles, validator) per feed; pass the validator to
+        save_feed_validators once the feed's articles are stored
+    """
+    total = 0
+    for source_name, articles, validator in iter_feed_batches(hours_back, conditional, sources):
+        enrich_articles(articles)
+        total += len(articles)
+        yield articles, validator
+    logger.info(f"Total new articles streamed: {total}")
+
+
+def story_to_join(article: Dict, existing: Dict) -> Optional[int]:
+    """Story a duplicate article should be stored under, or None to skip it.
+    
+    Only coverage of the same news by a different source is kept; a
+    repeat of the same canonical URL never is.
+    """
+    if not existing or url_hash(article['url']) == url_hash(existing['url']):
+        return None
+    return join_story(existing['id'], article['source'])
+
+
+def store_articles(articles: List[Dict], failed_sources: Set[str] = None) -> List[int]:
     """Store articles in database, skipping duplicates.
     
+    Args:
+        articles: Article dictionaries from fetch_rss_feeds or iter_rss_batches
+        failed_sources: If given, the source of every article that could
+            not be stored is added to it (see save_feed_validators)
+    
     Returns:
         List of article IDs that were successfully stored
     """
@@ -177,23 +455,51 @@ def store_articles(articles: List[Dict]) -> List[int]:
     for article in articles:
         try:
             # Double-check for duplicates before inserting
+            story_id = None
             is_dup, existing = is_duplicate(article['headline'], article['url'])
             if is_dup:
+                story_id = story_to_join(article, existing)
+                if story_id is None:
+                    if existing:
+                        stored_ids.append(existing['id'])
+                    continue
+            
+            # Syndicated or re-titled copies of a stored article's text
+            signature = None
+            if config.NEAR_DUP_ENABLED:
+                signature = compute_signature(article.get('full_text'))
+                existing = find_near_duplicate(None, signature=signature) if story_id is None else None
                 if existing:
-                    stored_ids.append(existing['id'])
-                continue
+                    logger.info(f"Found near-duplicate text ({existing['similarity']:.0%}): "
+                                f"'{article['headline']}' vs '{existing['headline']}'")
+                    story_id = story_to_join(article, existing)
+                    if story_id is None:
+                        stored_ids.append(existing['id'])
+                        continue
             
             article_id = insert_article(
                 headline=article['headline'],
                 url=article['url'],
                 source=article['source'],
                 pub_date=article.get('pub_date'),
-                full_text=article.get('full_text')
+                full_text=article.get('full_text'),
+                story_id=story_id
             )
             if article_id:
+                if story_id:
+                    logger.info(f"Article {article_id} ({article['source']}) joins story {story_id}")
+                record_inserted_article(article_id, article['headline'], article['url'], article.get('pub_date'))
+                if signature is not None:
+                    index_article(article_id, None, signature=signature)
                 stored_ids.append(article_id)
+            else:
+                logger.error(f"Article not stored: {article['headline'][:50]}")
+                if failed_sources is not None:
+                    failed_sources.add(article.get('source'))
         except Exception as e:
             logger.error(f"Error storing article {article.get('headline', 'unknown')}: {e}")
+            if failed_sources is not None:
+                failed_sources.add(article.get('source'))
             continue
     
     return stored_ids
@@ -1,11 +1,20 @@
 """Daily processing pipeline workflow."""
+import argparse
 import logging
+import queue
+import threading
+import time
 from datetime import datetime
-from rss_aggregator import fetch_rss_feeds, store_articles
+from typing import Any, Dict
+import config
+from rss_aggregator import fetch_rss_feeds, iter_rss_batches, save_feed_validators, store_articles
 from classifier import classify_and_store_articles, get_unclassified_articles
 from slack_delivery import send_high_priority_alert
-from database import get_connection
-from auto_reviewer import auto_review_pending_articles
+from database import get_connection, get_pending_review
+from auto_reviewer import auto_review_pending_articles, auto_review_article
+from content_cache import evict_scrape_cache
+from llm_cache import evict_llm_cache, log_cache_stats
+from llm_processor import get_token_usage, log_token_usage
 
 # Set up logging
 logging.basicConfig(
@@ -19,9 +28,12 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def run_daily_pipeline():
+def run_daily_pipeline(stream: bool = None):
     """Execute the daily processing pipeline.
     
+    With stream=True (or PIPELINE_STREAMING set) this delegates to
+    run_streaming_pipeline.
+    
     Workflow:
     1. Fetch RSS feeds (last 24 hours)
     2. Deduplicate against existing articles
@@ -30,24 +42,37 @@ def run_daily_pipeline():
     5. Flag for editor review
     6. Send high-priority alerts immediately
     """
+    if stream is None:
+        stream = config.PIPELINE_STREAMING
+    if stream:
+        return run_streaming_pipeline()
+    
     logger.info("="*80)
     logger.info("Starting daily pipeline")
     logger.info("="*80)
+    usage_before = get_token_usage()
     
     try:
         # Step 1: Fetch RSS feeds
         logger.info("Step 1: Fetching RSS feeds...")
-        articles = fetch_rss_feeds(hours_back=24)
+        validators = []
+        articles = fetch_rss_feeds(hours_back=24, on_validator=validators.append)
         logger.info(f"Fetched {len(articles)} articles from RSS feeds")
+        if config.SCRAPE_CACHE_ENABLED:
+            evict_scrape_cache()
         
         if not articles:
+            save_feed_validators(validators)
             logger.info("No new articles found. Pipeline complete.")
             return
         
         # Step 2: Store articles (with deduplication)
         logger.info("Step 2: Storing articles...")
-        article_ids = store_articles(articles)
+        failed_sources = set()
+        article_ids = store_articles(articles, failed_sources=failed_sources)
         logger.info(f"Stored {len(article_ids)} new articles")
+        # Only now can the next run skip these feeds if they are unchanged
+        save_feed_validators(validators, failed_sources)
         
         if not article_ids:
             logger.info("No new articles to process. Pipeline complete.")
@@ -62,6 +87,9 @@ def run_daily_pipeline():
         logger.info("Step 4: Auto-reviewing articles with AI...")
         review_results = auto_review_pending_articles()
         logger.info(f"Auto-reviewed {review_results['reviewed']}/{review_results['total']} articles")
+        if config.LLM_CACHE_ENABLED:
+            log_cache_stats()
+            evict_llm_cache()
 
         # Step 5: Check for high-priority items and send alerts
         logger.info("Step 5: Checking for high-priority items...")
@@ -90,6 +118,7 @@ def run_daily_pipeline():
         logger.info(f"  Articles classified: {len(classifications)}")
         logger.info(f"  Articles auto-reviewed: {review_results['reviewed']}")
         logger.info(f"  High priority: {high_priority_count}")
+        log_token_usage(since=usage_before, label="  LLM")
         logger.info("="*80)
 
         logger.info("Next steps:")
@@ -101,6 +130,140 @@ def run_daily_pipeline():
         raise
 
 
+def get_threat_level(article_id: int):
+    """Get the stored threat level for an article, if it has been assessed."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT threat_level FROM threat_assessments WHERE article_id = ?", (article_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return row['threat_level'] if row else None
+
+
+def run_streaming_pipeline(sources: Dict[str, str] = None) -> Dict[str, Any]:
+    """Execute the pipeline with articles flowing through it one at a time.
+    
+    Each article is stored as soon as its feed has been fetched and scraped,
+    then handed through a bounded queue to classification workers, which
+    classify and auto-review it immediately. LLM work starts on the first
+    feed that arrives, and the queue bounds how much is held in memory.
+    
+    Args:
+        sources: Mapping of source name to feed URL (defaults to the source registry)
+        
+    Returns:
+        Run statistics (fetched, stored, classified, reviewed, high_priority)
+    """
+    logger.info("="*80)
+    logger.info("Starting streaming pipeline")
+    logger.info("="*80)
+    
+    start = time.monotonic()
+    usage_before = get_token_usage()
+    work = queue.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+    stats_lock = threading.Lock()
+    stats = {
+        'fetched': 0,
+        'stored': 0,
+        'classified': 0,
+        'reviewed': 0,
+        'high_priority': 0,
+        'first_classification': None,
+        'first_alert': None
+    }
+    
+    def process(article_id: int):
+        classify_and_store_articles([article_id])
+        pending = get_pending_review(article_id)
+        # With LLM_COMBINED_REVIEW the threat assessment was stored with the classification
+        if not pending and get_threat_level(article_id) is None:
+            return
+        with stats_lock:
+            stats['classified'] += 1
+            if stats['first_classification'] is None:
+                stats['first_classification'] = time.monotonic() - start
+        
+        if pending and not auto_review_article(pending):
+            return
+        threat_level = get_threat_level(article_id)
+        with stats_lock:
+            stats['reviewed'] += 1
+            if threat_level in ('HIGH', 'URGENT'):
+                stats['high_priority'] += 1
+                if stats['first_alert'] is None:
+                    stats['first_alert'] = time.monotonic() - start
+        if threat_level in ('HIGH', 'URGENT'):
+            logger.info(f"High-priority article {article_id} ready {time.monotonic() - start:.1f}s into the run")
+    
+    def worker():
+        while True:
+            article_id = work.get()
+            try:
+                if article_id is None:
+                    return
+                process(article_id)
+            except Exception as e:
+                logger.error(f"Error processing article {article_id}: {e}", exc_info=True)
+            finally:
+                work.task_done()
+    
+    workers = [
+        threading.Thread(target=worker, name=f"classify-{i}", daemon=True)
+        for i in range(max(1, config.PIPELINE_CLASSIFY_WORKERS))
+    ]
+    for thread in workers:
+        thread.start()
+    
+    try:
+        queued = set()
+        for articles, validator in iter_rss_batches(hours_back=24, sources=sources):
+            failed_sources = set()
+            for article in articles:
+                stats['fetched'] += 1
+                for article_id in store_articles([article], failed_sources=failed_sources):
+                    if article_id in queued:
+                        continue
+                    queued.add(article_id)
+                    stats['stored'] += 1
+                    # Blocks while the classifiers are behind, keeping memory bounded
+                    work.put(article_id)
+            # The feed's articles are all stored; the next run can skip it if unchanged
+            save_feed_validators([validator], failed_sources)
+    except Exception as e:
+        logger.error(f"Error in streaming pipeline: {e}", exc_info=True)
+        raise
+    finally:
+        for _ in workers:
+            work.put(None)
+        for thread in workers:
+            thread.join()
+    if config.SCRAPE_CACHE_ENABLED:
+        evict_scrape_cache()
+    if config.LLM_CACHE_ENABLED:
+        log_cache_stats()
+        evict_llm_cache()
+    
+    def seconds(value):
+        return f"{value:.1f}s" if value is not None else "n/a"
+    
+    logger.info("="*80)
+    logger.info(f"Streaming pipeline complete in {time.monotonic() - start:.1f}s")
+    logger.info(f"  Articles fetched: {stats['fetched']}")
+    logger.info(f"  Articles stored: {stats['stored']}")
+    logger.info(f"  Articles classified: {stats['classified']}")
+    logger.info(f"  Articles auto-reviewed: {stats['reviewed']}")
+    logger.info(f"  High priority: {stats['high_priority']}")
+    logger.info(f"  Time to first classification: {seconds(stats['first_classification'])}")
+    logger.info(f"  Time to first high-priority item: {seconds(stats['first_alert'])}")
+    log_token_usage(since=usage_before, label="  LLM")
+    logger.info("="*80)
+    return stats
+
+
 if __name__ == "__main__":
-    run_daily_pipeline()
+    parser = argparse.ArgumentParser(description="Run the CI Bot processing pipeline")
+    parser.add_argument('--stream', action='store_true',
+                        help="Classify each article as soon as it is ingested")
+    args = parser.parse_args()
+    run_daily_pipeline(stream=True if args.stream else None)
 
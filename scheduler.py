@@ -8,6 +8,7 @@ import config
 from run_daily_pipeline import run_daily_pipeline
 from slack_delivery import send_daily_digest, send_weekly_summary
 from database import get_pending_reviews
+from feed_poller import setup_polling
 
 logger = logging.getLogger(__name__)
 
@@ -117,6 +118,11 @@ def setup_scheduler():
     logger.info("  - Editor Reminder: 7:30 AM daily")
     logger.info("  - Daily Digest: 8:00 AM Mon-Fri")
     logger.info("  - Weekly Summary: 4:00 PM Friday")
+    
+    # Adaptive per-source polling; the 6:00 AM run stays as the fallback
+    if config.ADAPTIVE_POLLING:
+        logger.info("Adaptive polling enabled:")
+        setup_polling(scheduler)
 
 
 def start_scheduler():
@@ -0,0 +1,299 @@
+"""Full-text article scraping with a bounded worker pool and per-host rate limiting."""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+import requests
+from bs4 import BeautifulSoup
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+import config
+from content_cache import get_cached_content, cache_content, get_cache_stats
+
+logger = logging.getLogger(__name__)
+
+# Prefer the C-based lxml parser when it is installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Main content area selectors, in priority order
+CONTENT_SELECTORS = [
+    'article',
+    '.article-content',
+    '.post-content',
+    '.entry-content',
+    'main',
+    '.content'
+]
+
+# Script/style blocks and comments, removed before parsing
+STRIP_PATTERN = re.compile(rb'<(script|style)\b[^>]*>.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+LEFTOVER_PATTERN = re.compile(rb'<(script|style)\b', re.IGNORECASE)
+
+# Content types worth parsing for article text
+HTML_CONTENT_TYPES = {'text/html', 'application/xhtml+xml'}
+
+# Compressed encodings urllib3 can decode in this environment (adds br/zstd when installed)
+ACCEPT_ENCODING = DEFAULT_ACCEPT_ENCODING
+
+# Characters of article text kept by extract_text_from_html
+MAX_TEXT_CHARS = 10000
+# Downloading stops once the page holds this many times MAX_TEXT_CHARS of visible text
+# (navigation, teasers and related stories count too, so leave room for them)
+DOWNLOAD_TEXT_FACTOR = 3
+# Visible text is first measured at this many bytes, then each time the download doubles
+TEXT_CHECK_START_BYTES = 64 * 1024
+TAG_PATTERN = re.compile(rb'<[^>]*>')
+
+# Content selector that last matched, per domain
+_domain_selectors: Dict[str, str] = {}
+
+
+def download_article_page(url: str, max_bytes: int = None) -> Optional[bytes]:
+    """Download the raw HTML of an article page.
+    
+    The body is streamed and decompressed incrementally. Downloading stops
+    once max_bytes of markup has been read or the page holds well over the
+    MAX_TEXT_CHARS of visible text the extractor keeps, and non-HTML
+    responses are rejected without reading their body.
+    
+    Args:
+        url: Article URL
+        max_bytes: Maximum decoded bytes to read (defaults to config.SCRAPE_MAX_PAGE_BYTES)
+    """
+    if max_bytes is None:
+        max_bytes = config.SCRAPE_MAX_PAGE_BYTES
+    try:
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.1',
+            'Accept-Encoding': ACCEPT_ENCODING
+        }
+        with requests.get(url, headers=headers, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if content_type and content_type not in HTML_CONTENT_TYPES:
+                logger.warning(f"Skipping {url}: not an HTML page ({content_type})")
+                return None
+            
+            chunks = []
+            size = 0
+            next_check = TEXT_CHECK_START_BYTES
+            for chunk in response.iter_content(chunk_size=16384):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= max_bytes:
+                    logger.debug(f"Stopped reading {url} at byte budget ({size} bytes)")
+                    break
+                # Checking at doubling sizes keeps the total work linear in the page size
+                if size >= next_check:
+                    next_check = size * 2
+                    if visible_text_length(b''.join(chunks)) >= MAX_TEXT_CHARS * DOWNLOAD_TEXT_FACTOR:
+                        logger.debug(f"Stopped reading {url} with enough text ({size} bytes)")
+                        break
+            
+            return b''.join(chunks)[:max_bytes]
+    except Exception as e:
+        logger.warning(f"Failed to download {url}: {e}")
+        return None
+
+
+def visible_text_length(html: bytes) -> int:
+    """Rough length of the text a page shows, without markup, scripts or extra whitespace."""
+    text = TAG_PATTERN.sub(b' ', STRIP_PATTERN.sub(b' ', html))
+    return len(b' '.join(text.split()))
+
+
+def find_selector(soup: BeautifulSoup, selector: str):
+    """Find the first element matching a simple tag or .class selector.
+    
+    Equivalent to soup.select_one for the selectors in CONTENT_SELECTORS,
+    without the overhead of the CSS selector engine.
+    """
+    if selector.startswith('.'):
+        return soup.find(class_=selector[1:])
+    return soup.find(selector)
+
+
+def extract_text_from_html(html: bytes, url: Optional[str] = None) -> Optional[str]:
+    """Extract the main article text from an HTML page.
+    
+    Script/style blocks are stripped from the raw markup before the tree is
+    built, and the selector that matched for the URL's domain is tried first
+    on later pages from that domain.
+    """
+    html = STRIP_PATTERN.sub(b' ', html)
+    soup = BeautifulSoup(html, HTML_PARSER)
+    
+    # Remove script and style elements the pattern missed (e.g. unterminated tags)
+    if LEFTOVER_PATTERN.search(html):
+        for script in soup(["script", "style"]):
+            script.decompose()
+    
+    domain = urlparse(url).netloc.lower() if url else None
+    remembered = _domain_selectors.get(domain)
+    selectors = CONTENT_SELECTORS
+    if remembered:
+        selectors = [remembered] + [selector for selector in CONTENT_SELECTORS if selector != remembered]
+    
+    # Try to find main content area (common patterns)
+    content = None
+    for selector in selectors:
+        content = find_selector(soup, selector)
+        if content:
+            if domain:
+                _domain_selectors[domain] = selector
+            break
+    
+    if not content:
+        # Fallback to body
+        content = soup.find('body')
+    
+    if content:
+        text = content.get_text(separator=' ', strip=True)
+        # Clean up excessive whitespace
+        text = ' '.join(text.split())
+        return text[:MAX_TEXT_CHARS]
+    
+    return None
+
+
+def _download_and_extract(url: str, store: bool) -> Optional[str]:
+    html = download_article_page(url)
+    if html is None:
+        return None
+    
+    try:
+        text = extract_text_from_html(html, url)
+    except Exception as e:
+        logger.warning(f"Failed to extract content from {url}: {e}")
+        return None
+    
+    if text and store:
+        cache_content(url, text, page_bytes=len(html))
+    return text
+
+
+def extract_article_content(url: str, use_cache: bool = True) -> Optional[str]:
+    """Extract full text from article URL using web scraping fallback.
+    
+    Checks the persistent content cache first; successful extractions are
+    written back to it.
+    """
+    use_cache = use_cache and config.SCRAPE_CACHE_ENABLED
+    if use_cache:
+        cached = get_cached_content(url)
+        if cached is not None:
+            return cached
+    return _download_and_extract(url, store=use_cache)
+
+
+class HostRateLimiter:
+    """Caps concurrent requests per host and spaces out request start times."""
+    
+    def __init__(self, max_per_host: int = None, min_interval: float = None):
+        self.max_per_host = max_per_host or config.SCRAPE_MAX_PER_HOST
+        self.min_interval = config.SCRAPE_HOST_INTERVAL if min_interval is None else min_interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+    
+    @contextmanager
+    def limit(self, url: str):
+        """Block until a request to the URL's host is allowed, then hold a slot."""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+        
+        semaphore.acquire()
+        try:
+            with self._lock:
+                now = time.monotonic()
+                start_at = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start_at + self.min_interval
+            if start_at > now:
+                time.sleep(start_at - now)
+            yield
+        finally:
+            semaphore.release()
+
+
+def interleave_by_host(urls: Iterable[str]) -> List[str]:
+    """Order URLs round-robin across hosts so one publisher cannot occupy every worker."""
+    by_host = OrderedDict()
+    for url in urls:
+        by_host.setdefault(urlparse(url).netloc.lower(), []).append(url)
+    
+    ordered = []
+    queues = list(by_host.values())
+    while queues:
+        for queue in queues:
+            ordered.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def scrape_articles(urls: Iterable[str], max_workers: int = None,
+                    limiter: HostRateLimiter = None) -> Dict[str, Optional[str]]:
+    """Scrape many article URLs concurrently.
+    
+    Args:
+        urls: Article URLs to scrape (duplicates are fetched once)
+        max_workers: Size of the worker pool (defaults to config.SCRAPE_WORKERS)
+        limiter: Per-host limiter (a fresh one is created if omitted)
+        
+    Returns:
+        Dictionary mapping URL to extracted text (None if extraction failed)
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    
+    results = {}
+    use_cache = config.SCRAPE_CACHE_ENABLED
+    if use_cache:
+        # Cache hits never touch the network, so resolve them before queueing
+        for url in urls:
+            cached = get_cached_content(url)
+            if cached is not None:
+                results[url] = cached
+    urls = interleave_by_host(url for url in urls if url not in results)
+    
+    if max_workers is None:
+        max_workers = config.SCRAPE_WORKERS
+    if limiter is None:
+        limiter = HostRateLimiter()
+    
+    def scrape(url: str) -> Optional[str]:
+        with limiter.limit(url):
+            return _download_and_extract(url, store=use_cache)
+    
+    start = time.monotonic()
+    if urls:
+        workers = max(1, min(max_workers, len(urls)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scrape') as executor:
+            futures = {executor.submit(scrape, url): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    logger.warning(f"Scrape failed for {url}: {e}")
+                    results[url] = None
+        
+        succeeded = sum(1 for url in urls if results.get(url))
+        logger.info(f"Scraped {succeeded}/{len(urls)} articles in {time.monotonic() - start:.2f}s")
+    
+    if use_cache:
+        stats = get_cache_stats()
+        logger.info(f"Scrape cache: {stats['hits']} hits, {stats['misses']} misses "
+                    f"({stats['hit_rate']:.0%} hit rate), {stats['bytes_saved']} bytes saved")
+    return results
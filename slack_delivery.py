@@ -6,6 +6,7 @@ from slack_sdk.errors import SlackApiError
 import config
 from message_formatter import format_daily_digest, format_weekly_summary, format_high_priority_alert
 from database import record_delivery, get_reviewed_articles_for_digest, get_weekly_stats
+from stories import get_story_sources
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -80,6 +81,12 @@ def send_daily_digest(channel: str = None, max_items: int = None) -> bool:
         logger.info("No articles available for daily digest")
         return False
     
+    # Stories covered by several sources get a link per source
+    story_sources = get_story_sources([a['story_id'] for a in articles if a.get('story_id')])
+    for article in articles:
+        if len(story_sources.get(article.get('story_id'), [])) > 1:
+            article['sources'] = story_sources[article['story_id']]
+    
     # Format message
     blocks = format_daily_digest(articles)
     
@@ -0,0 +1,126 @@
+"""Feed source registry with per-source health tracking and circuit breakers."""
+import argparse
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import config
+from database import (get_sources, upsert_source, record_source_success,
+                      record_source_failure, set_source_next_attempt)
+
+logger = logging.getLogger(__name__)
+
+
+def compute_backoff(consecutive_failures: int) -> Optional[timedelta]:
+    """How long a source's circuit stays open after its latest failure.
+    
+    Nothing is held back until SOURCE_FAILURE_THRESHOLD consecutive failures;
+    from then on the delay doubles per failure, capped at SOURCE_BACKOFF_MAX_HOURS.
+    """
+    if consecutive_failures < config.SOURCE_FAILURE_THRESHOLD:
+        return None
+    exponent = min(consecutive_failures - config.SOURCE_FAILURE_THRESHOLD, 16)
+    minutes = config.SOURCE_BACKOFF_BASE_MINUTES * (2 ** exponent)
+    return min(timedelta(minutes=minutes), timedelta(hours=config.SOURCE_BACKOFF_MAX_HOURS))
+
+
+def is_circuit_open(source: Dict, now: datetime = None) -> bool:
+    """Whether a source is still backing off after repeated failures."""
+    if not source.get('next_attempt_at'):
+        return False
+    now = now or datetime.now()
+    return datetime.fromisoformat(source['next_attempt_at']) > now
+
+
+def get_active_sources() -> Dict[str, str]:
+    """Get enabled sources whose circuit is closed, as name -> feed URL."""
+    try:
+        sources = get_sources(enabled_only=True)
+    except sqlite3.OperationalError as e:
+        # Database created before the registry existed and not re-initialized yet
+        logger.warning(f"Source registry unavailable ({e}); using config.RSS_SOURCES")
+        return dict(config.RSS_SOURCES)
+    
+    active = {}
+    now = datetime.now()
+    for source in sources:
+        if is_circuit_open(source, now):
+            logger.info(f"Skipping {source['name']}: circuit open until {source['next_attempt_at']} "
+                        f"after {source['consecutive_failures']} failures")
+            continue
+        active[source['name']] = source['feed_url']
+    return active
+
+
+def record_fetch_success(name: str, elapsed: float, items: Optional[int], bytes_fetched: int):
+    """Record a successful fetch; closes the circuit if it was open.
+    
+    Pass items=None for an unchanged feed (304 or same body hash), so it
+    does not count as a fetch that found nothing.
+    """
+    record_source_success(name, elapsed * 1000, items, bytes_fetched)
+
+
+def record_fetch_failure(name: str, error) -> int:
+    """Record a failed fetch and open the circuit once failures reach the threshold.
+    
+    Returns:
+        Number of consecutive failures
+    """
+    failures = record_source_failure(name, str(error))
+    backoff = compute_backoff(failures)
+    if backoff:
+        next_attempt = datetime.now() + backoff
+        set_source_next_attempt(name, next_attempt.isoformat())
+        logger.warning(f"Circuit open for {name} after {failures} consecutive failures; "
+                       f"next attempt at {next_attempt.strftime('%Y-%m-%d %H:%M')}")
+    return failures
+
+
+def print_sources():
+    """Print all registered sources with their health."""
+    for source in get_sources(enabled_only=False):
+        state = 'disabled' if not source['enabled'] else ('open' if is_circuit_open(source) else 'ok')
+        latency = f"{source['avg_latency_ms']:.0f}ms" if source['avg_latency_ms'] is not None else '-'
+        items = f"{source['avg_items']:.1f}" if source['avg_items'] is not None else '-'
+        print(f"{source['name']:<20} {state:<9} failures={source['consecutive_failures']:<3} "
+              f"latency={latency:<8} items={items:<6} last_success={source['last_success_at'] or '-'}")
+        print(f"    {source['feed_url']}")
+        if source['last_error'] and source['consecutive_failures']:
+            print(f"    last error: {source['last_error']}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    parser = argparse.ArgumentParser(description="Manage RSS feed sources")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('list', help="Show sources and their health")
+    add_parser = subparsers.add_parser('add', help="Register or update a source")
+    add_parser.add_argument('name')
+    add_parser.add_argument('feed_url')
+    for command, help_text in (('enable', "Enable a source"),
+                               ('disable', "Stop fetching a source"),
+                               ('retry', "Close a source's circuit so the next run tries it")):
+        command_parser = subparsers.add_parser(command, help=help_text)
+        command_parser.add_argument('name')
+    args = parser.parse_args()
+    
+    from database import init_database
+    init_database()
+    
+    sources = {source['name']: source for source in get_sources(enabled_only=False)}
+    if args.command == 'add':
+        upsert_source(args.name, args.feed_url)
+    elif args.command in ('enable', 'disable', 'retry'):
+        if args.name not in sources:
+            parser.error(f"Unknown source: {args.name}")
+        if args.command == 'retry':
+            set_source_next_attempt(args.name, None)
+        else:
+            upsert_source(args.name, sources[args.name]['feed_url'], enabled=args.command == 'enable')
+    else:
+        print_sources()
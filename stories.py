@@ -0,0 +1,205 @@
+"""Story clusters: the same news covered by several sources, classified and reviewed once.
+
+The first stored article of a story is its lead. Articles from other
+sources that duplicate it (by headline or full text) are stored as
+members; they take the lead's classification and threat assessment
+instead of going to the LLM, and the digest shows the story once with a
+link per source.
+"""
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+import config
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+# One lock per story key (lead article id), held while the story is classified or reviewed
+_locks_guard = threading.Lock()
+_locks = weakref.WeakValueDictionary()
+
+
+@contextmanager
+def story_locks(keys: Iterable[int]) -> Iterator[None]:
+    """Hold the locks for several story keys, acquired in sorted order."""
+    with _locks_guard:
+        locks = []
+        for key in sorted(set(keys)):
+            lock = _locks.get(key)
+            if lock is None:
+                lock = _locks[key] = threading.Lock()
+            locks.append(lock)
+    for lock in locks:
+        lock.acquire()
+    try:
+        yield
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+
+def can_join_story(existing_id: int, source: str) -> bool:
+    """Whether a duplicate of existing_id from source would be stored as a story member.
+
+    True when clustering is enabled and neither the existing article nor its
+    story already has an article from this source.
+    """
+    if not config.STORY_CLUSTERING:
+        return False
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT source, story_id FROM articles WHERE id = ?", (existing_id,))
+    existing = cursor.fetchone()
+    if not existing:
+        allowed = False
+    elif existing['story_id'] is None:
+        allowed = existing['source'] != source
+    else:
+        cursor.execute("SELECT 1 FROM articles WHERE story_id = ? AND source = ?", (existing['story_id'], source))
+        allowed = cursor.fetchone() is None
+    conn.close()
+    return allowed
+
+
+def join_story(existing_id: int, source: str) -> Optional[int]:
+    """Story a duplicate of existing_id from source should join, or None to skip it.
+
+    Creates the story (with existing_id as lead) on first use. Returns None
+    when can_join_story is False, in which case the duplicate is dropped as
+    before.
+    """
+    if not can_join_story(existing_id, source):
+        return None
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT story_id FROM articles WHERE id = ?", (existing_id,))
+    story_id = cursor.fetchone()['story_id']
+    if story_id is None:
+        cursor.execute("INSERT INTO stories (lead_article_id) VALUES (?)", (existing_id,))
+        story_id = cursor.lastrowid
+        cursor.execute("UPDATE articles SET story_id = ? WHERE id = ?", (story_id, existing_id))
+        conn.commit()
+        logger.info(f"Started story {story_id} with article {existing_id}")
+    conn.close()
+    return story_id
+
+
+def get_story_leads(article_ids: List[int]) -> Dict[int, int]:
+    """Map each story member (other than a lead) among article_ids to its lead's id."""
+    if not article_ids:
+        return {}
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT a.id, s.lead_article_id
+        FROM articles a
+        INNER JOIN stories s ON s.id = a.story_id
+        WHERE a.id IN ({','.join('?' * len(article_ids))}) AND a.id != s.lead_article_id
+    """, list(article_ids))
+    leads = {row['id']: row['lead_article_id'] for row in cursor.fetchall()}
+    conn.close()
+    return leads
+
+
+def get_story_classifications(article_ids: List[int]) -> Dict[int, Dict]:
+    """Existing classifications of the story articles among article_ids.
+
+    Used to avoid classifying a lead again after it was classified on
+    behalf of one of its members. Classifications are in classify_article's
+    format.
+    """
+    if not article_ids:
+        return {}
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT c.article_id, c.relevance_score, c.category, c.product_impact, c.summary
+        FROM classifications c
+        INNER JOIN articles a ON a.id = c.article_id
+        WHERE a.story_id IS NOT NULL AND c.article_id IN ({','.join('?' * len(article_ids))})
+        ORDER BY c.created_at
+    """, list(article_ids))
+    classifications = {
+        row['article_id']: {
+            'relevance': row['relevance_score'],
+            'category': row['category'],
+            'product_impact': row['product_impact'],
+            'summary': row['summary']
+        }
+        for row in cursor.fetchall()
+    }
+    conn.close()
+    return classifications
+
+
+def copy_classification(lead_id: int, member_id: int) -> Optional[Dict]:
+    """Give a story member its lead's classification.
+
+    Returns:
+        The classification in classify_article's format, or None if the
+        lead has not been classified
+    """
+    classification = get_story_classifications([lead_id]).get(lead_id)
+    if not classification:
+        return None
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO classifications (article_id, relevance_score, category, product_impact, summary, llm_response)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (member_id, classification['relevance'], classification['category'], classification['product_impact'],
+          classification['summary'], f"story: copied from article {lead_id}"))
+    conn.commit()
+    conn.close()
+    logger.info(f"Article {member_id} takes the classification of story lead {lead_id}")
+    return classification
+
+
+def copy_threat_assessment(lead_id: int, member_id: int) -> bool:
+    """Give a story member its lead's threat assessment. Returns False if the lead has none."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT OR REPLACE INTO threat_assessments
+        (article_id, threat_level, product_impact, action_recommendation, reviewed_by, reviewed_at)
+        SELECT ?, threat_level, product_impact, action_recommendation, reviewed_by, reviewed_at
+        FROM threat_assessments WHERE article_id = ?
+    """, (member_id, lead_id))
+    copied = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    if copied:
+        logger.info(f"Article {member_id} takes the threat assessment of story lead {lead_id}")
+    return copied
+
+
+def has_threat_assessment(article_id: int) -> bool:
+    """Whether an article already has a threat assessment (e.g. reviewed for a story member)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM threat_assessments WHERE article_id = ?", (article_id,))
+    assessed = cursor.fetchone() is not None
+    conn.close()
+    return assessed
+
+
+def get_story_sources(story_ids: List[int]) -> Dict[int, List[Dict]]:
+    """Source name and URL of every article in each story, lead first."""
+    if not story_ids:
+        return {}
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT a.story_id, a.source, a.url
+        FROM articles a
+        INNER JOIN stories s ON s.id = a.story_id
+        WHERE a.story_id IN ({','.join('?' * len(story_ids))})
+        ORDER BY a.story_id, a.id != s.lead_article_id, a.id
+    """, list(story_ids))
+    sources = {}
+    for row in cursor.fetchall():
+        sources.setdefault(row['story_id'], []).append({'source': row['source'], 'url': row['url']})
+    conn.close()
+    return sources
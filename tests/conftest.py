@@ -0,0 +1,22 @@
+"""Shared fixtures: every test gets its own empty database."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+import deduplication
+from database import init_database
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Point config at a fresh database (and dedup snapshot) under tmp_path."""
+    monkeypatch.setattr(config, 'DATABASE_PATH', str(tmp_path / 'ci_bot.db'))
+    monkeypatch.setattr(config, 'DEDUP_SNAPSHOT_PATH', str(tmp_path / 'ci_bot.db.dedup-snapshot'))
+    init_database()
+    deduplication._headline_index.invalidate()
+    yield config.DATABASE_PATH
+    deduplication._headline_index.invalidate()
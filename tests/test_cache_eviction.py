@@ -0,0 +1,76 @@
+"""TTL and size-cap eviction of the LLM and scrape caches."""
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import llm_cache
+from content_cache import cache_content, evict_scrape_cache, get_cached_content
+from database import get_connection
+
+
+def set_times(table, key_column, key, created_hours_ago, accessed_hours_ago):
+    now = datetime.now()
+    conn = get_connection()
+    conn.execute(f"UPDATE {table} SET created_at = ?, last_accessed = ? WHERE {key_column} = ?",
+                 ((now - timedelta(hours=created_hours_ago)).isoformat(),
+                  (now - timedelta(hours=accessed_hours_ago)).isoformat(), key))
+    conn.commit()
+    conn.close()
+
+
+def cached_keys():
+    conn = get_connection()
+    keys = {row['request_key'] for row in conn.execute("SELECT request_key FROM llm_cache")}
+    conn.close()
+    return keys
+
+
+def test_llm_cache_drops_expired_entries(database):
+    llm_cache.cache_response('fresh', 'classification', 'model', {'relevance': 4})
+    llm_cache.cache_response('stale', 'classification', 'model', {'relevance': 2})
+    set_times('llm_cache', 'request_key', 'stale', 48, 48)
+
+    assert llm_cache.evict_llm_cache(ttl_hours=24) == 1
+    assert cached_keys() == {'fresh'}
+    assert llm_cache.get_cached_response('fresh') == {'relevance': 4}
+
+
+def test_llm_cache_drops_least_recently_used_over_cap(database):
+    for age, key in enumerate(['newest', 'middle', 'oldest']):
+        llm_cache.cache_response(key, 'review', 'model', {'text': 'x' * 100})
+        set_times('llm_cache', 'request_key', key, 1, age)
+    size = len('{"text": "' + 'x' * 100 + '"}')
+
+    assert llm_cache.evict_llm_cache(ttl_hours=24, max_bytes=2 * size) == 1
+    assert cached_keys() == {'newest', 'middle'}
+    assert llm_cache.evict_llm_cache(ttl_hours=24, max_bytes=2 * size) == 0
+
+
+def test_scrape_cache_eviction(database):
+    cache_content("https://example.com/kept", "Kept text")
+    cache_content("https://example.com/expired", "Expired text")
+    set_times('scrape_cache', 'url', "https://example.com/expired", 500, 500)
+
+    assert evict_scrape_cache(ttl_hours=168) == 1
+    assert get_cached_content("https://example.com/kept") == "Kept text"
+    assert get_cached_content("https://example.com/expired") is None
+
+
+def test_failed_eviction_closes_connection(database, monkeypatch):
+    connections = []
+
+    def tracked_connection():
+        conn = get_connection()
+        connections.append(conn)
+        return conn
+
+    monkeypatch.setattr('database.get_connection', tracked_connection)
+    conn = get_connection()
+    conn.execute("DROP TABLE llm_cache")
+    conn.close()
+
+    assert llm_cache.evict_llm_cache() == 0
+    assert len(connections) == 1
+    with pytest.raises(sqlite3.ProgrammingError, match='closed'):
+        connections[0].execute("SELECT 1")
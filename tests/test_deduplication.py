@@ -0,0 +1,96 @@
+"""Headline index against the per-row database scan it replaces."""
+import random
+
+import pytest
+
+import config
+import deduplication
+from database import insert_article
+
+HEADLINES = [
+    "The Trade Desk launches new identity solution for CTV",
+    "Google delays third-party cookie deprecation again",
+    "Magnite acquires SpringServe in $31M deal",
+    "PubMatic reports record quarterly revenue",
+    "Googles ad-tech antitrust trial opens in Virginia",
+    "Amazon DSP adds retail media measurement tools",
+    "Criteo shifts focus to commerce media",
+    "Index Exchange expands into streaming inventory",
+]
+
+
+def store(headlines):
+    return [insert_article(headline, f"https://example.com/{abs(hash(headline))}", "Example") for headline in headlines]
+
+
+def full_scan(headline, threshold=85):
+    """Ids the index must return: the non-index path of find_similar_headlines."""
+    config.DEDUP_INDEX_ENABLED = False
+    try:
+        return [match['id'] for match in deduplication.find_similar_headlines(headline, threshold)]
+    finally:
+        config.DEDUP_INDEX_ENABLED = True
+
+
+@pytest.fixture(params=[False, True], ids=['in-memory', 'snapshot'])
+def index_mode(request, database, monkeypatch):
+    monkeypatch.setattr(config, 'DEDUP_INDEX_ENABLED', True)
+    monkeypatch.setattr(config, 'DEDUP_SNAPSHOT_ENABLED', request.param)
+    return request.param
+
+
+def test_match_without_shared_words(index_mode):
+    # Scores 93 but shares no word with the stored headline
+    assert deduplication.calculate_similarity("Google's adtech antitrust trial opens in Virginia",
+                                              "Googles ad-tech antitrust trial opens in Virginia") >= 85
+    assert deduplication.calculate_similarity("Googles ad-tech", "Google's adtech") == 93
+    stored = store(["Googles ad-tech"])[0]
+
+    duplicate, existing = deduplication.is_duplicate("Google's adtech", "https://example.com/other")
+    assert duplicate and existing['id'] == stored
+    assert [match['id'] for match in deduplication.find_similar_headlines("Google's adtech")] == [stored]
+    [(duplicate, existing)] = deduplication.check_duplicates_batch(
+        [{'headline': "Google's adtech", 'url': "https://example.com/other"}])
+    assert duplicate and existing['id'] == stored
+
+
+def test_index_matches_full_scan(index_mode):
+    store(HEADLINES)
+    random.seed(7)
+    queries = []
+    for headline in HEADLINES:
+        words = headline.split()
+        queries.append(headline.upper())
+        queries.append(' '.join(words[:-1]))
+        queries.append(headline.replace(' ', '', 1))
+        random.shuffle(words)
+        queries.append(' '.join(words))
+    queries += ["Google's adtech antitrust trial opens in Virginia", "the of and", ""]
+
+    for query in queries:
+        expected = full_scan(query)
+        assert [match['id'] for match in deduplication.find_similar_headlines(query)] == expected, query
+        duplicate, existing = deduplication.is_duplicate(query, "https://example.com/new")
+        assert duplicate == bool(expected)
+        assert existing is None or existing['id'] == expected[0]
+
+
+def test_index_picks_up_inserts_and_window(index_mode, monkeypatch):
+    store(HEADLINES[:4])
+    assert deduplication.find_similar_headlines(HEADLINES[5]) == []
+    # Inserted by another process: only visible through the incremental refresh
+    [late] = store([HEADLINES[5]])
+    assert [match['id'] for match in deduplication.find_similar_headlines(HEADLINES[5])] == [late]
+
+    # Articles leave the window once their processed_at is older than the cutoff
+    monkeypatch.setattr(deduplication, 'window_cutoff', lambda: '9999-01-01 00:00:00')
+    assert deduplication.find_similar_headlines(HEADLINES[5]) == []
+    assert deduplication.find_similar_headlines(HEADLINES[0]) == []
+
+
+def test_removed_articles_are_not_matched(index_mode):
+    ids = store(HEADLINES)
+    index = deduplication.get_headline_index()
+    index.remove(ids[2])
+    assert index.find_similar(HEADLINES[2]) == []
+    assert [match['id'] for match in index.find_similar(HEADLINES[3])] == [ids[3]]
@@ -0,0 +1,59 @@
+"""MinHash/LSH near-duplicate detection on article text."""
+import random
+
+import near_duplicates
+from database import insert_article
+
+VOCABULARY = ("ad exchange bidder auction publisher advertiser header inventory supply demand identity cookie "
+              "measurement retail media streaming television programmatic deal revenue quarter platform "
+              "launch partner agency brand privacy signal curation marketplace buyer seller fee").split()
+
+
+def article_text(seed: int, words: int = 300) -> str:
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def lightly_edited(text: str) -> str:
+    """A syndicated copy: a new opening sentence and a changed word near the end."""
+    words = text.split()
+    words[-20] = 'acquisition'
+    return "Reprinted with permission from the original publisher. " + ' '.join(words)
+
+
+def stored(headline, text):
+    article_id = insert_article(headline, f"https://example.com/{abs(hash(headline))}", "Example", full_text=text)
+    assert near_duplicates.index_article(article_id, text)
+    return article_id
+
+
+def test_signature_estimates_similarity():
+    text = article_text(1)
+    signature = near_duplicates.compute_signature(text)
+    assert near_duplicates.estimate_similarity(signature, near_duplicates.compute_signature(text)) == 1.0
+    assert near_duplicates.estimate_similarity(signature, near_duplicates.compute_signature(lightly_edited(text))) > 0.8
+    assert near_duplicates.estimate_similarity(signature, near_duplicates.compute_signature(article_text(2))) < 0.2
+
+
+def test_short_text_is_not_indexed():
+    assert near_duplicates.compute_signature("Too short to compare") is None
+    assert near_duplicates.compute_signature(None) is None
+
+
+def test_finds_syndicated_copy(database):
+    original = stored("Exchange launches curation marketplace", article_text(1))
+    stored("Unrelated earnings story", article_text(2))
+
+    match = near_duplicates.find_near_duplicate(lightly_edited(article_text(1)))
+    assert match is not None and match['id'] == original
+    assert match['similarity'] >= 0.8
+    assert near_duplicates.find_near_duplicate(article_text(3)) is None
+
+
+def test_rebuild_indexes_existing_articles(database):
+    article_id = insert_article("Stored before the index existed", "https://example.com/old", "Example",
+                                full_text=article_text(4))
+    assert near_duplicates.find_near_duplicate(article_text(4)) is None
+    assert near_duplicates.rebuild_index() == 1
+    assert near_duplicates.find_near_duplicate(article_text(4))['id'] == article_id
+    assert near_duplicates.rebuild_index() == 0
@@ -0,0 +1,77 @@
+"""Pre-filter skip threshold calibration and the model it is saved with."""
+import random
+
+import pytest
+
+import relevance_prefilter
+from database import insert_article, insert_classification
+
+RELEVANT_WORDS = "programmatic dsp automation bidding reporting settlement ai campaign curation".split()
+OFF_TOPIC_WORDS = "hires award gala appoints chief festival office sponsorship lunch".split()
+SHARED_WORDS = "company announced today market new platform industry year".split()
+
+
+def test_calibrate_keeps_min_recall():
+    probabilities = [0.05, 0.1, 0.2, 0.3, 0.4, 0.6, 0.7, 0.8, 0.9, 0.95]
+    labels = [False, False, True, False, True, True, True, True, True, True]
+    # 8 relevant articles: 80% recall allows one miss, so the threshold is the second-lowest relevant one
+    assert relevance_prefilter.calibrate_skip_threshold(probabilities, labels, 0.8) == 0.4
+    assert relevance_prefilter.calibrate_skip_threshold(probabilities, labels, 1.0) == 0.2
+    # Never above 0.5, whatever the recall target allows
+    assert relevance_prefilter.calibrate_skip_threshold([0.9, 0.95], [True, True], 0.5) == 0.5
+    assert relevance_prefilter.calibrate_skip_threshold([0.1], [False], 0.98) == 0.0
+
+
+def classified_articles(count, seed=3):
+    rng = random.Random(seed)
+    for i in range(count):
+        relevant = rng.random() < 0.3
+        # A tenth of the labels contradict the words, so the model is not perfect
+        words = RELEVANT_WORDS if relevant != (rng.random() < 0.1) else OFF_TOPIC_WORDS
+        text = ' '.join(rng.choice(words + SHARED_WORDS) for _ in range(40))
+        article_id = insert_article(f"{rng.choice(words)} {rng.choice(SHARED_WORDS)} {i}",
+                                    f"https://example.com/{i}", "Example", full_text=text)
+        insert_classification(article_id, 4 if relevant else 1, "Other", "General", "", "{}")
+
+
+def test_train_model_calibrates_what_it_saves(database):
+    classified_articles(240)
+    metrics = relevance_prefilter.train_model(min_samples=200, min_recall=0.9)
+    assert metrics is not None
+
+    samples = relevance_prefilter.load_training_data()
+    probabilities = relevance_prefilter.out_of_fold_probabilities(samples)
+    labels = [label for _, label in samples]
+    assert metrics['skip_below'] == relevance_prefilter.calibrate_skip_threshold(probabilities, labels, 0.9)
+    missed = sum(1 for p, label in zip(probabilities, labels) if label and p < metrics['skip_below'])
+    assert metrics['holdout_recall'] == pytest.approx(1 - missed / sum(labels))
+    assert metrics['holdout_recall'] >= 0.9
+    assert metrics['holdout_skip_rate'] > 0
+
+    # The saved model is the one fitted on every article, not a fold's
+    weights, bias = relevance_prefilter.fit(samples)
+    model = relevance_prefilter.load_model()
+    assert model['id'] == metrics['model_id']
+    assert model['bias'] == pytest.approx(bias)
+    assert model['skip_below'] == metrics['skip_below']
+    assert all(model['weights'].get(bucket, 0.0) == pytest.approx(weight, abs=1e-6)
+               for bucket, weight in weights.items())
+
+
+def test_out_of_fold_models_never_see_the_article():
+    samples = [({'headline': f"{'dsp' if i % 3 else 'award'} story {i}"}, bool(i % 3)) for i in range(30)]
+    probabilities = relevance_prefilter.out_of_fold_probabilities(samples, folds=5)
+    assert len(probabilities) == len(samples)
+    # Headlines made only of words no other article has: a model fitted on them
+    # learns their labels, one that never saw them cannot
+    unique = [({'headline': f"unique{i} word{i}"}, i % 2 == 0) for i in range(10)] + samples
+    probabilities = relevance_prefilter.out_of_fold_probabilities(unique, folds=5)[:10]
+    relevant = [p for i, p in enumerate(probabilities) if i % 2 == 0]
+    irrelevant = [p for i, p in enumerate(probabilities) if i % 2]
+    assert sum(relevant) / len(relevant) - sum(irrelevant) / len(irrelevant) < 0.1
+
+def test_train_model_needs_both_kinds(database):
+    for i in range(10):
+        article_id = insert_article(f"Headline {i}", f"https://example.com/{i}", "Example")
+        insert_classification(article_id, 4 if i < 3 else 1, "Other", "General", "", "{}")
+    assert relevance_prefilter.train_model(min_samples=5) is None
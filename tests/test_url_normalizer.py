@@ -0,0 +1,61 @@
+"""Canonical URL forms used for duplicate detection."""
+import pytest
+
+from database import insert_article
+from deduplication import is_duplicate
+from url_normalizer import canonicalize_url, url_hash
+
+CANONICAL = "https://example.com/news/story"
+
+
+@pytest.mark.parametrize('url', [
+    "https://example.com/news/story",
+    "http://example.com/news/story",
+    "https://www.example.com/news/story",
+    "HTTPS://Example.COM/news/story/",
+    "https://example.com:443/news/story",
+    "https://example.com/news/story#comments",
+    "https://example.com/news/story?utm_source=twitter&utm_medium=social",
+    "https://example.com/news/story?fbclid=abc123&gclid=xyz",
+    "  https://example.com/news/story  ",
+    "https://amp.example.com/news/story",
+    "https://example.com/amp/news/story",
+    "https://example.com/news/story/amp/",
+    "https://example.com/news/story.amp",
+    "https://example.com/news/story?amp=1",
+    "https://example.com/news/story?outputType=amp",
+])
+def test_variants_share_canonical_form(url):
+    assert canonicalize_url(url) == CANONICAL
+
+
+def test_story_amp_html():
+    assert canonicalize_url("https://example.com/news/story.amp.html") == "https://example.com/news/story.html"
+
+
+@pytest.mark.parametrize('url', [
+    "https://example.com/news/other-story",
+    "https://example.org/news/story",
+    "https://example.com/news/story?id=2",
+    "https://example.com:8080/news/story",
+    "https://example.com/news/story.html",
+    "https://example.com/news/amplify",
+])
+def test_different_pages_stay_distinct(url):
+    assert canonicalize_url(url) != CANONICAL
+
+
+def test_query_order_and_content_parameters():
+    assert canonicalize_url("https://example.com/?b=2&a=1&utm_campaign=x") == "https://example.com/?a=1&b=2"
+    assert canonicalize_url("https://example.com/?p=") == "https://example.com/?p="
+
+
+def test_url_hash():
+    assert url_hash("http://www.example.com/news/story/?utm_source=x") == url_hash(CANONICAL)
+    assert len(url_hash(CANONICAL)) == 64
+
+
+def test_duplicate_by_canonical_url(database):
+    article_id = insert_article("A story", "https://www.example.com/news/story?utm_source=rss", "Example")
+    duplicate, existing = is_duplicate("A completely different headline", "http://example.com/news/story/amp")
+    assert duplicate and existing['id'] == article_id
@@ -0,0 +1,58 @@
+"""Canonical article URLs, so one story reached through different links is stored once."""
+import hashlib
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'ref', 'cmpid', 'igshid', 'ncid'}
+
+# AMP markers in paths: /amp, /amp/ or a leading /amp/ segment, and .amp before an optional .html
+AMP_PATH_PATTERNS = [
+    (re.compile(r'/amp/?$'), ''),
+    (re.compile(r'^/amp(?=/)'), ''),
+    (re.compile(r'\.amp(?=(\.html?)?$)'), ''),
+]
+
+
+def canonicalize_url(url: str) -> str:
+    """Canonical form of an article URL.
+
+    http and https, a leading www. or amp. host, default ports, AMP path and
+    query markers, utm_* and other tracking parameters, parameter order,
+    fragments and trailing slashes are all normalized away. The result is
+    only used for matching; articles keep the URL they were published with.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme == 'http':
+        scheme = 'https'
+
+    host = (parts.hostname or '').lower()
+    for prefix in ('www.', 'amp.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+
+    path = parts.path
+    for pattern, replacement in AMP_PATH_PATTERNS:
+        path = pattern.sub(replacement, path)
+    path = path.rstrip('/') or '/'
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_')
+        and key.lower() not in TRACKING_PARAMS
+        and key.lower() != 'amp'
+        and not (key.lower() == 'outputtype' and value.lower() == 'amp')
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def url_hash(url: str) -> str:
+    """Fixed-width (64 hex characters) hash of a URL's canonical form."""
+    return hashlib.sha256(canonicalize_url(url).encode('utf-8')).hexdigest()